@@ -0,0 +1,410 @@
+"""
+Pipeline reproducible de preparación del dataset del modelo de habilidad musical.
+
+Reemplaza los pasos hechos a mano en oversampling.ipynb y shuffle.ipynb. Las
+etapas forman un grafo:
+
+    exportar -> dividir -> sobremuestrear -> normalizar -> desordenar
+                  \\-> (test) ------------------/
+
+Como en los notebooks, se sobremuestrea antes de normalizar: la media y la
+desviación estándar salen del conjunto de entrenamiento ya balanceado, que
+queda con media 0 y desviación 1 (y así lo ve el modelo en producción).
+
+Cada etapa lee y escribe Parquet por lotes, así que la memoria no depende del
+tamaño del dataset (salvo las clases minoritarias, que SMOTE necesita en
+memoria para buscar vecinos). La salida de cada etapa se guarda en
+--cache-dir bajo una clave que combina el hash de sus entradas, sus
+parámetros y la versión del pipeline: al volver a ejecutar solo se recalculan
+las etapas cuya clave cambió y las que dependen de ellas.
+
+El origen puede ser un CSV (por defecto, musical_skills_dataset_original.csv)
+o un archivo o directorio Parquet, como el que escribe
+EarTrainer-Back/src/ml/export_skill_features.py con las características de
+producción.
+
+Uso (desde Data):
+    python pipeline.py
+    python pipeline.py --source export.parquet --test-size 0.2 --oversample random
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Cambiar al modificar el código de alguna etapa: invalida toda la caché
+PIPELINE_VERSION = 3
+
+LABEL = 'skill_level'
+FEATURES = ['accuracy_easy', 'accuracy_medium', 'accuracy_hard', 'avg_response_time', 'games_played', 'avg_session_duration']
+# Características normalizadas con z-score (las de precisión ya están en [0, 1])
+FEATURES_NORMALIZADAS = ['avg_response_time', 'games_played', 'avg_session_duration']
+ESQUEMA = pa.schema([(LABEL, pa.string())] + [(f, pa.float64()) for f in FEATURES])
+
+
+class Artefacto:
+    """
+    Archivo producido o consumido por una etapa junto con la clave que
+    identifica su contenido.
+    """
+
+    def __init__(self, path: str, clave: str):
+        self.path = path
+        self.clave = clave
+
+
+def hash_origen(path: str) -> str:
+    """
+    sha256 del contenido del origen (de todos sus archivos si es un directorio).
+    """
+    h = hashlib.sha256()
+    archivos = [path] if os.path.isfile(path) else sorted(
+        os.path.join(raiz, nombre) for raiz, _, nombres in os.walk(path) for nombre in nombres
+    )
+    for archivo in archivos:
+        h.update(os.path.relpath(archivo, path).encode())
+        with open(archivo, 'rb') as f:
+            for bloque in iter(lambda: f.read(1 << 20), b''):
+                h.update(bloque)
+    return h.hexdigest()
+
+
+def leer_lotes(path: str, batch_size: int, filtro=None):
+    for lote in ds.dataset(path, format="parquet").to_batches(batch_size=batch_size, filter=filtro,
+                                                                  batch_readahead=2, fragment_readahead=1):
+        if lote.num_rows:
+            yield lote
+
+
+def contar_clases(path: str, batch_size: int) -> dict[str, int]:
+    conteo = {}
+    for lote in leer_lotes(path, batch_size):
+        for fila in pc.value_counts(lote.column(LABEL)).to_pylist():
+            conteo[fila["values"]] = conteo.get(fila["values"], 0) + fila["counts"]
+    return conteo
+
+
+class Pipeline:
+    """
+    Ejecuta etapas con caché en disco. Una etapa se identifica por su nombre,
+    sus parámetros y las claves de sus entradas; si ya existe un resultado
+    completo para esa clave se reutiliza.
+    """
+
+    def __init__(self, cache_dir: str, force: bool = False):
+        self.cache_dir = cache_dir
+        self.force = force
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def origen(self, path: str) -> Artefacto:
+        return Artefacto(path, hash_origen(path))
+
+    def etapa(self, nombre: str, funcion, entradas: dict[str, Artefacto], salidas: list[str], **params) -> dict[str, Artefacto]:
+        descripcion = {
+            "etapa": nombre,
+            "version": PIPELINE_VERSION,
+            "params": params,
+            "entradas": {k: a.clave for k, a in sorted(entradas.items())},
+        }
+        clave = hashlib.sha256(json.dumps(descripcion, sort_keys=True).encode()).hexdigest()[:16]
+        directorio = os.path.join(self.cache_dir, f"{nombre}-{clave}")
+        manifiesto = os.path.join(directorio, "manifest.json")
+
+        if self.force and os.path.exists(directorio):
+            shutil.rmtree(directorio)
+        if os.path.exists(manifiesto):
+            print(f"[{nombre}] en caché ({clave})")
+        else:
+            print(f"[{nombre}] ejecutando ({clave})")
+            # Se escribe en un directorio temporal: una ejecución interrumpida no deja caché a medias
+            temporal = f"{directorio}.tmp-{os.getpid()}"
+            shutil.rmtree(temporal, ignore_errors=True)
+            os.makedirs(temporal)
+            inicio = time.perf_counter()
+            info = funcion(
+                {k: a.path for k, a in entradas.items()},
+                {s: os.path.join(temporal, s) for s in salidas},
+                **params,
+            )
+            descripcion["info"] = info or {}
+            descripcion["segundos"] = round(time.perf_counter() - inicio, 3)
+            with open(os.path.join(temporal, "manifest.json"), 'w') as f:
+                json.dump(descripcion, f, indent=2, ensure_ascii=False)
+            os.replace(temporal, directorio)
+            print(f"[{nombre}] {descripcion['segundos']:.2f} s {json.dumps(info or {}, ensure_ascii=False)}")
+        return {s: Artefacto(os.path.join(directorio, s), f"{clave}:{s}") for s in salidas}
+
+
+# Etapas
+# ------
+# Cada etapa recibe las rutas de sus entradas y salidas y devuelve un dict
+# con información que se guarda en el manifiesto.
+
+def lotes_exportacion(origen: str, columnas: list[str], batch_size: int):
+    """
+    Lotes de un origen Parquet. Si tiene user_id (exportación incremental de
+    EarTrainer-Back/src/ml/export_skill_features.py), se recorren los
+    archivos del más reciente al más antiguo y solo se deja la primera fila
+    de cada usuario, es decir, la más reciente.
+    """
+    dataset = ds.dataset(origen, format="parquet")
+    if "user_id" not in dataset.schema.names:
+        yield from dataset.to_batches(columns=columnas, batch_size=batch_size,
+                                      batch_readahead=2, fragment_readahead=1)
+        return
+    vistos = set()
+    for fragmento in sorted(dataset.get_fragments(), key=lambda f: f.path, reverse=True):
+        for lote in fragmento.to_batches(columns=columnas + ["user_id"], batch_size=batch_size, batch_readahead=2):
+            nuevos = np.fromiter((u not in vistos for u in lote.column("user_id").to_pylist()),
+                                 dtype=bool, count=lote.num_rows)
+            vistos.update(lote.column("user_id").to_pylist())
+            yield lote.filter(pa.array(nuevos)).select(columnas)
+
+
+def exportar(entradas, salidas, batch_size):
+    """
+    Lee el origen (CSV o Parquet) por lotes, se queda con la etiqueta y las
+    seis características y descarta filas incompletas (por ejemplo, usuarios
+    sin etiqueta en una exportación de la base de datos).
+    """
+    origen = entradas["origen"]
+    columnas = [LABEL] + FEATURES
+    if origen.endswith(".csv"):
+        lector = pacsv.open_csv(
+            origen,
+            read_options=pacsv.ReadOptions(block_size=1 << 24),
+            convert_options=pacsv.ConvertOptions(
+                include_columns=columnas,
+                column_types={LABEL: pa.string(), **{f: pa.float64() for f in FEATURES}},
+            ),
+        )
+    else:
+        lector = lotes_exportacion(origen, columnas, batch_size)
+
+    filas = descartadas = 0
+    with pq.ParquetWriter(salidas["datos.parquet"], ESQUEMA) as escritor:
+        for lote in lector:
+            tabla = pa.Table.from_batches([lote]).select(columnas).cast(ESQUEMA)
+            completas = tabla.drop_null()
+            descartadas += tabla.num_rows - completas.num_rows
+            filas += completas.num_rows
+            escritor.write_table(completas)
+    return {"filas": filas, "descartadas": descartadas}
+
+
+def dividir(entradas, salidas, test_size, seed, batch_size):
+    """
+    Separa entrenamiento y prueba con un hash del contenido de cada fila: el
+    resultado no depende del orden ni del tamaño de los lotes, y las filas
+    repetidas caen siempre en el mismo lado (no se filtran a prueba).
+    """
+    hash_key = f"{seed:016d}"[-16:]
+    conteo = {"train": 0, "test": 0}
+    with pq.ParquetWriter(salidas["train.parquet"], ESQUEMA) as train, \
+            pq.ParquetWriter(salidas["test.parquet"], ESQUEMA) as test:
+        for lote in leer_lotes(entradas["datos"], batch_size):
+            hashes = pd.util.hash_pandas_object(lote.to_pandas(), index=False, hash_key=hash_key).to_numpy()
+            en_test = pa.array(hashes < np.uint64(test_size * 2.0 ** 64))
+            lote_test = lote.filter(en_test)
+            lote_train = lote.filter(pc.invert(en_test))
+            test.write_batch(lote_test)
+            train.write_batch(lote_train)
+            conteo["test"] += lote_test.num_rows
+            conteo["train"] += lote_train.num_rows
+    return conteo
+
+
+def normalizar(entradas, salidas, batch_size):
+    """
+    Calcula media y desviación estándar de FEATURES_NORMALIZADAS solo con el
+    conjunto de entrenamiento ya sobremuestreado (combinando lotes con el algoritmo de Chan) y
+    aplica el z-score a entrenamiento y prueba. Los parámetros se guardan en el
+    formato de general_models/skill_level_model.json.
+    """
+    n = 0
+    media = np.zeros(len(FEATURES_NORMALIZADAS))
+    m2 = np.zeros(len(FEATURES_NORMALIZADAS))
+    for lote in leer_lotes(entradas["train"], batch_size):
+        X = np.column_stack([lote.column(f).to_numpy() for f in FEATURES_NORMALIZADAS])
+        n_lote = len(X)
+        media_lote = X.mean(axis=0)
+        delta = media_lote - media
+        m2 += ((X - media_lote) ** 2).sum(axis=0) + delta ** 2 * n * n_lote / (n + n_lote)
+        media += delta * n_lote / (n + n_lote)
+        n += n_lote
+    std = np.sqrt(m2 / n) if n else np.ones_like(m2)
+
+    for nombre in ("train", "test"):
+        with pq.ParquetWriter(salidas[f"{nombre}.parquet"], ESQUEMA) as escritor:
+            for lote in leer_lotes(entradas[nombre], batch_size):
+                columnas = []
+                for f in ESQUEMA.names:
+                    columna = lote.column(f)
+                    if f in FEATURES_NORMALIZADAS:
+                        i = FEATURES_NORMALIZADAS.index(f)
+                        valores = columna.to_numpy()
+                        columna = pa.array((valores - media[i]) / std[i] if std[i] else np.zeros_like(valores))
+                    columnas.append(columna)
+                escritor.write_batch(pa.RecordBatch.from_arrays(columnas, schema=ESQUEMA))
+
+    params = {
+        "__metadata__": {
+            "description": "Parámetros de normalización z-score (media y desviación estándar) para algunas características de entrada del modelo de predicción de habilidad. Estos valores son necesarios para preprocesar los nuevos datos antes de pasarlos al modelo SVM."
+        },
+        **{f: {"mean": round(float(media[i]), 6), "std": round(float(std[i]), 6)} for i, f in enumerate(FEATURES_NORMALIZADAS)},
+    }
+    with open(salidas["normalization_params.json"], 'w') as f:
+        json.dump(params, f, indent=2, ensure_ascii=False)
+    return {"filas_train": n}
+
+
+def sobremuestrear(entradas, salidas, metodo, k_vecinos, seed, batch_size):
+    """
+    Iguala cada clase a la mayoritaria. Con 'smote' genera ejemplos
+    interpolando entre una fila y uno de sus k vecinos de la misma clase; con
+    'random' duplica filas al azar (como la primera celda de
+    oversampling.ipynb). Solo se carga en memoria la clase que se está
+    completando, y los ejemplos nuevos se escriben por lotes.
+    """
+    from sklearn.neighbors import NearestNeighbors
+
+    conteo = contar_clases(entradas["train"], batch_size)
+    objetivo = max(conteo.values(), default=0)
+    rng = np.random.default_rng(seed)
+    generadas = {}
+    with pq.ParquetWriter(salidas["datos.parquet"], ESQUEMA) as escritor:
+        for lote in leer_lotes(entradas["train"], batch_size):
+            escritor.write_batch(lote)
+        if metodo == "none":
+            return {"clases": conteo, "generadas": generadas}
+
+        for clase in sorted(conteo):
+            faltan = objetivo - conteo[clase]
+            if faltan <= 0:
+                continue
+            filas = [np.column_stack([lote.column(f).to_numpy() for f in FEATURES])
+                     for lote in leer_lotes(entradas["train"], batch_size, filtro=ds.field(LABEL) == clase)]
+            X = np.concatenate(filas)
+            k = min(k_vecinos, len(X) - 1)
+            vecinos = NearestNeighbors(n_neighbors=k + 1).fit(X) if metodo == "smote" and k > 0 else None
+
+            for inicio in range(0, faltan, batch_size):
+                m = min(batch_size, faltan - inicio)
+                base = rng.integers(len(X), size=m)
+                if vecinos is None:
+                    nuevas = X[base]
+                else:
+                    # El primer vecino de cada fila es ella misma
+                    indices = vecinos.kneighbors(X[base], return_distance=False)[:, 1:]
+                    elegido = indices[np.arange(m), rng.integers(k, size=m)]
+                    nuevas = X[base] + rng.random((m, 1)) * (X[elegido] - X[base])
+                escritor.write_batch(pa.RecordBatch.from_arrays(
+                    [pa.array([clase] * m, type=pa.string())] + [pa.array(nuevas[:, j]) for j in range(len(FEATURES))],
+                    schema=ESQUEMA,
+                ))
+            generadas[clase] = faltan
+    return {"clases": conteo, "generadas": generadas}
+
+
+def desordenar(entradas, salidas, seed, filas_por_cubeta, batch_size):
+    """
+    Desordena sin cargar todo el dataset: cada fila va a una cubeta al azar y
+    luego se permuta cada cubeta en memoria (cada una cabe en filas_por_cubeta
+    filas en promedio).
+    """
+    total = pq.ParquetFile(entradas["datos"]).metadata.num_rows
+    n_cubetas = max(1, -(-total // filas_por_cubeta))
+    rng = np.random.default_rng(seed)
+    directorio = os.path.join(os.path.dirname(salidas["datos.parquet"]), "cubetas")
+    os.makedirs(directorio)
+    rutas = [os.path.join(directorio, f"{i}.parquet") for i in range(n_cubetas)]
+
+    escritores = [pq.ParquetWriter(ruta, ESQUEMA) for ruta in rutas]
+    try:
+        for lote in leer_lotes(entradas["datos"], batch_size):
+            cubeta = rng.integers(n_cubetas, size=lote.num_rows)
+            for i in range(n_cubetas):
+                escritores[i].write_batch(lote.filter(pa.array(cubeta == i)))
+    finally:
+        for escritor in escritores:
+            escritor.close()
+
+    with pq.ParquetWriter(salidas["datos.parquet"], ESQUEMA) as escritor:
+        for ruta in rutas:
+            tabla = pq.read_table(ruta)
+            escritor.write_table(tabla.take(rng.permutation(tabla.num_rows)), row_group_size=batch_size)
+            os.remove(ruta)
+    os.rmdir(directorio)
+    return {"filas": total, "cubetas": n_cubetas}
+
+
+def publicar(artefactos: dict[str, Artefacto], output_dir: str, csv_name: str, batch_size: int):
+    """
+    Copia los resultados finales a output_dir y escribe el CSV de
+    entrenamiento que consume MLTraining.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    for nombre, artefacto in artefactos.items():
+        shutil.copyfile(artefacto.path, os.path.join(output_dir, nombre))
+    with pacsv.CSVWriter(os.path.join(output_dir, csv_name), ESQUEMA) as escritor:
+        for lote in leer_lotes(artefactos["train.parquet"].path, batch_size):
+            escritor.write_batch(lote)
+    print(f"Resultados en {output_dir}: {', '.join(list(artefactos) + [csv_name])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default="musical_skills_dataset_original.csv",
+                        help="CSV o archivo/directorio Parquet con los datos exportados")
+    parser.add_argument("--output-dir", default="pipeline_output")
+    parser.add_argument("--csv-name", default="musical_skills_smote_final.csv")
+    parser.add_argument("--cache-dir", default=".pipeline_cache")
+    parser.add_argument("--test-size", type=float, default=0.0,
+                        help="Fracción de filas reservada para prueba (0: todo a entrenamiento, como los notebooks)")
+    parser.add_argument("--oversample", choices=["smote", "random", "none"], default="smote")
+    parser.add_argument("--k-neighbors", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--bucket-rows", type=int, default=1_000_000,
+                        help="Filas por cubeta al desordenar (acota la memoria de esa etapa)")
+    parser.add_argument("--batch-size", type=int, default=65536)
+    parser.add_argument("--force", action="store_true", help="Recalcula todas las etapas")
+    args = parser.parse_args()
+
+    pipeline = Pipeline(args.cache_dir, force=args.force)
+    origen = pipeline.origen(args.source)
+
+    exportado = pipeline.etapa("exportar", exportar, {"origen": origen}, ["datos.parquet"],
+                               batch_size=args.batch_size)
+    # dividir y normalizar no dependen del tamaño de lote: no forma parte de su clave
+    dividido = pipeline.etapa("dividir", lambda e, s, **p: dividir(e, s, batch_size=args.batch_size, **p),
+                              {"datos": exportado["datos.parquet"]}, ["train.parquet", "test.parquet"],
+                              test_size=args.test_size, seed=args.seed)
+    balanceado = pipeline.etapa("sobremuestrear", sobremuestrear, {"train": dividido["train.parquet"]},
+                                ["datos.parquet"], metodo=args.oversample, k_vecinos=args.k_neighbors,
+                                seed=args.seed, batch_size=args.batch_size)
+    normalizado = pipeline.etapa("normalizar", lambda e, s: normalizar(e, s, batch_size=args.batch_size),
+                                 {"train": balanceado["datos.parquet"], "test": dividido["test.parquet"]},
+                                 ["train.parquet", "test.parquet", "normalization_params.json"])
+    desordenado = pipeline.etapa("desordenar", desordenar, {"datos": normalizado["train.parquet"]},
+                                 ["datos.parquet"], seed=args.seed, filas_por_cubeta=args.bucket_rows,
+                                 batch_size=args.batch_size)
+
+    publicar({
+        "train.parquet": desordenado["datos.parquet"],
+        "test.parquet": normalizado["test.parquet"],
+        "normalization_params.json": normalizado["normalization_params.json"],
+    }, args.output_dir, args.csv_name, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Benchmark de las consultas de historial de intentos antes y después de la
+migración de índices (src/db/migrations/001_attempt_history_indexes.sql).
+
+Crea el esquema en una base de datos Postgres local, la llena con intentos
+sintéticos, mide la latencia de cada función de crud sin los índices, aplica
+la migración y vuelve a medir. Para get_last_n_note_attempts muestra además
+el plan (EXPLAIN ANALYZE) antes y después, junto al de su forma anterior
+(join de todos los intentos del usuario, ordenados antes del LIMIT).
+
+ATENCIÓN: usar solo con una base de datos desechable. El script elimina los
+índices de la migración y añade millones de filas.
+
+Uso (desde EarTrainer-Back):
+    python -m benchmarks.bench_attempt_queries --database-url postgresql://localhost/eartrainer_bench
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+from datetime import datetime
+
+DB_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "db")
+MIGRATION_PATH = os.path.join(DB_DIR, "migrations", "001_attempt_history_indexes.sql")
+MIGRATION_INDEXES = ["idx_note_training_logs_session_created", "idx_training_sessions_user_started"]
+
+NOTAS = "(ARRAY['C','D','E','F','G','A','B'])"
+
+SEED_USERS = """
+INSERT INTO users (username)
+SELECT 'bench_' || g FROM generate_series(1, :n_users) g
+ON CONFLICT (username) DO NOTHING
+"""
+
+# La última sesión de cada usuario queda abierta para medir update_training_session
+SEED_SESSIONS = """
+INSERT INTO training_sessions (user_id, dificultad, started_at, finished_at)
+SELECT
+    u.id,
+    (ARRAY['easy', 'medium', 'hard'])[1 + (s % 3)],
+    t.started_at,
+    CASE WHEN s < :sessions_per_user THEN t.started_at + INTERVAL '90 seconds' END
+FROM users u
+CROSS JOIN generate_series(1, :sessions_per_user) s
+CROSS JOIN LATERAL (
+    SELECT TIMESTAMP '2025-01-01' + (s * 86400 + u.id % 86400) * INTERVAL '1 second' AS started_at
+) t
+WHERE u.username LIKE 'bench\\_%'
+ORDER BY random()
+"""
+
+SEED_ATTEMPTS = f"""
+INSERT INTO note_training_logs (
+    session_id, nota_correcta, notas_mostradas, nota_elegida,
+    tiempo_respuesta, es_correcto, created_at
+)
+SELECT
+    ts.id,
+    {NOTAS}[1 + (a % 7)],
+    ARRAY[{NOTAS}[1 + (a % 7)], {NOTAS}[1 + ((a + 2) % 7)], {NOTAS}[1 + ((a + 4) % 7)]],
+    {NOTAS}[1 + ((a + CASE WHEN random() < 0.7 THEN 0 ELSE 2 END) % 7)],
+    CAST(random() * 3 AS REAL),
+    random() < 0.7,
+    ts.started_at + a * INTERVAL '5 seconds'
+FROM training_sessions ts
+JOIN users u ON u.id = ts.user_id
+CROSS JOIN generate_series(1, :attempts_per_session) a
+WHERE u.username LIKE 'bench\\_%'
+ORDER BY random()
+"""
+
+
+# Forma anterior de crud.get_last_n_note_attempts, para comparar su plan con el
+# top-N por sesión actual: ningún índice da el orden (created_at, id) de todos
+# los intentos del usuario, así que se leen y ordenan todos antes del LIMIT
+LAST_N_JOIN = """
+    SELECT ntl.*
+    FROM note_training_logs ntl
+    JOIN training_sessions ts ON ntl.session_id = ts.id
+    WHERE ts.user_id = $1
+    ORDER BY ntl.created_at DESC, ntl.id DESC
+    LIMIT $2
+"""
+
+
+def leer_sentencias(path):
+    with open(path) as f:
+        lineas = [linea for linea in f if not linea.lstrip().startswith("--")]
+    return [sentencia.strip() for sentencia in "".join(lineas).split(";") if sentencia.strip()]
+
+
+async def medir(nombre, fn, argumentos, resultados):
+    tiempos = []
+    for args in argumentos:
+        inicio = time.perf_counter()
+        await fn(*args)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    resultados[nombre] = (statistics.median(tiempos), tiempos[int(len(tiempos) * 0.95) - 1])
+
+
+def _filas_leidas(nodo, tabla) -> int:
+    filas = nodo["Actual Rows"] * nodo["Actual Loops"] if nodo.get("Relation Name") == tabla else 0
+    return filas + sum(_filas_leidas(hijo, tabla) for hijo in nodo.get("Plans", []))
+
+
+async def medir_plan(sql, usuarios, n=3) -> tuple[float, float, float]:
+    """
+    Mediana, sobre los usuarios, del tiempo de ejecución (ms) según EXPLAIN
+    ANALYZE, de las filas leídas de note_training_logs y de los bloques de
+    buffer tocados.
+    """
+    from src.db.database import conexion
+
+    tiempos, filas, bloques = [], [], []
+    async with conexion() as connection:
+        for user_id in usuarios:
+            salida = await connection.fetchval(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", user_id, n)
+            plan = json.loads(salida)[0]
+            tiempos.append(plan["Execution Time"])
+            filas.append(_filas_leidas(plan["Plan"], "note_training_logs"))
+            bloques.append(plan["Plan"]["Shared Hit Blocks"] + plan["Plan"]["Shared Read Blocks"])
+    return statistics.median(tiempos), statistics.median(filas), statistics.median(bloques)
+
+
+async def medir_planes(crud, usuarios):
+    return {
+        "join + sort (anterior)": await medir_plan(LAST_N_JOIN, usuarios),
+        "top-N por sesión": await medir_plan(crud.GET_LAST_N_NOTE_ATTEMPTS.sql, usuarios),
+    }
+
+
+async def medir_todo(crud, usuarios, sesiones_cerradas, sesiones_abiertas):
+    resultados = {}
+    await medir("get_last_n_note_attempts", crud.get_last_n_note_attempts,
+                [(u, 3) for u in usuarios], resultados)
+    await medir("get_attempts_by_session", crud.get_attempts_by_session,
+                [(s,) for s in sesiones_cerradas], resultados)
+    await medir("get_user_sessions", crud.get_user_sessions,
+                [(u,) for u in usuarios], resultados)
+    await medir("get_user_skill_features", crud.get_user_skill_features,
+                [(u,) for u in usuarios], resultados)
+    await medir("update_training_session", crud.update_training_session,
+                [(s, datetime.now()) for s in sesiones_abiertas], resultados)
+    return resultados
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--sessions-per-user", type=int, default=10)
+    parser.add_argument("--attempts-per-session", type=int, default=10)
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--skip-seed", action="store_true", help="Reutilizar los datos sintéticos ya cargados")
+    args = parser.parse_args()
+
+    # crud usa la instancia global de Database creada a partir de DATABASE_URL
+    os.environ["DATABASE_URL"] = args.database_url
+    # La carga de datos sintéticos tarda más que el límite por sentencia de la API
+    os.environ.setdefault("DB_STATEMENT_TIMEOUT", "0")
+    from src.db import crud
+    from src.db.database import database
+
+    await database.connect()
+    try:
+        for path in (os.path.join(DB_DIR, "schema.sql"), os.path.join(DB_DIR, "user_skills_feature_view.sql")):
+            for sentencia in leer_sentencias(path):
+                await database.execute(sentencia)
+        for indice in MIGRATION_INDEXES:
+            await database.execute(f"DROP INDEX IF EXISTS {indice}")
+
+        if not args.skip_seed:
+            total = args.users * args.sessions_per_user * args.attempts_per_session
+            print(f"Cargando {args.users} usuarios y {total} intentos sintéticos...")
+            inicio = time.perf_counter()
+            await database.execute(SEED_USERS, {"n_users": args.users})
+            await database.execute(SEED_SESSIONS, {"sessions_per_user": args.sessions_per_user})
+            await database.execute(SEED_ATTEMPTS, {"attempts_per_session": args.attempts_per_session})
+            await database.execute("ANALYZE")
+            print(f"Datos cargados en {time.perf_counter() - inicio:.1f} s")
+
+        n_intentos = await database.fetch_val("SELECT COUNT(*) FROM note_training_logs")
+        usuarios = [r["id"] for r in await database.fetch_all(
+            "SELECT id FROM users WHERE username LIKE 'bench\\_%' ORDER BY random() LIMIT :n",
+            {"n": args.samples})]
+        sesiones_cerradas = [r["id"] for r in await database.fetch_all(
+            "SELECT id FROM training_sessions WHERE finished_at IS NOT NULL ORDER BY random() LIMIT :n",
+            {"n": args.samples})]
+        sesiones_abiertas = [r["id"] for r in await database.fetch_all(
+            "SELECT id FROM training_sessions WHERE finished_at IS NULL ORDER BY random() LIMIT :n",
+            {"n": 2 * args.samples})]
+        random.shuffle(sesiones_abiertas)
+        if len(sesiones_abiertas) < 2 * args.samples:
+            print("Aviso: no quedan suficientes sesiones abiertas; update_training_session medirá menos muestras")
+
+        print(f"\nTabla note_training_logs: {n_intentos} filas, {args.samples} muestras por función\n")
+        antes = await medir_todo(crud, usuarios, sesiones_cerradas,
+                                 sesiones_abiertas[:args.samples])
+        planes_antes = await medir_planes(crud, usuarios)
+        for sentencia in leer_sentencias(MIGRATION_PATH):
+            await database.execute(sentencia)
+        await database.execute("ANALYZE note_training_logs")
+        await database.execute("ANALYZE training_sessions")
+        despues = await medir_todo(crud, usuarios, sesiones_cerradas,
+                                   sesiones_abiertas[args.samples:])
+        planes_despues = await medir_planes(crud, usuarios)
+
+        print(f"{'función':<26} {'antes p50/p95 (ms)':>20} {'después p50/p95 (ms)':>22}")
+        for nombre in antes:
+            a50, a95 = antes[nombre]
+            d50, d95 = despues[nombre]
+            print(f"{nombre:<26} {a50:>9.2f} / {a95:>8.2f} {d50:>11.2f} / {d95:>8.2f}")
+
+        print("\nPlan de get_last_n_note_attempts (n=3, medianas de EXPLAIN ANALYZE por usuario)")
+        print(f"{'consulta':<24} {'':<8} {'ms':>8} {'filas leídas':>13} {'buffers':>9}")
+        for nombre in planes_antes:
+            for momento, planes in (("antes", planes_antes), ("después", planes_despues)):
+                ms, filas, bloques = planes[nombre]
+                print(f"{nombre:<24} {momento:<8} {ms:>8.3f} {filas:>13.0f} {bloques:>9.0f}")
+    finally:
+        await database.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
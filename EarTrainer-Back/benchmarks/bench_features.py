@@ -0,0 +1,87 @@
+"""
+Benchmark de la construcción de la matriz de características de train_user.
+
+Compara el camino anterior (un vector por intento con np.zeros, búsquedas con
+NOTAS_DISPONIBLES.index, np.concatenate y np.stack al final) con el
+codificador por lotes de src/ml/features.py, y comprueba que ambos producen
+la misma matriz.
+
+Uso (desde EarTrainer-Back):
+    python -m benchmarks.bench_features
+    python -m benchmarks.bench_features --tamanos 10000 100000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.config import NOTAS_DISPONIBLES
+from src.ml.features import caracteristicas_intentos
+
+
+def intentos_sinteticos(n, seed=0):
+    rng = np.random.default_rng(seed)
+    notas = np.array(NOTAS_DISPONIBLES)
+    intentos = []
+    for _ in range(n):
+        mostradas = list(rng.choice(notas, 3, replace=False))
+        intentos.append({
+            "nota_correcta": mostradas[0],
+            "notas_mostradas": mostradas,
+            "nota_elegida": mostradas[rng.integers(3)],
+            "tiempo_respuesta": float(np.float32(rng.random() * 3)),
+        })
+    return intentos
+
+
+def _one_hot(nota):
+    vec = np.zeros(len(NOTAS_DISPONIBLES))
+    if nota in NOTAS_DISPONIBLES:
+        vec[NOTAS_DISPONIBLES.index(nota)] = 1
+    return vec
+
+
+def _mostradas_one_hot(notas_mostradas):
+    vec = np.zeros(len(NOTAS_DISPONIBLES))
+    for n in notas_mostradas:
+        if n in NOTAS_DISPONIBLES:
+            vec[NOTAS_DISPONIBLES.index(n)] = 1
+    return vec
+
+
+def camino_anterior(attempts):
+    X_list, y_list = [], []
+    for intento in attempts:
+        X = np.concatenate([
+            _one_hot(intento["nota_correcta"]),
+            _one_hot(intento["nota_elegida"]),
+            _mostradas_one_hot(intento["notas_mostradas"]),
+            [float(intento["tiempo_respuesta"]), 1.0],
+        ]).reshape(1, -1)
+        X_list.append(X.flatten())
+        y_list.append(int(intento["nota_correcta"] != intento["nota_elegida"]))
+    return np.stack(X_list), np.array(y_list)
+
+
+def medir(fn, attempts):
+    inicio = time.perf_counter()
+    resultado = fn(attempts)
+    return time.perf_counter() - inicio, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'intentos':>10} {'anterior (s)':>13} {'por lotes (s)':>14} {'mejora':>8}")
+    for n in args.tamanos:
+        attempts = intentos_sinteticos(n)
+        t_anterior, (X_ant, y_ant) = medir(camino_anterior, attempts)
+        t_lotes, (X_lotes, y_lotes) = medir(caracteristicas_intentos, attempts)
+        assert np.array_equal(X_ant.astype(np.float32), X_lotes) and np.array_equal(y_ant, y_lotes)
+        print(f"{n:>10} {t_anterior:>13.3f} {t_lotes:>14.3f} {t_anterior / t_lotes:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark del coste por nota de una partida: camino HTTP (POST
+/api/session/registrar_intento + POST /api/trainer/sugerir_ejercicio por cada
+nota) frente al canal WebSocket de sesión (/api/session/ws, un mensaje de ida
+y uno de vuelta por nota).
+
+Levanta la aplicación en el mismo proceso con el TestClient de Starlette, así
+que no incluye la red: la diferencia medida es el trabajo del servidor
+(cabeceras, routing, validación y consultas). Con clientes remotos el canal
+ahorra además un viaje de ida y vuelta por nota.
+
+Necesita una base de datos con el esquema (DATABASE_URL). Crea un usuario y
+dos sesiones por ejecución. El TestClient necesita httpx
+(pip install -r benchmarks/requirements.txt).
+
+Uso (desde EarTrainer-Back):
+    python -m benchmarks.bench_session_channel --notas 500
+"""
+import argparse
+import json
+import time
+import uuid
+
+import numpy as np
+from starlette.testclient import TestClient
+
+from src.main import app
+
+
+def resumen(nombre: str, tiempos: list[float]):
+    ms = np.array(tiempos) * 1000
+    print(f"{nombre:<10} p50 {np.percentile(ms, 50):7.2f} ms   p95 {np.percentile(ms, 95):7.2f} ms   "
+          f"media {ms.mean():7.2f} ms")
+
+
+def partida_http(cliente: TestClient, user_id: int, session_id: int, notas: int, num_distractores: int) -> list[float]:
+    sugerencia = cliente.post("/api/trainer/sugerir_ejercicio",
+                              json={"user_id": user_id, "num_distractores": num_distractores}).json()
+    tiempos = []
+    for i in range(notas):
+        elegida = sugerencia["objetivo"] if i % 3 else sugerencia["distractores"][0]
+        inicio = time.perf_counter()
+        cliente.post("/api/session/registrar_intento", json={
+            "session_id": session_id,
+            "nota_correcta": sugerencia["objetivo"],
+            "notas_mostradas": [sugerencia["objetivo"], *sugerencia["distractores"]],
+            "nota_elegida": elegida,
+            "tiempo_respuesta": 1.0,
+            "es_correcto": elegida == sugerencia["objetivo"],
+        }).raise_for_status()
+        sugerencia = cliente.post("/api/trainer/sugerir_ejercicio",
+                                  json={"user_id": user_id, "num_distractores": num_distractores}).json()
+        tiempos.append(time.perf_counter() - inicio)
+    cliente.post("/api/session/terminar", json={"session_id": session_id}).raise_for_status()
+    return tiempos
+
+
+def partida_ws(cliente: TestClient, user_id: int, session_id: int, notas: int, num_distractores: int) -> list[float]:
+    tiempos = []
+    ruta = f"/api/session/ws?user_id={user_id}&session_id={session_id}&num_distractores={num_distractores}"
+    with cliente.websocket_connect(ruta) as ws:
+        sugerencia = ws.receive_json()
+        for i in range(notas):
+            elegida = sugerencia["objetivo"] if i % 3 else sugerencia["distractores"][0]
+            inicio = time.perf_counter()
+            ws.send_text(json.dumps({"tipo": "intento", "nota_elegida": elegida, "tiempo_respuesta": 1.0}))
+            sugerencia = ws.receive_json()
+            tiempos.append(time.perf_counter() - inicio)
+            if sugerencia["tipo"] != "sugerencia":
+                raise RuntimeError(sugerencia)
+        ws.send_text(json.dumps({"tipo": "terminar"}))
+        ws.receive_json()
+    return tiempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--notas", type=int, default=300, help="Notas por partida")
+    parser.add_argument("--num-distractores", type=int, default=2)
+    args = parser.parse_args()
+
+    with TestClient(app) as cliente:
+        inicio = cliente.post("/api/session/iniciar",
+                              json={"username": f"bench_ws_{uuid.uuid4().hex[:8]}", "dificultad": "medium"}).json()
+        user_id = inicio["user_id"]
+        segunda = cliente.post("/api/session/crear", json={"user_id": user_id, "dificultad": "medium"}).json()
+
+        print(f"{args.notas} notas por partida, usuario {user_id}")
+        resumen("HTTP", partida_http(cliente, user_id, inicio["session_id"], args.notas, args.num_distractores))
+        resumen("WebSocket", partida_ws(cliente, user_id, segunda["session_id"], args.notas, args.num_distractores))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark de los caminos de inferencia de SkillsPredictor.
+
+Mide:
+  * arranque: importar src.ml.skills_predictor y crear SkillsPredictor en un
+    proceso nuevo: pickle con pandas importado (camino original), pickle sin
+    pandas, y modelo .npz evaluado con NumPy (sin sklearn);
+  * latencia por petición: normalización con un bucle sobre
+    normalization_params + DataFrame de una fila (camino original) frente a
+    los vectores mean/std precalculados + ndarray, con el SVC de sklearn y
+    con el evaluador de NumPy.
+No usa la base de datos: las características se generan al azar.
+
+Uso (desde EarTrainer-Back):
+    python -m benchmarks.bench_skills_predictor
+"""
+import os
+import pickle
+import statistics
+import subprocess
+import sys
+import timeit
+import warnings
+
+import numpy as np
+
+# El import de skills_predictor crea la instancia de Database; no se conecta
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/eartrainer")
+
+from src.config import SKILL_LEVEL_MODEL_PATH  # noqa: E402
+from src.ml.skills_predictor import SkillsPredictor  # noqa: E402
+
+ARRANQUES = 5
+REPETICIONES = 2000
+
+SCRIPT_ARRANQUE = """
+import time
+inicio = time.perf_counter()
+{extra}
+from src.ml.skills_predictor import SkillsPredictor
+SkillsPredictor({args})
+print(time.perf_counter() - inicio)
+"""
+
+
+def medir_arranque(extra: str, args: str) -> float:
+    tiempos = []
+    for _ in range(ARRANQUES):
+        salida = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", SCRIPT_ARRANQUE.format(extra=extra, args=args)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        tiempos.append(float(salida.strip().splitlines()[-1]) * 1000)
+    return statistics.median(tiempos)
+
+
+def datos_sinteticos(rng):
+    return {
+        "accuracy_easy": rng.random(),
+        "accuracy_medium": rng.random(),
+        "accuracy_hard": rng.random(),
+        "avg_response_time": rng.random() * 5,
+        "games_played": int(rng.integers(1, 200)),
+        "avg_session_duration": rng.random() * 120,
+    }
+
+
+def camino_anterior(pd, model, predictor, player_data):
+    normalized_player_data = player_data.copy()
+    for feature, params in predictor.normalization_params.items():
+        if feature in normalized_player_data:
+            mean = params["mean"]
+            std = params["std"]
+            if std == 0:
+                normalized_player_data[feature] = 0.0
+            else:
+                normalized_player_data[feature] = (normalized_player_data[feature] - mean) / std
+    input_df = pd.DataFrame([normalized_player_data], columns=predictor.numerical_features)
+    return model.predict(input_df)[0]
+
+
+def camino_ndarray(predictor, player_data):
+    return str(predictor.model.predict(predictor._normalizar(predictor._matriz([player_data])))[0])
+
+
+def main():
+    import pandas as pd
+
+    warnings.filterwarnings("ignore")
+    predictor = SkillsPredictor(npz_path=None)
+    predictor_npz = SkillsPredictor()
+    # El camino anterior usa el modelo tal cual se guardó (con nombres de columnas)
+    with open(SKILL_LEVEL_MODEL_PATH, "rb") as f:
+        model = pickle.load(f)
+
+    rng = np.random.default_rng(0)
+    muestras = [datos_sinteticos(rng) for _ in range(200)]
+    assert all(camino_anterior(pd, model, predictor, d) == camino_ndarray(predictor, d)
+               == camino_ndarray(predictor_npz, d) for d in muestras)
+
+    print(f"Arranque (mediana de {ARRANQUES} procesos)")
+    print(f"  pickle con pandas: {medir_arranque('import pandas', 'npz_path=None'):8.1f} ms")
+    print(f"  pickle sin pandas: {medir_arranque('', 'npz_path=None'):8.1f} ms")
+    print(f"  npz con NumPy:     {medir_arranque('', ''):8.1f} ms")
+
+    print(f"\nLatencia por petición (media de {REPETICIONES}, sin base de datos)")
+    datos = muestras[0]
+    for nombre, fn in (
+        ("DataFrame + SVC", lambda: camino_anterior(pd, model, predictor, datos)),
+        ("ndarray + SVC", lambda: camino_ndarray(predictor, datos)),
+        ("ndarray + NumPy", lambda: camino_ndarray(predictor_npz, datos)),
+    ):
+        print(f"  {nombre:<16} {timeit.timeit(fn, number=REPETICIONES) / REPETICIONES * 1e6:8.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Micro-benchmark de la búsqueda de distractores de sugerir_ejercicio.
+
+Compara el camino anterior (una llamada a predict_proba por combinación, con
+el vector de cada candidata construido como en la versión original de
+UserModelManager: one-hot en float64 y np.concatenate) con el vectorizado (una sola llamada sobre la matriz precalculada) y con el
+puntuador de pesos compactos (suma de coeficientes con NumPy, sin sklearn).
+
+Uso (desde EarTrainer-Back):
+    python -m benchmarks.bench_sugerir
+"""
+import os
+import pickle
+import timeit
+from itertools import combinations
+
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+
+# El import de predictor crea la instancia de Database; no se conecta
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/eartrainer")
+
+from src.config import NOTAS_DISPONIBLES  # noqa: E402
+from src.ml import compact_weights  # noqa: E402
+from src.ml.predictor import UserModelManager, _candidatos  # noqa: E402
+
+REPETICIONES = 200
+
+
+def entrenar_modelo_sintetico(manager, n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    X, y = [], []
+    for _ in range(n):
+        mostradas = list(rng.choice(NOTAS_DISPONIBLES, 3, replace=False))
+        correcta = mostradas[0]
+        elegida = mostradas[rng.integers(3)]
+        X.append(manager._features(correcta, mostradas, elegida, rng.random() * 3, 1.0).ravel())
+        y.append(int(correcta != elegida))
+    model = SGDClassifier(loss="log_loss", penalty="l2", max_iter=1000, random_state=42)
+    model.partial_fit(np.stack(X), np.array(y), classes=[0, 1])
+    return model
+
+
+# Copia del codificador original de UserModelManager (antes de src/ml/features.py),
+# para medir el camino anterior tal como era
+def _one_hot_anterior(nota):
+    vec = np.zeros(len(NOTAS_DISPONIBLES))
+    if nota in NOTAS_DISPONIBLES:
+        idx = NOTAS_DISPONIBLES.index(nota)
+        vec[idx] = 1
+    return vec
+
+
+def _mostradas_one_hot_anterior(notas_mostradas):
+    vec = np.zeros(len(NOTAS_DISPONIBLES))
+    for n in notas_mostradas:
+        if n in NOTAS_DISPONIBLES:
+            idx = NOTAS_DISPONIBLES.index(n)
+            vec[idx] = 1
+    return vec
+
+
+def _features_anterior(nota_correcta, notas_mostradas, nota_elegida, tiempo_respuesta, dificultad):
+    correct_vec = _one_hot_anterior(nota_correcta)
+    elegida_vec = _one_hot_anterior(nota_elegida)
+    mostradas_vec = _mostradas_one_hot_anterior(notas_mostradas)
+    tiempo = float(tiempo_respuesta)
+    dificultad = float(dificultad)
+    return np.concatenate([correct_vec, elegida_vec, mostradas_vec, [tiempo, dificultad]]).reshape(1, -1)
+
+
+def camino_anterior(model, objetivo, num_distractores):
+    peor_prob = -1
+    mejor_distractores = None
+    posibles_distractores = [n for n in NOTAS_DISPONIBLES if n != objetivo]
+    for distractores_tuple in combinations(posibles_distractores, num_distractores):
+        distractores = list(distractores_tuple)
+        notas_mostradas = [objetivo] + distractores
+        X = _features_anterior(objetivo, notas_mostradas, objetivo, 1.0, 1.0)
+        prob_error = model.predict_proba(X)[0][1]
+        if prob_error > peor_prob:
+            peor_prob = prob_error
+            mejor_distractores = distractores
+    return mejor_distractores
+
+
+def camino_vectorizado(model, objetivo, num_distractores):
+    combos, X, _ = _candidatos(objetivo, num_distractores)
+    prob_error = model.predict_proba(X)[:, 1]
+    return list(combos[int(np.argmax(prob_error))])
+
+
+def camino_compacto(pesos, objetivo, num_distractores):
+    combos, _, indices = _candidatos(objetivo, num_distractores)
+    prob_error = compact_weights.puntuar(pesos, indices)
+    return list(combos[int(np.argmax(prob_error))])
+
+
+def main():
+    manager = UserModelManager()
+    model = entrenar_modelo_sintetico(manager)
+    pesos = compact_weights.exportar_pesos(model)
+    objetivo = "C"
+
+    print(f"{'k':>2} {'combos':>7} {'anterior (ms)':>14} {'vectorizado (ms)':>17} {'compacto (ms)':>14}")
+    for k in range(1, 6):
+        assert camino_anterior(model, objetivo, k) == camino_vectorizado(model, objetivo, k)
+        n_combos = len(_candidatos(objetivo, k)[0])
+        tiempos = [
+            timeit.timeit(fn, number=REPETICIONES) / REPETICIONES * 1000
+            for fn in (
+                lambda: camino_anterior(model, objetivo, k),
+                lambda: camino_vectorizado(model, objetivo, k),
+                lambda: camino_compacto(pesos, objetivo, k),
+            )
+        ]
+        print(f"{k:>2} {n_combos:>7} {tiempos[0]:>14.3f} {tiempos[1]:>17.3f} {tiempos[2]:>14.3f}")
+    print(f"\nTamaño por usuario: pickle {len(pickle.dumps(model))} bytes, compacto {pesos.nbytes} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Prueba de carga que simula partidas concurrentes de niños contra la API.
+
+Cada jugador simulado repite el flujo del cliente
+(EarTrainer-Front/src/services/api.service.ts y GameScreen.tsx):
+
+  1. crear usuario;
+  2. por cada partida: crear sesión con una dificultad al azar y jugar sus
+     rondas (5 en easy, 10 en medium y hard), cada una con sugerir_ejercicio
+     y registrar_intento, esperando el tiempo de respuesta del niño y los
+     2.5 s de retroalimentación de la pantalla;
+  3. al terminar la partida, como el cliente: get-skill-level, terminar
+     sesión y entrenar modelo a la vez;
+  4. al final, predict-skill-level.
+
+Con --bootstrap, cada partida empieza con una sola petición a
+/api/session/iniciar (usuario, sesión, nivel y primera sugerencia) en lugar
+de crear usuario, crear sesión y pedir la primera sugerencia por separado.
+En ambos casos se informa como "inicio de partida" el tiempo desde que el
+jugador empieza la partida hasta que tiene la primera nota.
+
+Informa, por endpoint, peticiones, errores, latencias p50/p95/p99 y
+rendimiento (peticiones/s). Con --output guarda el resultado en JSON, y con
+--baseline lo compara con uno anterior: termina con código 1 si el p95 de
+algún endpoint vigilado empeora más de --max-regression.
+
+Por defecto se lanza contra un servidor en marcha (--url), por ejemplo
+`uvicorn src.main:app --workers 4` sobre una base de datos local; el
+generador de carga también usa CPU, así que conviene ejecutarlo en otros
+núcleos o en otra máquina. Con --in-process la aplicación corre en el mismo
+proceso (útil para perfilar, pero las latencias incluyen al generador).
+
+Necesita httpx (pip install -r benchmarks/requirements.txt).
+
+Uso (desde EarTrainer-Back):
+    python -m benchmarks.load_test --players 2000 --ramp-up 60
+    python -m benchmarks.load_test --players 200 --think-scale 0 --output base.json
+    python -m benchmarks.load_test --players 200 --think-scale 0 --baseline base.json
+    python -m benchmarks.load_test --players 200 --think-scale 0 --bootstrap
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+
+import httpx
+import numpy as np
+
+NOTAS = ["C", "D", "E", "F", "G", "A", "B"]
+# Rondas y distractores por dificultad, como en GameScreen.tsx
+RONDAS = {"easy": 5, "medium": 10, "hard": 10}
+DISTRACTORES = {"easy": 2, "medium": 3, "hard": 6}
+# Pausa de la pantalla de retroalimentación entre rondas (segundos)
+PAUSA_RETROALIMENTACION = 2.5
+
+# Tiempo hasta tener la primera nota de cada partida (no es un endpoint)
+INICIO_PARTIDA = "-- inicio de partida"
+
+# Endpoints cuyo p95 se compara con --baseline
+VIGILADOS = ["POST /api/trainer/sugerir_ejercicio", "POST /api/session/registrar_intento", INICIO_PARTIDA]
+
+
+class Metricas:
+    """
+    Latencias (segundos) y códigos de respuesta por endpoint.
+    """
+
+    def __init__(self):
+        self.latencias: dict[str, list[float]] = defaultdict(list)
+        self.estados: dict[str, Counter] = defaultdict(Counter)
+
+    def registrar(self, endpoint: str, segundos: float, estado):
+        self.latencias[endpoint].append(segundos)
+        self.estados[endpoint][estado] += 1
+
+    def resumen(self, duracion: float) -> dict:
+        resultado = {}
+        for endpoint, latencias in sorted(self.latencias.items()):
+            ms = np.array(latencias) * 1000
+            estados = self.estados[endpoint]
+            resultado[endpoint] = {
+                "requests": len(ms),
+                "errors": sum(n for estado, n in estados.items() if not (isinstance(estado, int) and estado < 400)),
+                "statuses": {str(estado): n for estado, n in estados.items()},
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p95_ms": float(np.percentile(ms, 95)),
+                "p99_ms": float(np.percentile(ms, 99)),
+                "max_ms": float(ms.max()),
+                "rps": len(ms) / duracion,
+            }
+        return resultado
+
+
+class Cliente:
+    def __init__(self, http: httpx.AsyncClient, metricas: Metricas):
+        self.http = http
+        self.metricas = metricas
+
+    async def llamar(self, metodo: str, ruta: str, plantilla: str | None = None, **kwargs) -> httpx.Response | None:
+        """
+        Hace la petición y registra su latencia bajo "METODO plantilla".
+        Devuelve None si la petición falló o respondió con un error.
+        """
+        inicio = time.perf_counter()
+        try:
+            respuesta = await self.http.request(metodo, ruta, **kwargs)
+            estado = respuesta.status_code
+        except httpx.HTTPError as e:
+            respuesta, estado = None, type(e).__name__
+        self.metricas.registrar(f"{metodo} {plantilla or ruta}", time.perf_counter() - inicio, estado)
+        if respuesta is None or respuesta.status_code >= 400:
+            return None
+        return respuesta
+
+
+async def empezar_partida(cliente: Cliente, username: str, user_id: int | None, dificultad: str, args):
+    """
+    Devuelve (user_id, session_id, primera sugerencia), o None si algo falló.
+    """
+    inicio = time.perf_counter()
+    if args.bootstrap:
+        respuesta = await cliente.llamar("POST", "/api/session/iniciar", json={
+            "username": username, "dificultad": dificultad, "num_distractores": DISTRACTORES[dificultad],
+        })
+        if respuesta is None:
+            return None
+        datos = respuesta.json()
+        user_id, session_id, sugerencia = datos["user_id"], datos["session_id"], datos["sugerencias"][0]
+    else:
+        if user_id is None:
+            respuesta = await cliente.llamar("POST", "/api/user/crear_usuario", json={"username": username})
+            if respuesta is None:
+                return None
+            user_id = respuesta.json()["user_id"]
+        respuesta = await cliente.llamar("POST", "/api/session/crear",
+                                         json={"user_id": user_id, "dificultad": dificultad})
+        if respuesta is None:
+            return None
+        session_id = respuesta.json()["session_id"]
+        respuesta = await cliente.llamar("POST", "/api/trainer/sugerir_ejercicio",
+                                         json={"user_id": user_id, "num_distractores": DISTRACTORES[dificultad]})
+        if respuesta is None:
+            return None
+        sugerencia = respuesta.json()
+    cliente.metricas.registrar(INICIO_PARTIDA, time.perf_counter() - inicio, 200)
+    return user_id, session_id, sugerencia
+
+
+async def jugador(cliente: Cliente, n: int, ejecucion: str, args, rng: random.Random):
+    await asyncio.sleep(rng.random() * args.ramp_up)
+    username = f"load-{ejecucion}-{n}"
+    user_id = None
+    # Cada niño tiene su propia probabilidad de acertar y su ritmo de respuesta
+    acierto = rng.uniform(0.4, 0.95)
+    ritmo = rng.uniform(0.7, 1.5)
+
+    for _ in range(args.sessions):
+        dificultad = rng.choice(list(RONDAS))
+        inicio = await empezar_partida(cliente, username, user_id, dificultad, args)
+        if inicio is None:
+            return
+        user_id, session_id, sugerencia = inicio
+
+        for ronda in range(RONDAS[dificultad]):
+            if ronda > 0:
+                respuesta = await cliente.llamar("POST", "/api/trainer/sugerir_ejercicio",
+                                                 json={"user_id": user_id, "num_distractores": DISTRACTORES[dificultad]})
+                if respuesta is None:
+                    return
+                sugerencia = respuesta.json()
+            mostradas = sugerencia["distractores"] + [sugerencia["objetivo"]]
+            elegida = sugerencia["objetivo"] if rng.random() < acierto else rng.choice(mostradas)
+            tiempo_respuesta = rng.uniform(0.8, 4.0) * ritmo
+            await asyncio.sleep(tiempo_respuesta * args.think_scale)
+            await cliente.llamar("POST", "/api/session/registrar_intento", json={
+                "session_id": session_id,
+                "nota_correcta": sugerencia["objetivo"],
+                "notas_mostradas": mostradas,
+                "nota_elegida": elegida,
+                "tiempo_respuesta": tiempo_respuesta,
+                "es_correcto": elegida == sugerencia["objetivo"],
+            })
+            await asyncio.sleep(PAUSA_RETROALIMENTACION * args.think_scale)
+
+        # El cliente lanza las tres peticiones a la vez al terminar la partida
+        await asyncio.gather(
+            cliente.llamar("GET", f"/api/skill/get-skill-level/{user_id}", "/api/skill/get-skill-level/{user_id}"),
+            cliente.llamar("POST", "/api/session/terminar", json={"session_id": session_id}),
+            cliente.llamar("POST", "/api/trainer/entrenar_modelo", json={"user_id": user_id, "session_id": session_id}),
+        )
+
+    await cliente.llamar("POST", f"/api/skill/predict-skill-level/{user_id}", "/api/skill/predict-skill-level/{user_id}")
+
+
+def imprimir(resumen: dict, duracion: float, jugadores: int):
+    total = sum(r["requests"] for endpoint, r in resumen.items() if endpoint != INICIO_PARTIDA)
+    print(f"\n{jugadores} jugadores, {total} peticiones en {duracion:.1f} s ({total / duracion:.1f} peticiones/s)\n")
+    print(f"{'endpoint':<48} {'peticiones':>10} {'errores':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+    for endpoint, r in resumen.items():
+        print(f"{endpoint:<48} {r['requests']:>10} {r['errors']:>8} {r['p50_ms']:>8.1f} "
+              f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['rps']:>8.1f}")
+
+
+def comparar(resumen: dict, baseline_path: str, max_regresion: float) -> bool:
+    """
+    Compara el p95 de los endpoints vigilados con el de una ejecución anterior.
+    Devuelve False si alguno empeoró más de max_regresion (fracción).
+    """
+    with open(baseline_path, 'r') as f:
+        base = json.load(f)["endpoints"]
+    correcto = True
+    print(f"\nComparación con {baseline_path} (p95, máximo +{max_regresion * 100:.0f}%)")
+    for endpoint in VIGILADOS:
+        if endpoint not in resumen or endpoint not in base:
+            continue
+        antes, ahora = base[endpoint]["p95_ms"], resumen[endpoint]["p95_ms"]
+        cambio = ahora / antes - 1 if antes else 0.0
+        regresion = cambio > max_regresion
+        correcto &= not regresion
+        print(f"  {endpoint:<46} {antes:8.1f} -> {ahora:8.1f} ms ({cambio * 100:+.0f}%){'  REGRESIÓN' if regresion else ''}")
+    return correcto
+
+
+async def ejecutar(args, http: httpx.AsyncClient) -> tuple[dict, float]:
+    metricas = Metricas()
+    cliente = Cliente(http, metricas)
+    ejecucion = uuid.uuid4().hex[:8]
+    rng = random.Random(args.seed)
+    inicio = time.perf_counter()
+    await asyncio.gather(*(
+        jugador(cliente, n, ejecucion, args, random.Random(rng.random())) for n in range(args.players)
+    ))
+    duracion = time.perf_counter() - inicio
+    return metricas.resumen(duracion), duracion
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000", help="URL base del servidor")
+    parser.add_argument("--in-process", action="store_true", help="Ejecuta la aplicación en este proceso (ASGI)")
+    parser.add_argument("--players", type=int, default=100, help="Jugadores simultáneos")
+    parser.add_argument("--sessions", type=int, default=2, help="Partidas por jugador")
+    parser.add_argument("--ramp-up", type=float, default=10.0, help="Segundos en los que van entrando los jugadores")
+    parser.add_argument("--think-scale", type=float, default=1.0,
+                        help="Escala de las pausas del niño y de la pantalla (0: sin pausas, máxima carga)")
+    parser.add_argument("--bootstrap", action="store_true",
+                        help="Empieza cada partida con /api/session/iniciar (una sola petición)")
+    parser.add_argument("--max-connections", type=int, default=1000, help="Conexiones HTTP abiertas como máximo")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Guarda el resumen en este archivo JSON")
+    parser.add_argument("--baseline", help="Resumen JSON de una ejecución anterior para comparar")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Empeoramiento máximo del p95 (fracción)")
+    args = parser.parse_args()
+
+    limites = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    if args.in_process:
+        from src.main import app
+
+        async with app.router.lifespan_context(app):
+            transporte = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transporte, base_url="http://load-test", timeout=args.timeout) as http:
+                resumen, duracion = await ejecutar(args, http)
+    else:
+        async with httpx.AsyncClient(base_url=args.url, limits=limites, timeout=args.timeout) as http:
+            resumen, duracion = await ejecutar(args, http)
+
+    imprimir(resumen, duracion, args.players)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"players": args.players, "sessions": args.sessions, "think_scale": args.think_scale,
+                       "bootstrap": args.bootstrap, "duration_s": duracion, "endpoints": resumen}, f, indent=2)
+        print(f"\nResumen guardado en {args.output}")
+    if args.baseline and not comparar(resumen, args.baseline, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,4 +1,7 @@
 import os
+from dotenv import load_dotenv
+
+load_dotenv()  # Cargar variables de .env
 
 NOTAS_DISPONIBLES = ["C", "D", "E", "F", "G", "A", "B"]
 
@@ -13,3 +16,59 @@ os.makedirs(GENERAL_MODELS_DIR, exist_ok=True)
 
 SKILL_LEVEL_MODEL_PATH = os.path.join(GENERAL_MODELS_DIR, "skill_level_model.pkl")
 SKILL_LEVEL_PARAMS_PATH = os.path.join(GENERAL_MODELS_DIR, "skill_level_model.json")
+# Modelo exportado con MLTraining/svm_export.py; si existe se usa en lugar del pickle y el JSON
+SKILL_LEVEL_NPZ_PATH = os.path.join(GENERAL_MODELS_DIR, "skill_level_model.npz")
+
+# Límites de la caché en memoria de modelos de usuario (ver src/ml/model_cache.py)
+MODEL_CACHE_MAX_ENTRIES = int(os.getenv("MODEL_CACHE_MAX_ENTRIES", "1024"))
+MODEL_CACHE_MAX_BYTES = int(os.getenv("MODEL_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Guardar los modelos de usuario como pesos compactos float32 en lugar de pickle
+MODEL_COMPACT_WEIGHTS = os.getenv("MODEL_COMPACT_WEIGHTS", "false").lower() in ("1", "true", "yes")
+
+# Búfer de intentos en el servidor: agrupa los intentos y los escribe por lotes
+ATTEMPT_BUFFER_ENABLED = os.getenv("ATTEMPT_BUFFER_ENABLED", "false").lower() in ("1", "true", "yes")
+ATTEMPT_BUFFER_MAX_SIZE = int(os.getenv("ATTEMPT_BUFFER_MAX_SIZE", "20"))
+ATTEMPT_BUFFER_FLUSH_INTERVAL = float(os.getenv("ATTEMPT_BUFFER_FLUSH_INTERVAL", "1.0"))
+
+# Sugerencias precalculadas por usuario (0 = deshabilitado) y máximo de usuarios con cola
+SUGGESTION_QUEUE_SIZE = int(os.getenv("SUGGESTION_QUEUE_SIZE", "0"))
+SUGGESTION_QUEUE_MAX_USERS = int(os.getenv("SUGGESTION_QUEUE_MAX_USERS", "1024"))
+
+# Cola de trabajos de entrenamiento: tareas concurrentes y trabajos terminados que se conservan
+TRAINING_WORKERS = int(os.getenv("TRAINING_WORKERS", "2"))
+TRAINING_JOBS_RETAINED = int(os.getenv("TRAINING_JOBS_RETAINED", "1000"))
+
+# Segundos entre comprobaciones de la versión de un modelo en caché contra la
+# base de datos, para ver los modelos que entrena otro worker o retrain_all
+# (negativo = no comprobar; solo con un único worker y sin reentrenamientos
+# con el servidor en marcha)
+MODEL_VERSION_CHECK_INTERVAL = float(os.getenv("MODEL_VERSION_CHECK_INTERVAL", "5"))
+
+# Caché de características y nivel de habilidad por usuario: máximo de usuarios y TTL en segundos
+SKILL_CACHE_MAX_ENTRIES = int(os.getenv("SKILL_CACHE_MAX_ENTRIES", "10000"))
+SKILL_CACHE_TTL = float(os.getenv("SKILL_CACHE_TTL", "300"))
+
+# Ventana de intentos recientes por usuario con la que se evita repetir
+# objetivos al sugerir (ver src/ml/recent_attempts.py): intentos por usuario
+# (como mucho una nota menos de las disponibles), máximo de usuarios y
+# segundos tras los que se vuelve a leer de la base de datos o, si el
+# usuario está inactivo, se descarta
+RECENT_ATTEMPTS_WINDOW = int(os.getenv("RECENT_ATTEMPTS_WINDOW", "3"))
+RECENT_ATTEMPTS_MAX_USERS = int(os.getenv("RECENT_ATTEMPTS_MAX_USERS", "10000"))
+RECENT_ATTEMPTS_TTL = float(os.getenv("RECENT_ATTEMPTS_TTL", "300"))
+
+# Profiler de muestreo por petición (cabecera X-Profile: 1 o ?profile=1; ver src/profiler.py):
+# habilitado, segundos entre muestras y perfiles que se conservan
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL", "0.001"))
+PROFILER_MAX_PROFILES = int(os.getenv("PROFILER_MAX_PROFILES", "20"))
+
+# Pool de conexiones a PostgreSQL: conexiones mínimas y máximas, segundos
+# máximos por sentencia en el servidor (0 = sin límite) y sentencias
+# preparadas que asyncpg conserva por conexión (0 = no reutilizarlas, p. ej.
+# detrás de PgBouncer en modo transacción)
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_STATEMENT_TIMEOUT = float(os.getenv("DB_STATEMENT_TIMEOUT", "30"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
@@ -0,0 +1,147 @@
+import asyncio
+
+from src.config import ATTEMPT_BUFFER_ENABLED, ATTEMPT_BUFFER_MAX_SIZE, ATTEMPT_BUFFER_FLUSH_INTERVAL
+from src.db import crud
+from src.ml.model_cache import ModelCache
+
+# Sesiones abiertas que recuerda cada proceso, para no consultarlas en cada intento
+MAX_SESIONES_ABIERTAS = 10000
+
+
+class SesionTerminadaError(ValueError):
+    """
+    Intentos para sesiones que no existen o ya están terminadas: sus
+    agregados de habilidad se sumaron al cerrarlas y no incluirían el intento.
+    """
+
+    def __init__(self, session_ids: list[int]):
+        self.session_ids = session_ids
+        super().__init__(f"Las sesiones {session_ids} no existen o ya están terminadas")
+
+
+class AttemptBuffer:
+    """
+    Búfer en memoria de intentos de nota pendientes de escribir.
+
+    Agrupa los intentos por sesión y los escribe de una vez (ver
+    crud.log_note_attempts) cuando una sesión acumula `max_size` intentos,
+    cuando vence el temporizador (todas las sesiones juntas) o cuando se
+    vacía explícitamente una sesión (al cerrarla o antes de entrenar con ella).
+    Si está deshabilitado, cada llamada a `add` escribe de inmediato.
+
+    `add` rechaza los intentos de sesiones terminadas (SesionTerminadaError).
+    Las sesiones creadas o cerradas en este proceso se anotan con
+    `sesion_abierta` y `sesion_terminada`; las demás se consultan una vez. Si
+    otro worker cierra una sesión que este cree abierta, la propia inserción
+    descarta sus intentos (ver crud.LOG_NOTE_ATTEMPT).
+    """
+
+    def __init__(self, enabled: bool = ATTEMPT_BUFFER_ENABLED, max_size: int = ATTEMPT_BUFFER_MAX_SIZE,
+                 flush_interval: float = ATTEMPT_BUFFER_FLUSH_INTERVAL):
+        self.enabled = enabled
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self._pending: dict[int, list[dict]] = {}
+        self._task: asyncio.Task | None = None
+        # Serializa las escrituras: vaciar una sesión espera a las que ya están en curso
+        self._write_lock = asyncio.Lock()
+        self._abiertas = ModelCache(max_entries=MAX_SESIONES_ABIERTAS)
+
+    async def add(self, attempts: list[dict]):
+        """
+        Encola (o escribe directamente, si el búfer está deshabilitado) una
+        lista de intentos. Si alguno es de una sesión terminada no se registra ninguno.
+        """
+        await self._comprobar_sesiones({intento["session_id"] for intento in attempts})
+        if not self.enabled:
+            await crud.log_note_attempts(attempts)
+            return
+        llenas = set()
+        for intento in attempts:
+            pendientes = self._pending.setdefault(intento["session_id"], [])
+            pendientes.append(intento)
+            if len(pendientes) >= self.max_size:
+                llenas.add(intento["session_id"])
+        for session_id in llenas:
+            await self.flush_session(session_id)
+
+    def sesion_abierta(self, session_id: int):
+        self._abiertas.put(session_id, True)
+
+    def sesion_terminada(self, session_id: int):
+        self._abiertas.pop(session_id)
+
+    async def _comprobar_sesiones(self, session_ids: set[int]):
+        terminadas = []
+        for session_id in session_ids:
+            if session_id in self._abiertas:
+                continue
+            sesion = await crud.get_training_session(session_id)
+            if sesion is None or sesion["finished_at"] is not None:
+                terminadas.append(session_id)
+            else:
+                self._abiertas.put(session_id, True)
+        if terminadas:
+            raise SesionTerminadaError(sorted(terminadas))
+
+    async def flush_session(self, session_id: int):
+        """
+        Escribe los intentos pendientes de una sesión. Al volver, todos sus
+        intentos recibidos hasta entonces están en la base de datos; si no se
+        pueden escribir, se propaga el error.
+        """
+        while True:
+            batch = self._pending.pop(session_id, None)
+            if batch:
+                await self._write({session_id: batch})
+                continue
+            # Esperar a que termine cualquier escritura en curso que pueda incluir la sesión
+            async with self._write_lock:
+                pass
+            # Si esa escritura falló, sus intentos volvieron al búfer: se escriben en la siguiente vuelta
+            if session_id not in self._pending:
+                return
+
+    async def flush(self):
+        """
+        Escribe los intentos pendientes de todas las sesiones de una vez.
+        """
+        if self._pending:
+            pending, self._pending = self._pending, {}
+            await self._write(pending)
+
+    async def _write(self, pending: dict[int, list[dict]]):
+        async with self._write_lock:
+            try:
+                await crud.log_note_attempts([intento for batch in pending.values() for intento in batch])
+            except Exception:
+                # Devolver los intentos al búfer (delante de los nuevos) para reintentar
+                for session_id, batch in pending.items():
+                    self._pending[session_id] = batch + self._pending.get(session_id, [])
+                raise
+
+    def pending_count(self) -> int:
+        return sum(len(batch) for batch in self._pending.values())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error al escribir los intentos en búfer: {e}")
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+
+# Instancia global del búfer de intentos
+attempt_buffer = AttemptBuffer()
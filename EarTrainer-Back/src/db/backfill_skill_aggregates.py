@@ -0,0 +1,27 @@
+"""
+Reconstruye la tabla user_skill_aggregates a partir del historial completo
+de sesiones e intentos. Se ejecuta una vez al desplegar la tabla (o si los
+agregados se desincronizan):
+
+    python -m src.db.backfill_skill_aggregates
+"""
+import asyncio
+import time
+
+from src.db import crud
+from src.db.database import database
+
+
+async def main():
+    await database.connect()
+    try:
+        inicio = time.perf_counter()
+        n_usuarios = await crud.rebuild_user_skill_aggregates()
+        print(f"Agregados de habilidad reconstruidos para {n_usuarios} usuarios "
+              f"en {time.perf_counter() - inicio:.2f} s")
+    finally:
+        await database.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
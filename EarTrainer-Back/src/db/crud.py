@@ -1,83 +1,327 @@
 # src/db/crud.py
 
-from src.db.database import database
+from datetime import datetime
+
+from src.db.database import database, conexion
+from src.db.statements import Sentencia
+from src.metrics import medir_consulta
+
+# Cada consulta es una Sentencia con nombre y parámetros posicionales ($1, $2...):
+# asyncpg la prepara una vez por conexión y reutiliza su plan (ver src/db/statements.py)
+
+# Funciones a las que se avisa con (user_id, finished_at) cada vez que se cierra una sesión
+_session_closed_listeners = []
+
+def add_session_closed_listener(callback):
+    _session_closed_listeners.append(callback)
+
+def remove_session_closed_listener(callback):
+    if callback in _session_closed_listeners:
+        _session_closed_listeners.remove(callback)
+
+def _ahora() -> datetime:
+    # Hora local sin zona, como created_at de note_training_logs (TIMESTAMP) y
+    # los created_at que ponen los routers al recibir cada intento
+    return datetime.now().replace(tzinfo=None)
 
 # Crear nueva sesión de entrenamiento
-async def create_training_session(user_id: int, dificultad: str) -> int:
-    query = """
+CREATE_TRAINING_SESSION = Sentencia("create_training_session", """
     INSERT INTO training_sessions (user_id, dificultad)
-    VALUES (:user_id, :dificultad)
+    VALUES ($1, $2)
     RETURNING id
-    """
-    values = {"user_id": user_id, "dificultad": dificultad}
-    session_id = await database.execute(query=query, values=values)
+""")
+
+@medir_consulta
+async def create_training_session(user_id: int, dificultad: str) -> int:
+    session_id = await CREATE_TRAINING_SESSION.fetchval(user_id, dificultad)
     return session_id
 
 # Actualizar estadísticas al finalizar la sesión
+UPDATE_TRAINING_SESSION = Sentencia("update_training_session", """
+    WITH closed AS (
+        UPDATE training_sessions
+        SET finished_at = $2
+        WHERE id = $1 AND finished_at IS NULL
+        RETURNING id, user_id, dificultad, started_at, finished_at
+    ),
+    session_stats AS (
+        SELECT
+            c.user_id,
+            c.dificultad,
+            CAST(EXTRACT(EPOCH FROM (c.finished_at - c.started_at)) AS DOUBLE PRECISION) AS duration,
+            COUNT(ntl.id) AS attempt_count,
+            COUNT(ntl.id) FILTER (WHERE ntl.es_correcto) AS correct_count,
+            SUM(CAST(ntl.tiempo_respuesta AS DOUBLE PRECISION)) AS response_time_sum
+        FROM closed c
+        JOIN note_training_logs ntl ON ntl.session_id = c.id
+        GROUP BY c.user_id, c.dificultad, c.started_at, c.finished_at
+    ),
+    qualifying AS (
+        SELECT * FROM session_stats
+        WHERE (dificultad = 'easy' AND attempt_count >= 5)
+           OR (dificultad IN ('medium', 'hard') AND attempt_count >= 10)
+    ),
+    upserted AS (
+        INSERT INTO user_skill_aggregates (
+            user_id, correct_easy, total_easy, correct_medium, total_medium,
+            correct_hard, total_hard, response_time_sum, response_time_count,
+            games_played, session_duration_sum, updated_at
+        )
+        SELECT
+            user_id,
+            CASE WHEN dificultad = 'easy' THEN correct_count ELSE 0 END,
+            CASE WHEN dificultad = 'easy' THEN attempt_count ELSE 0 END,
+            CASE WHEN dificultad = 'medium' THEN correct_count ELSE 0 END,
+            CASE WHEN dificultad = 'medium' THEN attempt_count ELSE 0 END,
+            CASE WHEN dificultad = 'hard' THEN correct_count ELSE 0 END,
+            CASE WHEN dificultad = 'hard' THEN attempt_count ELSE 0 END,
+            response_time_sum,
+            attempt_count,
+            1,
+            duration,
+            NOW()
+        FROM qualifying
+        ON CONFLICT (user_id) DO UPDATE
+        SET correct_easy = user_skill_aggregates.correct_easy + EXCLUDED.correct_easy,
+            total_easy = user_skill_aggregates.total_easy + EXCLUDED.total_easy,
+            correct_medium = user_skill_aggregates.correct_medium + EXCLUDED.correct_medium,
+            total_medium = user_skill_aggregates.total_medium + EXCLUDED.total_medium,
+            correct_hard = user_skill_aggregates.correct_hard + EXCLUDED.correct_hard,
+            total_hard = user_skill_aggregates.total_hard + EXCLUDED.total_hard,
+            response_time_sum = user_skill_aggregates.response_time_sum + EXCLUDED.response_time_sum,
+            response_time_count = user_skill_aggregates.response_time_count + EXCLUDED.response_time_count,
+            games_played = user_skill_aggregates.games_played + EXCLUDED.games_played,
+            session_duration_sum = user_skill_aggregates.session_duration_sum + EXCLUDED.session_duration_sum,
+            updated_at = NOW()
+    )
+    SELECT user_id, finished_at FROM closed
+""")
+
+# Bloquea la sesión hasta el final de la transacción: espera a que terminen las
+# inserciones de intentos en curso (que la bloquean con FOR KEY SHARE) y frena las nuevas
+LOCK_TRAINING_SESSION = Sentencia("lock_training_session",
+                                  "SELECT 1 FROM training_sessions WHERE id = $1 FOR UPDATE")
+
+@medir_consulta
 async def update_training_session(session_id: int, finished_at):
+    """
+    Marca la sesión como terminada y, si cumple los criterios de intentos
+    (5 para easy, 10 para medium y hard), suma sus estadísticas a
+    user_skill_aggregates en la misma sentencia.
+
+    Solo se aplica la primera vez que se cierra la sesión, para que los
+    agregados no cuenten dos veces la misma sesión. En ese caso se avisa a
+    los listeners registrados con add_session_closed_listener.
+
+    La sesión se bloquea antes de sumar sus intentos, así que los agregados
+    incluyen todos los intentos insertados antes del cierre, y
+    log_note_attempts descarta los que llegan después.
+    """
     # finished_at debe ser un objeto datetime.datetime, no string
-    query = """
-    UPDATE training_sessions
-    SET finished_at = :finished_at
-    WHERE id = :session_id
-    """
-    values = {
-        "finished_at": finished_at,
-        "session_id": session_id,
-    }
-    await database.execute(query=query, values=values)
+    async with database.transaction():
+        await LOCK_TRAINING_SESSION.execute(session_id)
+        closed = await UPDATE_TRAINING_SESSION.fetchrow(session_id, finished_at)
+    if closed:
+        for callback in _session_closed_listeners:
+            callback(closed["user_id"], closed["finished_at"])
+
+# Reconstruir desde cero los agregados de habilidad de todos los usuarios
+REBUILD_USER_SKILL_AGGREGATES = Sentencia("rebuild_user_skill_aggregates", """
+    INSERT INTO user_skill_aggregates (
+        user_id, correct_easy, total_easy, correct_medium, total_medium,
+        correct_hard, total_hard, response_time_sum, response_time_count,
+        games_played, session_duration_sum, updated_at
+    )
+    SELECT
+        ts.user_id,
+        COALESCE(SUM(sa.correct_count) FILTER (WHERE ts.dificultad = 'easy'), 0),
+        COALESCE(SUM(sa.attempt_count) FILTER (WHERE ts.dificultad = 'easy'), 0),
+        COALESCE(SUM(sa.correct_count) FILTER (WHERE ts.dificultad = 'medium'), 0),
+        COALESCE(SUM(sa.attempt_count) FILTER (WHERE ts.dificultad = 'medium'), 0),
+        COALESCE(SUM(sa.correct_count) FILTER (WHERE ts.dificultad = 'hard'), 0),
+        COALESCE(SUM(sa.attempt_count) FILTER (WHERE ts.dificultad = 'hard'), 0),
+        SUM(sa.response_time_sum),
+        SUM(sa.attempt_count),
+        COUNT(ts.id),
+        SUM(CAST(EXTRACT(EPOCH FROM (ts.finished_at - ts.started_at)) AS DOUBLE PRECISION)),
+        NOW()
+    FROM
+        training_sessions ts
+    JOIN (
+        SELECT
+            session_id,
+            COUNT(id) AS attempt_count,
+            COUNT(id) FILTER (WHERE es_correcto) AS correct_count,
+            SUM(CAST(tiempo_respuesta AS DOUBLE PRECISION)) AS response_time_sum
+        FROM note_training_logs
+        GROUP BY session_id
+    ) AS sa ON ts.id = sa.session_id
+    WHERE
+        ts.finished_at IS NOT NULL AND
+        (
+            (ts.dificultad = 'easy' AND sa.attempt_count >= 5) OR
+            (ts.dificultad IN ('medium', 'hard') AND sa.attempt_count >= 10)
+        )
+    GROUP BY
+        ts.user_id
+""")
+TRUNCATE_USER_SKILL_AGGREGATES = Sentencia("truncate_user_skill_aggregates",
+                                           "TRUNCATE TABLE user_skill_aggregates")
+COUNT_USER_SKILL_AGGREGATES = Sentencia("count_user_skill_aggregates",
+                                        "SELECT COUNT(*) FROM user_skill_aggregates")
+# Las reconstrucciones y los recorridos completos no tienen el límite de DB_STATEMENT_TIMEOUT
+SIN_STATEMENT_TIMEOUT = Sentencia("sin_statement_timeout", "SET LOCAL statement_timeout = 0")
+
+@medir_consulta
+async def rebuild_user_skill_aggregates() -> int:
+    """
+    Recalcula user_skill_aggregates a partir de training_sessions y
+    note_training_logs, con los mismos criterios que update_training_session.
+
+    Returns:
+        int: El número de usuarios con agregados tras la reconstrucción.
+    """
+    async with database.transaction():
+        await SIN_STATEMENT_TIMEOUT.execute()
+        await TRUNCATE_USER_SKILL_AGGREGATES.execute()
+        await REBUILD_USER_SKILL_AGGREGATES.execute()
+        return await COUNT_USER_SKILL_AGGREGATES.fetchval()
 
 # Obtener sesiones de un usuario
-async def get_user_sessions(user_id: int):
-    query = """
+GET_USER_SESSIONS = Sentencia("get_user_sessions", """
     SELECT * FROM training_sessions
-    WHERE user_id = :user_id
+    WHERE user_id = $1
     ORDER BY started_at DESC
-    """
-    return await database.fetch_all(query=query, values={"user_id": user_id})
+""")
+
+@medir_consulta
+async def get_user_sessions(user_id: int):
+    return await GET_USER_SESSIONS.fetch(user_id)
 
 
 # ----------------------------------------------------------------------
 # ----------------------------------------------------------------------
 
-# Registrar intento de nota
-async def log_note_attempt(session_id: int, nota_correcta: str, notas_mostradas: list[str],
-                           nota_elegida: str, tiempo_respuesta: float, es_correcto: bool):
-    query = """
+# Registrar intento de nota. created_at siempre lo pone la aplicación (nunca el
+# DEFAULT de la columna): los intentos se ordenan por created_at, y mezclar el
+# reloj del servidor de base de datos con el de la aplicación los desordenaría.
+# Solo se inserta si la sesión sigue abierta: sus agregados de habilidad se
+# suman al cerrarla (update_training_session) y no verían intentos posteriores.
+# FOR KEY SHARE espera a un cierre en curso (que bloquea la fila con FOR
+# UPDATE) y vuelve a comprobar finished_at cuando termina.
+LOG_NOTE_ATTEMPT = Sentencia("log_note_attempt", """
     INSERT INTO note_training_logs (
         session_id, nota_correcta, notas_mostradas, nota_elegida,
-        tiempo_respuesta, es_correcto
-    )
-    VALUES (
-        :session_id, :nota_correcta, :notas_mostradas, :nota_elegida,
-        :tiempo_respuesta, :es_correcto
+        tiempo_respuesta, es_correcto, created_at
     )
+    SELECT id, $2, $3::text[], $4, $5::real, $6::boolean, $7::timestamp
+    FROM training_sessions
+    WHERE id = $1 AND finished_at IS NULL
+    FOR KEY SHARE
+""")
+
+@medir_consulta
+async def log_note_attempt(session_id: int, nota_correcta: str, notas_mostradas: list[str],
+                           nota_elegida: str, tiempo_respuesta: float, es_correcto: bool):
+    await LOG_NOTE_ATTEMPT.execute(session_id, nota_correcta, notas_mostradas, nota_elegida,
+                                   tiempo_respuesta, es_correcto, _ahora())
+
+# Registrar varios intentos con la misma sentencia preparada, en un solo viaje
+@medir_consulta
+async def log_note_attempts(attempts: list[dict]):
     """
-    values = {
-        "session_id": session_id,
-        "nota_correcta": nota_correcta,
-        "notas_mostradas": notas_mostradas,
-        "nota_elegida": nota_elegida,
-        "tiempo_respuesta": tiempo_respuesta,
-        "es_correcto": es_correcto,
-    }
-    await database.execute(query=query, values=values)
+    Inserta varios intentos de nota con executemany de la sentencia de
+    log_note_attempt: todas las filas van en un solo viaje a la base de
+    datos y se insertan de forma atómica. A diferencia de un INSERT
+    multi-fila, el texto de la sentencia no depende del número de filas, así
+    que se prepara una sola vez.
+
+    Cada intento es un dict con las mismas claves que los argumentos de
+    log_note_attempt y, opcionalmente, 'created_at' (momento en que se
+    recibió el intento). Si falta, se usa el momento actual de la aplicación.
+    Los intentos de sesiones que no existen o ya están terminadas se
+    descartan (ver LOG_NOTE_ATTEMPT).
+    """
+    if not attempts:
+        return
+    ahora = _ahora()
+    await LOG_NOTE_ATTEMPT.executemany([
+        (intento["session_id"], intento["nota_correcta"], intento["notas_mostradas"], intento["nota_elegida"],
+         intento["tiempo_respuesta"], intento["es_correcto"], intento.get("created_at") or ahora)
+        for intento in attempts
+    ])
 
 # Obtener todos los intentos de una sesión
+GET_ATTEMPTS_BY_SESSION = Sentencia("get_attempts_by_session", """
+    SELECT * FROM note_training_logs
+    WHERE session_id = $1
+    ORDER BY created_at, id
+""")
+
+@medir_consulta
 async def get_attempts_by_session(session_id: int):
-    query = "SELECT * FROM note_training_logs WHERE session_id = :session_id"
-    return await database.fetch_all(query=query, values={"session_id": session_id})
+    return await GET_ATTEMPTS_BY_SESSION.fetch(session_id)
 
-async def get_last_n_note_attempts(user_id: int, n: int):
-    query = f"""
+# Top-N por sesión y después top-N global: cada sesión del usuario aporta como
+# mucho n filas leídas en orden del índice (session_id, created_at DESC, id DESC),
+# en lugar de leer y ordenar todos los intentos del usuario antes del LIMIT.
+# El LIMIT es un parámetro: la misma sentencia preparada sirve para cualquier n
+GET_LAST_N_NOTE_ATTEMPTS = Sentencia("get_last_n_note_attempts", """
     SELECT ntl.*
+    FROM training_sessions ts
+    CROSS JOIN LATERAL (
+        SELECT *
+        FROM note_training_logs
+        WHERE session_id = ts.id
+        ORDER BY created_at DESC, id DESC
+        LIMIT $2
+    ) ntl
+    WHERE ts.user_id = $1
+    ORDER BY ntl.created_at DESC, ntl.id DESC
+    LIMIT $2
+""")
+
+@medir_consulta
+async def get_last_n_note_attempts(user_id: int, n: int):
+    return await GET_LAST_N_NOTE_ATTEMPTS.fetch(user_id, n)
+
+GET_SESSION_USER = Sentencia("get_session_user", "SELECT user_id FROM training_sessions WHERE id = $1")
+
+@medir_consulta
+async def get_session_user(session_id: int) -> int | None:
+    return await GET_SESSION_USER.fetchval(session_id)
+
+GET_TRAINING_SESSION = Sentencia("get_training_session",
+                                 "SELECT user_id, finished_at FROM training_sessions WHERE id = $1")
+
+@medir_consulta
+async def get_training_session(session_id: int):
+    return await GET_TRAINING_SESSION.fetchrow(session_id)
+
+# Recorrer todos los intentos agrupados por usuario y sesión, sin cargar la tabla en memoria
+ITERATE_ATTEMPTS_BY_USER = Sentencia("iterate_attempts_by_user", """
+    SELECT ts.user_id, ntl.session_id, ntl.nota_correcta, ntl.notas_mostradas,
+           ntl.nota_elegida, ntl.tiempo_respuesta
     FROM note_training_logs ntl
     JOIN training_sessions ts ON ntl.session_id = ts.id
-    WHERE ts.user_id = :user_id
-    ORDER BY ntl.created_at DESC
-    LIMIT {n}
+    ORDER BY ts.user_id, ts.started_at, ts.id, ntl.created_at, ntl.id
+""")
+
+@medir_consulta
+async def iterate_attempts_by_user(fetch_size: int = 10000):
+    """
+    Devuelve (async generator) todos los intentos de note_training_logs
+    ordenados por usuario, sesión (en el orden en que empezaron) e intento.
+    Usa un cursor del lado del servidor que trae `fetch_size` filas por viaje.
+    El orden lo dan los índices de las migraciones 001 y 004: sin el de la 004
+    Postgres ordena en memoria el historial completo de cada usuario.
     """
-    return await database.fetch_all(query=query, values={"user_id": user_id})
+    async with conexion() as connection:
+        # Los cursores de asyncpg solo existen dentro de una transacción
+        async with connection.transaction():
+            await connection.execute(SIN_STATEMENT_TIMEOUT.sql)
+            async for record in connection.cursor(ITERATE_ATTEMPTS_BY_USER.sql, prefetch=fetch_size):
+                yield record
 
 
 # ----------------------------------------------------------------------
@@ -85,46 +329,162 @@ async def get_last_n_note_attempts(user_id: int, n: int):
 
 
 # Guardar o actualizar modelo entrenado por usuario
-async def save_user_model(user_id: int, modelo_path: str, accuracy: float):
-    query = """
-    INSERT INTO user_models (user_id, modelo_path, last_trained_at, accuracy)
-    VALUES (:user_id, :modelo_path, NOW(), :accuracy)
+GET_USER_MODEL_PATH_FOR_UPDATE = Sentencia("get_user_model_path_for_update",
+                                           "SELECT modelo_path FROM user_models WHERE user_id = $1 FOR UPDATE")
+SAVE_USER_MODEL = Sentencia("save_user_model", """
+    INSERT INTO user_models (user_id, modelo_path, last_trained_at, accuracy, version)
+    VALUES ($1, $2, NOW(), $3, 1)
     ON CONFLICT (user_id) DO UPDATE
     SET modelo_path = EXCLUDED.modelo_path,
         last_trained_at = NOW(),
-        accuracy = EXCLUDED.accuracy
+        accuracy = EXCLUDED.accuracy,
+        version = user_models.version + 1
+    RETURNING version
+""")
+
+@medir_consulta
+async def save_user_model(user_id: int, modelo_path: str, accuracy: float):
+    """
+    Apunta el modelo del usuario a un nuevo archivo e incrementa su versión.
+    Devuelve la nueva versión y la ruta del archivo anterior (para borrarlo).
     """
-    await database.execute(query, {
-        "user_id": user_id,
-        "modelo_path": modelo_path,
-        "accuracy": accuracy,
-    })
+    # El bloqueo de la fila garantiza que cada guardado concurrente vea la ruta que reemplaza
+    async with database.transaction():
+        previous_path = await GET_USER_MODEL_PATH_FOR_UPDATE.fetchval(user_id)
+        version = await SAVE_USER_MODEL.fetchval(user_id, modelo_path, accuracy)
+    return {"version": version, "previous_path": previous_path}
 
 # Obtener info del modelo del usuario
+GET_USER_MODEL = Sentencia("get_user_model", "SELECT * FROM user_models WHERE user_id = $1")
+
+@medir_consulta
 async def get_user_model(user_id: int):
-    query = "SELECT * FROM user_models WHERE user_id = :user_id"
-    return await database.fetch_one(query=query, values={"user_id": user_id})
+    return await GET_USER_MODEL.fetchrow(user_id)
+
+# Versión actual del modelo del usuario (None si no tiene modelo)
+GET_USER_MODEL_VERSION = Sentencia("get_user_model_version", "SELECT version FROM user_models WHERE user_id = $1")
+
+@medir_consulta
+async def get_user_model_version(user_id: int):
+    return await GET_USER_MODEL_VERSION.fetchval(user_id)
 
-# Crear usuario si no existe y retornar su id
+# Crear usuario si no existe y retornar su id. El DO UPDATE (que no cambia
+# nada) hace que RETURNING devuelva también la fila que ya existía, en una sola
+# sentencia atómica: dos peticiones simultáneas con el mismo username obtienen
+# el mismo usuario en lugar de fallar por la restricción UNIQUE.
+UPSERT_USER = Sentencia("upsert_user", """
+    INSERT INTO users (username) VALUES ($1)
+    ON CONFLICT (username) DO UPDATE SET username = EXCLUDED.username
+    RETURNING id, username
+""")
+
+@medir_consulta
 async def get_or_create_user(username: str) -> dict:
-    # Intenta obtener el usuario
-    query_get = "SELECT id, username FROM users WHERE username = :username"
-    user = await database.fetch_one(query=query_get, values={"username": username})
-    if user:
-        return dict(user)
-    # Si no existe, créalo
-    query_create = "INSERT INTO users (username) VALUES (:username) RETURNING id, username"
-    user = await database.fetch_one(query=query_create, values={"username": username})
+    user = await UPSERT_USER.fetchrow(username)
     return dict(user)
 
+# Todo lo necesario para empezar una partida, en una sola sentencia
+BOOTSTRAP_SESSION = Sentencia("bootstrap_session", """
+    WITH usuario AS (
+        INSERT INTO users (username) VALUES ($1)
+        ON CONFLICT (username) DO UPDATE SET username = EXCLUDED.username
+        RETURNING id, username
+    ),
+    sesion AS (
+        INSERT INTO training_sessions (user_id, dificultad)
+        SELECT id, $2 FROM usuario
+        RETURNING id
+    ),
+    recientes AS (
+        -- Igual que get_last_n_note_attempts: top-N por sesión y después global
+        SELECT ntl.nota_correcta, ntl.notas_mostradas, ntl.created_at, ntl.id
+        FROM training_sessions ts
+        CROSS JOIN LATERAL (
+            SELECT nota_correcta, notas_mostradas, created_at, id
+            FROM note_training_logs
+            WHERE session_id = ts.id
+            ORDER BY created_at DESC, id DESC
+            LIMIT $3
+        ) ntl
+        WHERE ts.user_id = (SELECT id FROM usuario)
+        ORDER BY ntl.created_at DESC, ntl.id DESC
+        LIMIT $3
+    )
+    SELECT
+        u.id AS user_id,
+        u.username,
+        s.id AS session_id,
+        f.accuracy_easy,
+        f.accuracy_medium,
+        f.accuracy_hard,
+        f.avg_response_time,
+        f.games_played,
+        f.avg_session_duration,
+        m.modelo_path,
+        m.version,
+        ARRAY(SELECT nota_correcta FROM recientes ORDER BY created_at DESC, id DESC) AS last_notes,
+        (SELECT notas_mostradas FROM recientes ORDER BY created_at DESC, id DESC LIMIT 1) AS last_mostradas
+    FROM usuario u
+    CROSS JOIN sesion s
+    LEFT JOIN user_skill_features_view f ON f.user_id = u.id
+    LEFT JOIN user_models m ON m.user_id = u.id
+""")
+
+@medir_consulta
+async def bootstrap_session(username: str, dificultad: str, n_recientes: int) -> dict:
+    """
+    Crea el usuario si no existe y una sesión nueva, y lee en la misma
+    sentencia (un solo viaje, una sola transacción) lo que hace falta para
+    la primera ronda: las características de habilidad, la fila de
+    user_models y el historial reciente de intentos.
+
+    Returns:
+        dict: user_id, username y session_id; 'features' (como
+              get_user_skill_features, None si no hay datos); 'user_model'
+              (modelo_path y version, o None si no tiene modelo); 'last_notes'
+              (las n_recientes últimas notas objetivo, la más reciente primero)
+              y 'last_mostradas' (las notas mostradas en el último intento).
+    """
+    fila = await BOOTSTRAP_SESSION.fetchrow(username, dificultad, n_recientes)
+    features = {
+        columna: fila[columna]
+        for columna in ("accuracy_easy", "accuracy_medium", "accuracy_hard",
+                        "avg_response_time", "games_played", "avg_session_duration")
+    }
+    return {
+        "user_id": fila["user_id"],
+        "username": fila["username"],
+        "session_id": fila["session_id"],
+        "features": features if fila["games_played"] is not None else None,
+        "user_model": {"modelo_path": fila["modelo_path"], "version": fila["version"]} if fila["modelo_path"] else None,
+        "last_notes": list(fila["last_notes"]),
+        "last_mostradas": list(fila["last_mostradas"] or []),
+    }
+
 # ----------------------------------------------------------------------
 # ----------------------------------------------------------------------
 
 # Obtener caracteristicas de habilidad del usuario desde la vista
+GET_USER_SKILL_FEATURES = Sentencia("get_user_skill_features", """
+    SELECT
+        accuracy_easy,
+        accuracy_medium,
+        accuracy_hard,
+        avg_response_time,
+        games_played,
+        avg_session_duration
+    FROM
+        user_skill_features_view
+    WHERE
+        user_id = $1
+""")
+
+@medir_consulta
 async def get_user_skill_features(user_id: int) -> dict | None:
     """
     Obtiene las características de habilidad de un usuario desde la vista
-    'user_skill_features_view'.
+    'user_skill_features_view', que lee los agregados precalculados de
+    'user_skill_aggregates' por clave primaria.
 
     Args:
         user_id (int): El ID del usuario.
@@ -133,8 +493,14 @@ async def get_user_skill_features(user_id: int) -> dict | None:
         dict | None: Un diccionario con las características de habilidad del usuario,
                      o None si el usuario no tiene datos en la vista.
     """
-    query = """
+    # fetchrow devuelve un Record, que se puede convertir a dict
+    result = await GET_USER_SKILL_FEATURES.fetchrow(user_id)
+    return dict(result) if result else None
+
+# Obtener caracteristicas de habilidad de varios usuarios con una sola consulta
+GET_USERS_SKILL_FEATURES = Sentencia("get_users_skill_features", """
     SELECT
+        user_id,
         accuracy_easy,
         accuracy_medium,
         accuracy_hard,
@@ -144,9 +510,59 @@ async def get_user_skill_features(user_id: int) -> dict | None:
     FROM
         user_skill_features_view
     WHERE
-        user_id = :user_id
+        user_id = ANY($1::int[])
+""")
+
+@medir_consulta
+async def get_users_skill_features(user_ids: list[int]) -> dict[int, dict]:
+    """
+    Igual que get_user_skill_features, pero para varios usuarios a la vez.
+
+    Returns:
+        dict[int, dict]: Las características de cada usuario encontrado, por user_id.
+                         Los usuarios sin datos en la vista no aparecen.
+    """
+    if not user_ids:
+        return {}
+    rows = await GET_USERS_SKILL_FEATURES.fetch(list(user_ids))
+    features = {}
+    for row in rows:
+        row = dict(row)
+        features[row.pop("user_id")] = row
+    return features
+
+# Recorrer las caracteristicas de habilidad de todos los usuarios (exportación)
+ITERATE_SKILL_FEATURES = Sentencia("iterate_skill_features", """
+    SELECT
+        v.user_id,
+        a.updated_at,
+        v.accuracy_easy,
+        v.accuracy_medium,
+        v.accuracy_hard,
+        v.avg_response_time,
+        v.games_played,
+        v.avg_session_duration
+    FROM
+        user_skill_aggregates a
+    JOIN
+        user_skill_features_view v ON v.user_id = a.user_id
+    WHERE
+        $1::timestamp IS NULL OR a.updated_at > $1::timestamp
+""")
+
+@medir_consulta
+async def iterate_skill_features(since: datetime | None = None, fetch_size: int = 10000):
+    """
+    Devuelve (async generator) las características de habilidad de cada
+    usuario con agregados, junto con user_skill_aggregates.updated_at.
+    Con `since`, solo los usuarios cuyos agregados cambiaron después de esa
+    fecha (usa idx_user_skill_aggregates_updated, migración 003).
+
+    Usa un cursor del lado del servidor dentro de una transacción de solo
+    lectura REPEATABLE READ: todas las filas salen de la misma instantánea.
     """
-    values = {"user_id": user_id}
-    # fetch_one devuelve un Record, que se puede convertir a dict
-    result = await database.fetch_one(query=query, values=values)
-    return dict(result) if result else None
\ No newline at end of file
+    async with conexion() as connection:
+        async with connection.transaction(isolation="repeatable_read", readonly=True):
+            await connection.execute(SIN_STATEMENT_TIMEOUT.sql)
+            async for record in connection.cursor(ITERATE_SKILL_FEATURES.sql, since, prefetch=fetch_size):
+                yield record
@@ -1,10 +1,84 @@
 import os
+import time
+from contextlib import asynccontextmanager
+
 from databases import Database
 from dotenv import load_dotenv
 
+from src import metrics
+from src.config import DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_STATEMENT_TIMEOUT, DB_STATEMENT_CACHE_SIZE
+
 load_dotenv()  # Cargar variables de .env
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-# Instancia global de la conexión a la base de datos
-database = Database(DATABASE_URL)
+# Instancia global de la conexión a la base de datos. Las opciones se pasan
+# tal cual a asyncpg.create_pool; statement_timeout se aplica en el servidor
+# a cada sentencia de cada conexión del pool.
+database = Database(
+    DATABASE_URL,
+    min_size=DB_POOL_MIN_SIZE,
+    max_size=DB_POOL_MAX_SIZE,
+    statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+    server_settings={"statement_timeout": str(int(DB_STATEMENT_TIMEOUT * 1000))},
+)
+
+POOL_ESPERA = metrics.histograma("eartrainer_db_pool_acquire_seconds",
+                                 "Espera hasta obtener una conexión del pool", ())
+POOL_AGOTADO = metrics.contador("eartrainer_db_pool_exhausted_total",
+                                "Conexiones pedidas con todas las del pool en uso", ())
+# Tareas esperando ahora mismo una conexión del pool
+_esperando = 0
+
+
+def pool_stats() -> dict | None:
+    """
+    Conexiones del pool de asyncpg (None si la base de datos no está conectada).
+    `databases` no expone el pool, así que se lee del backend (atributo
+    interno: por eso databases está fijado a una versión exacta en
+    requirements.txt).
+    """
+    pool = getattr(database._backend, "_pool", None)
+    if pool is None:
+        return None
+    size = pool.get_size()
+    idle = pool.get_idle_size()
+    return {"size": size, "idle": idle, "in_use": size - idle, "min": pool.get_min_size(),
+            "max": pool.get_max_size(), "waiting": _esperando}
+
+
+@asynccontextmanager
+async def conexion():
+    """
+    Conexión de asyncpg de la tarea actual (la misma que usan
+    database.transaction() y las consultas de `databases`), para ejecutar
+    sentencias preparadas sin pasar por SQLAlchemy.
+
+    Si la tarea todavía no tiene conexión, mide cuánto espera al pool y
+    cuenta las veces que lo encuentra sin conexiones libres. Para saberlo se
+    lee _connection_counter, interno de `databases` (fijado a una versión
+    exacta en requirements.txt).
+    """
+    global _esperando
+    connection = database.connection()
+    if connection._connection_counter:
+        async with connection:
+            yield connection.raw_connection
+        return
+
+    stats = pool_stats()
+    agotado = stats is not None and stats["idle"] == 0 and stats["size"] >= stats["max"]
+    if agotado:
+        POOL_AGOTADO.incrementar(())
+        _esperando += 1
+    inicio = time.perf_counter()
+    try:
+        await connection.__aenter__()
+    finally:
+        if agotado:
+            _esperando -= 1
+        POOL_ESPERA.observar((), time.perf_counter() - inicio)
+    try:
+        yield connection.raw_connection
+    finally:
+        await connection.__aexit__(None, None, None)
@@ -10,5 +10,8 @@ TRUNCATE TABLE user_models RESTART IDENTITY CASCADE;
 -- 3. Eliminar filas y reiniciar secuencia de training_sessions
 TRUNCATE TABLE training_sessions RESTART IDENTITY CASCADE;
 
--- 4. Eliminar filas y reiniciar secuencia de users
+-- 4. Eliminar filas de user_skill_aggregates
+TRUNCATE TABLE user_skill_aggregates RESTART IDENTITY CASCADE;
+
+-- 5. Eliminar filas y reiniciar secuencia de users
 TRUNCATE TABLE users RESTART IDENTITY CASCADE;
\ No newline at end of file
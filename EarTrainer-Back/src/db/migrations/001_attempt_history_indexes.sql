@@ -0,0 +1,25 @@
+-- Índices para las consultas de historial de intentos.
+-- Se aplica después de schema.sql:
+--     psql "$DATABASE_URL" -f src/db/migrations/001_attempt_history_indexes.sql
+-- CONCURRENTLY evita bloquear las escrituras mientras se construyen los índices
+-- en tablas grandes (por eso cada sentencia debe ejecutarse fuera de una transacción).
+
+-- Intentos por sesión, del más reciente al más antiguo.
+-- Sirve para:
+--   * crud.get_attempts_by_session (filtro por session_id)
+--   * crud.get_last_n_note_attempts y crud.bootstrap_session: los últimos N
+--     intentos del usuario se buscan con un top-N por sesión (LATERAL ...
+--     ORDER BY created_at DESC, id DESC LIMIT N), que este índice resuelve
+--     leyendo como mucho N entradas por sesión y sin ordenar
+--   * crud.update_training_session y el backfill de agregados, que solo leen
+--     es_correcto y tiempo_respuesta (INCLUDE permite un index-only scan)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_note_training_logs_session_created
+    ON note_training_logs (session_id, created_at DESC, id DESC)
+    INCLUDE (es_correcto, tiempo_respuesta);
+
+-- Sesiones de un usuario, de la más reciente a la más antigua.
+-- Sirve para crud.get_user_sessions y para encontrar las sesiones del
+-- usuario en crud.get_last_n_note_attempts (INCLUDE id evita leer la tabla).
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_training_sessions_user_started
+    ON training_sessions (user_id, started_at DESC)
+    INCLUDE (id);
@@ -0,0 +1,6 @@
+-- Versión de los modelos por usuario.
+-- Se aplica después de schema.sql:
+--     psql "$DATABASE_URL" -f src/db/migrations/002_user_models_version.sql
+-- crud.save_user_model la incrementa en cada guardado y cada worker la compara
+-- con la de su caché para detectar modelos reentrenados por otro worker.
+ALTER TABLE user_models ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0;
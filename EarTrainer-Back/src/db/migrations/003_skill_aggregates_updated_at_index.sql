@@ -0,0 +1,10 @@
+-- Índice para la exportación incremental de características de habilidad.
+-- Se aplica después de schema.sql:
+--     psql "$DATABASE_URL" -f src/db/migrations/003_skill_aggregates_updated_at_index.sql
+-- CONCURRENTLY evita bloquear los cierres de sesión mientras se construye
+-- (la sentencia debe ejecutarse fuera de una transacción).
+
+-- Usuarios cuyos agregados cambiaron desde la última exportación.
+-- Sirve para crud.iterate_skill_features con `since` (python -m src.ml.export_skill_features).
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_skill_aggregates_updated
+    ON user_skill_aggregates (updated_at);
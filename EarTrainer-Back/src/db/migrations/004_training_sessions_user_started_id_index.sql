@@ -0,0 +1,15 @@
+-- Índice para recorrer todo el historial en el orden de entrenamiento.
+-- Se aplica después de schema.sql:
+--     psql "$DATABASE_URL" -f src/db/migrations/004_training_sessions_user_started_id_index.sql
+-- CONCURRENTLY evita bloquear la creación y el cierre de sesiones mientras se
+-- construye (la sentencia debe ejecutarse fuera de una transacción).
+
+-- Sesiones por usuario en el orden en que empezaron, con id para desempatar.
+-- Sirve para crud.iterate_attempts_by_user (python -m src.ml.retrain_all):
+-- el cursor recorre este índice y, por cada sesión, sus intentos con
+-- idx_note_training_logs_session_created (migración 001), así que solo queda
+-- ordenar los intentos de cada sesión. Con idx_training_sessions_user_started
+-- (orden descendente y sin id en la clave) solo sirve el prefijo user_id y se
+-- ordena el historial completo de cada usuario.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_training_sessions_user_started_id
+    ON training_sessions (user_id, started_at, id);
@@ -34,5 +34,27 @@ CREATE TABLE IF NOT EXISTS user_models (
     modelo_path TEXT NOT NULL,
     last_trained_at TIMESTAMP,
     accuracy REAL,
+    -- Se incrementa en cada guardado; los workers la comparan con la de su caché
+    version INTEGER NOT NULL DEFAULT 0,
     CONSTRAINT fk_user FOREIGN KEY(user_id) REFERENCES users(id)
-);
\ No newline at end of file
+);
+
+---
+-- Agregados de habilidad por usuario, mantenidos de forma incremental al cerrar
+-- cada sesión (ver crud.update_training_session). Solo cuentan las sesiones
+-- terminadas con al menos 5 intentos (easy) o 10 intentos (medium y hard).
+-- Se reconstruye desde cero con: python -m src.db.backfill_skill_aggregates
+CREATE TABLE IF NOT EXISTS user_skill_aggregates (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id),
+    correct_easy INTEGER NOT NULL DEFAULT 0,          -- Intentos correctos en sesiones 'easy'
+    total_easy INTEGER NOT NULL DEFAULT 0,            -- Intentos totales en sesiones 'easy'
+    correct_medium INTEGER NOT NULL DEFAULT 0,
+    total_medium INTEGER NOT NULL DEFAULT 0,
+    correct_hard INTEGER NOT NULL DEFAULT 0,
+    total_hard INTEGER NOT NULL DEFAULT 0,
+    response_time_sum DOUBLE PRECISION NOT NULL DEFAULT 0,    -- Suma de tiempo_respuesta
+    response_time_count INTEGER NOT NULL DEFAULT 0,           -- Número de intentos sumados
+    games_played INTEGER NOT NULL DEFAULT 0,                  -- Sesiones que cumplen los criterios
+    session_duration_sum DOUBLE PRECISION NOT NULL DEFAULT 0, -- Suma de duraciones (en segundos)
+    updated_at TIMESTAMP DEFAULT NOW()
+);
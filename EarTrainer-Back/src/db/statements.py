@@ -0,0 +1,47 @@
+from src.db.database import conexion
+
+# Sentencias registradas, por nombre
+sentencias: dict[str, "Sentencia"] = {}
+
+
+class Sentencia:
+    """
+    Sentencia SQL con nombre y parámetros posicionales ($1, $2, ...).
+
+    Se ejecuta directamente con asyncpg, que la prepara en el servidor la
+    primera vez que se usa en cada conexión y reutiliza esa sentencia
+    preparada (y su plan) en las siguientes llamadas, mientras siga en su
+    caché (DB_STATEMENT_CACHE_SIZE). Como el texto de cada sentencia es
+    siempre el mismo, todos los valores, incluidos los LIMIT, deben ir como
+    parámetros y no dentro del SQL.
+    """
+
+    def __init__(self, nombre: str, sql: str):
+        if nombre in sentencias:
+            raise ValueError(f"Ya existe una sentencia llamada {nombre}")
+        self.nombre = nombre
+        self.sql = sql
+        sentencias[nombre] = self
+
+    async def fetch(self, *args) -> list:
+        async with conexion() as connection:
+            return await connection.fetch(self.sql, *args)
+
+    async def fetchrow(self, *args):
+        async with conexion() as connection:
+            return await connection.fetchrow(self.sql, *args)
+
+    async def fetchval(self, *args):
+        async with conexion() as connection:
+            return await connection.fetchval(self.sql, *args)
+
+    async def execute(self, *args):
+        async with conexion() as connection:
+            return await connection.execute(self.sql, *args)
+
+    async def executemany(self, filas: list[tuple]):
+        """
+        Ejecuta la sentencia una vez por fila, en un único viaje y de forma atómica.
+        """
+        async with conexion() as connection:
+            await connection.executemany(self.sql, filas)
@@ -0,0 +1,14 @@
+from starlette.requests import HTTPConnection
+
+from src.ml.predictor import UserModelManager
+from src.ml.training_jobs import TrainingJobQueue
+
+
+# Servicios compartidos por todos los routers. Se crean una sola vez en el
+# lifespan de main.py y se guardan en app.state.
+
+def get_model_manager(conn: HTTPConnection) -> UserModelManager:
+    return conn.app.state.model_manager
+
+def get_training_jobs(conn: HTTPConnection) -> TrainingJobQueue:
+    return conn.app.state.training_jobs
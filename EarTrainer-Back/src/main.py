@@ -1,13 +1,27 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
 from src.routers import trainer, session, user, skill
-from src.db.database import database
+from src.db.database import database, pool_stats
+from src import metrics, profiler
+from src.db.attempt_buffer import attempt_buffer
+from src.ml.predictor import UserModelManager
+from src.ml.training_jobs import TrainingJobQueue
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 
 @asynccontextmanager
 async def lifespan(app):
     await database.connect()
+    # Un único gestor de modelos para toda la aplicación (ver src/dependencies.py)
+    app.state.model_manager = UserModelManager()
+    app.state.training_jobs = TrainingJobQueue(app.state.model_manager)
+    attempt_buffer.start()
+    app.state.training_jobs.start()
     yield
+    await attempt_buffer.stop()
+    await app.state.training_jobs.stop()
+    # Persistir los modelos que aún se están guardando en segundo plano
+    await app.state.model_manager.flush()
     await database.disconnect()
 
 app = FastAPI(
@@ -36,6 +50,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Latencia por ruta (y, con PROFILER_ENABLED, el profiler por petición)
+app.add_middleware(profiler.ProfilerMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Uso del pool de conexiones, leído en cada consulta de /metrics
+for clave, ayuda in (("size", "Conexiones abiertas en el pool"), ("in_use", "Conexiones del pool en uso"),
+                     ("idle", "Conexiones libres del pool"), ("max", "Tamaño máximo del pool"),
+                     ("waiting", "Tareas esperando una conexión del pool")):
+    metrics.registrar_gauge(f"eartrainer_db_pool_{clave}", ayuda,
+                            lambda clave=clave: (pool_stats() or {}).get(clave))
+
+@app.get("/metrics", include_in_schema=False)
+async def exponer_metricas():
+    return PlainTextResponse(metrics.exponer(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/profile/{profile_id}", include_in_schema=False)
+async def ver_perfil(profile_id: str):
+    if profile_id not in profiler.perfiles:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return PlainTextResponse(profiler.perfiles[profile_id])
+
 app.include_router(trainer.router, prefix="/api/trainer", tags=["trainer"])
 app.include_router(skill.router, prefix="/api/skill", tags=["skill"])
 app.include_router(session.router, prefix="/api/session", tags=["sessions"])
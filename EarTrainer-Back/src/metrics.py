@@ -0,0 +1,218 @@
+import bisect
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+# Límites (en segundos) de los buckets de todos los histogramas
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histograma:
+    """
+    Histograma de duraciones con etiquetas, en memoria del proceso. Cada
+    observación solo incrementa un bucket; los acumulados que pide el
+    formato de Prometheus se calculan al exponer.
+    """
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: tuple[str, ...], buckets: tuple[float, ...] = BUCKETS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}  # valores de etiquetas -> [conteos por bucket, suma]
+        self._lock = threading.Lock()  # Los spans también se observan desde hilos (asyncio.to_thread)
+
+    def observar(self, valores: tuple, segundos: float):
+        i = bisect.bisect_left(self.buckets, segundos)
+        with self._lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                serie = self._series[valores] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][i] += 1
+            serie[1] += segundos
+
+    def exponer(self) -> list[str]:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        with self._lock:
+            series = [(valores, list(conteos), suma) for valores, (conteos, suma) in self._series.items()]
+        for valores, conteos, suma in sorted(series):
+            etiquetas = ",".join(f'{k}="{_escapar(v)}"' for k, v in zip(self.etiquetas, valores))
+            separador = "," if etiquetas else ""
+            acumulado = 0
+            for limite, conteo in zip((*self.buckets, "+Inf"), conteos):
+                acumulado += conteo
+                lineas.append(f'{self.nombre}_bucket{{{etiquetas}{separador}le="{limite}"}} {acumulado}')
+            llaves = f"{{{etiquetas}}}" if etiquetas else ""
+            lineas.append(f"{self.nombre}_sum{llaves} {suma}")
+            lineas.append(f"{self.nombre}_count{llaves} {acumulado}")
+        return lineas
+
+
+class Contador:
+    def __init__(self, nombre: str, ayuda: str, etiquetas: tuple[str, ...]):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self._series: dict[tuple, int] = {}
+
+    def incrementar(self, valores: tuple, n: int = 1):
+        self._series[valores] = self._series.get(valores, 0) + n
+
+    def exponer(self) -> list[str]:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} counter"]
+        for valores, total in sorted(self._series.items()):
+            etiquetas = ",".join(f'{k}="{_escapar(v)}"' for k, v in zip(self.etiquetas, valores))
+            llaves = f"{{{etiquetas}}}" if etiquetas else ""
+            lineas.append(f"{self.nombre}{llaves} {total}")
+        return lineas
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_metricas: list = []
+# Gauges que se leen al exponer: (nombre, ayuda, función que devuelve el valor o None)
+_gauges: list[tuple[str, str, Callable[[], float | None]]] = []
+
+
+def histograma(nombre: str, ayuda: str, etiquetas: tuple[str, ...]) -> Histograma:
+    h = Histograma(nombre, ayuda, etiquetas)
+    _metricas.append(h)
+    return h
+
+
+def contador(nombre: str, ayuda: str, etiquetas: tuple[str, ...]) -> Contador:
+    c = Contador(nombre, ayuda, etiquetas)
+    _metricas.append(c)
+    return c
+
+
+def registrar_gauge(nombre: str, ayuda: str, funcion: Callable[[], float | None]):
+    _gauges.append((nombre, ayuda, funcion))
+
+
+def exponer() -> str:
+    """
+    Todas las métricas en el formato de texto de Prometheus (GET /metrics).
+    """
+    lineas = []
+    for metrica in _metricas:
+        lineas.extend(metrica.exponer())
+    for nombre, ayuda, funcion in _gauges:
+        valor = funcion()
+        if valor is not None:
+            lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} gauge", f"{nombre} {valor}"]
+    return "\n".join(lineas) + "\n"
+
+
+HTTP_LATENCIA = histograma("eartrainer_http_request_duration_seconds",
+                           "Latencia de las peticiones HTTP por ruta", ("method", "route", "status"))
+DB_LATENCIA = histograma("eartrainer_db_query_duration_seconds",
+                         "Duración de cada función de crud", ("query",))
+DB_ERRORES = contador("eartrainer_db_query_errors_total",
+                      "Funciones de crud que terminaron con una excepción", ("query",))
+WS_LATENCIA = histograma("eartrainer_ws_message_duration_seconds",
+                         "Tiempo de proceso de cada mensaje del canal WebSocket de sesión", ("tipo",))
+SPANS = histograma("eartrainer_span_duration_seconds",
+                   "Duración de los tramos internos de los predictores", ("component", "span"))
+
+
+@contextmanager
+def span(componente: str, nombre: str):
+    """
+    Mide el bloque y lo registra en eartrainer_span_duration_seconds.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        SPANS.observar((componente, nombre), time.perf_counter() - inicio)
+
+
+def medir_consulta(funcion):
+    """
+    Decorador para las funciones de crud: registra su duración con el nombre
+    de la función. En los generadores asíncronos (cursores) se mide desde la
+    primera fila hasta que se agotan, incluido el tiempo del consumidor.
+    """
+    valores = (funcion.__name__,)
+
+    if inspect.isasyncgenfunction(funcion):
+        @functools.wraps(funcion)
+        async def envoltorio_generador(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                async for fila in funcion(*args, **kwargs):
+                    yield fila
+            except Exception:
+                DB_ERRORES.incrementar(valores)
+                raise
+            finally:
+                DB_LATENCIA.observar(valores, time.perf_counter() - inicio)
+        return envoltorio_generador
+
+    @functools.wraps(funcion)
+    async def envoltorio(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return await funcion(*args, **kwargs)
+        except Exception:
+            DB_ERRORES.incrementar(valores)
+            raise
+        finally:
+            DB_LATENCIA.observar(valores, time.perf_counter() - inicio)
+    return envoltorio
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que registra la latencia de cada petición HTTP con la
+    plantilla de su ruta (p. ej. /api/skill/get-skill-level/{user_id}), para
+    que el número de series no crezca con los ids.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        inicio = time.perf_counter()
+        estado = 500
+
+        async def send_con_estado(mensaje):
+            nonlocal estado
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, send_con_estado)
+        finally:
+            HTTP_LATENCIA.observar((scope["method"], _plantilla(scope), str(estado)), time.perf_counter() - inicio)
+
+
+def _plantilla(scope) -> str:
+    """
+    Plantilla de la ruta que atendió la petición, con el prefijo del router.
+    Según la versión de FastAPI, la ruta de un router incluido guarda su path
+    con o sin el prefijo; el prefijo se recupera de la parte del path real que
+    queda delante de la ruta con sus parámetros sustituidos.
+    """
+    ruta = scope.get("route")
+    plantilla = getattr(ruta, "path", None)
+    if not plantilla:
+        return "<unmatched>"
+    try:
+        concreto = ruta.path_format.format(**scope.get("path_params", {}))
+    except (AttributeError, KeyError, IndexError, ValueError):
+        return plantilla
+    path = scope["path"]
+    if concreto and path.endswith(concreto):
+        return path[:len(path) - len(concreto)] + plantilla
+    return plantilla
@@ -0,0 +1,65 @@
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from sklearn.linear_model import SGDClassifier
+
+# Número de características: one-hot de nota correcta, elegida y mostradas + tiempo y dificultad
+from src.ml.features import N_FEATURES
+
+# Disposición del vector compacto (float32):
+#   [0, N_FEATURES)  coeficientes del modelo logístico
+#   N_FEATURES       intercepto
+#   N_FEATURES + 1   contador de pasos t_ de SGD (necesario para seguir entrenando)
+IDX_INTERCEPT = N_FEATURES
+IDX_T = N_FEATURES + 1
+N_PESOS = N_FEATURES + 2
+
+
+def nuevo_modelo() -> "SGDClassifier":
+    # sklearn solo se importa al crear o reconstruir un modelo, no al arrancar
+    from sklearn.linear_model import SGDClassifier
+    return SGDClassifier(loss="log_loss", penalty="l2", max_iter=1000, random_state=42)
+
+
+def exportar_pesos(model: "SGDClassifier") -> np.ndarray:
+    """
+    Exporta un SGDClassifier binario a su vector compacto de pesos float32.
+    """
+    pesos = np.empty(N_PESOS, dtype=np.float32)
+    pesos[:N_FEATURES] = model.coef_.ravel()
+    pesos[IDX_INTERCEPT] = model.intercept_[0]
+    pesos[IDX_T] = model.t_
+    return pesos
+
+
+def modelo_desde_pesos(pesos: np.ndarray) -> "SGDClassifier":
+    """
+    Reconstruye un SGDClassifier a partir de sus pesos compactos para poder
+    seguir entrenándolo con partial_fit.
+    """
+    model = nuevo_modelo()
+    model.classes_ = np.array([0, 1])
+    model.coef_ = np.ascontiguousarray(pesos[:N_FEATURES], dtype=np.float64).reshape(1, -1)
+    model.intercept_ = np.array([pesos[IDX_INTERCEPT]], dtype=np.float64)
+    model.t_ = float(pesos[IDX_T])
+    model.n_features_in_ = N_FEATURES
+    return model
+
+
+def pesos_desde_bytes(data: bytes) -> np.ndarray:
+    pesos = np.frombuffer(data, dtype=np.float32)
+    if pesos.shape != (N_PESOS,):
+        raise ValueError(f"Pesos compactos inválidos: se esperaban {N_PESOS} valores, hay {pesos.size}")
+    return pesos
+
+
+def puntuar(pesos: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """
+    Calcula la probabilidad de error para filas de características binarias.
+    Cada fila de `indices` contiene las columnas que valen 1, así que el
+    producto coef_ · x se reduce a sumar esos coeficientes.
+    """
+    z = pesos[indices].sum(axis=1) + pesos[IDX_INTERCEPT]
+    return 1.0 / (1.0 + np.exp(-z))
@@ -0,0 +1,169 @@
+"""
+Exporta las características de habilidad por usuario (las seis de
+user_skill_features_view) a Parquet, en el formato de entrenamiento del
+modelo de nivel de habilidad (MLTraining y Data/pipeline.py):
+
+    python -m src.ml.export_skill_features --output exports/skill_features [--full] [--labels model]
+
+Las filas se leen con un cursor del lado del servidor y se escriben en
+grupos de --batch-rows filas, así que la memoria no depende del número de
+usuarios. Cada ejecución añade un archivo part-NNNNNN.parquet al directorio
+de salida con los usuarios cuyos agregados cambiaron desde la marca de agua
+guardada en _watermark.json (el mayor updated_at exportado). Para no perder
+cierres de sesión de transacciones que confirmaron tarde, se vuelve a pedir
+un margen de --overlap-seconds antes de la marca; por eso un usuario puede
+aparecer en varios archivos, y vale la fila del más reciente (Data/pipeline.py
+se queda con esa).
+
+La base de datos no guarda el nivel real de cada usuario. La columna
+skill_level se rellena con --labels-file (CSV con user_id,skill_level, por
+ejemplo evaluaciones de profesores) y/o con --labels model (la predicción
+del modelo actual); si no, queda vacía.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.db import crud
+from src.db.database import database
+
+FEATURES = ['accuracy_easy', 'accuracy_medium', 'accuracy_hard', 'avg_response_time', 'games_played', 'avg_session_duration']
+ESQUEMA = pa.schema(
+    [("user_id", pa.int64()), ("updated_at", pa.timestamp("us")), ("skill_level", pa.string())]
+    + [(f, pa.float64()) for f in FEATURES]
+)
+WATERMARK_FILE = "_watermark.json"
+
+
+def leer_estado(output: str) -> dict:
+    path = os.path.join(output, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return {"watermark": None, "parts": 0}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def guardar_estado(output: str, estado: dict):
+    path = os.path.join(output, WATERMARK_FILE)
+    temporal = f"{path}.{os.getpid()}.tmp"
+    with open(temporal, 'w') as f:
+        json.dump(estado, f, indent=2)
+    os.replace(temporal, path)
+
+
+def leer_etiquetas(path: str) -> dict[int, str]:
+    with open(path, 'r', newline='') as f:
+        return {int(fila["user_id"]): fila["skill_level"] for fila in csv.DictReader(f)}
+
+
+class Exportacion:
+    """
+    Acumula filas por columnas y escribe un grupo de filas en el Parquet de
+    salida cada batch_rows filas.
+    """
+
+    def __init__(self, escritor: pq.ParquetWriter, batch_rows: int, etiquetas: dict[int, str], predictor=None):
+        self.escritor = escritor
+        self.batch_rows = batch_rows
+        self.etiquetas = etiquetas
+        self.predictor = predictor
+        self.filas = 0
+        self.max_updated_at: datetime | None = None
+        self._user_ids: list[int] = []
+        self._updated_at: list[datetime] = []
+        self._features: list[tuple] = []
+
+    def agregar(self, fila):
+        self._user_ids.append(fila["user_id"])
+        self._updated_at.append(fila["updated_at"])
+        self._features.append(tuple(fila[f] for f in FEATURES))
+        if len(self._user_ids) >= self.batch_rows:
+            self.escribir()
+
+    def escribir(self):
+        if not self._user_ids:
+            return
+        X = np.array(self._features, dtype=np.float64)
+        niveles = [self.etiquetas.get(user_id) for user_id in self._user_ids]
+        if self.predictor is not None:
+            predichos = self.predictor.predict_matrix(X)
+            niveles = [nivel if nivel is not None else str(predicho) for nivel, predicho in zip(niveles, predichos)]
+        self.escritor.write_batch(pa.RecordBatch.from_arrays(
+            [pa.array(self._user_ids, type=pa.int64()), pa.array(self._updated_at, type=pa.timestamp("us")),
+             pa.array(niveles, type=pa.string())] + [pa.array(X[:, j]) for j in range(len(FEATURES))],
+            schema=ESQUEMA,
+        ))
+        mayor = max(self._updated_at)
+        if self.max_updated_at is None or mayor > self.max_updated_at:
+            self.max_updated_at = mayor
+        self.filas += len(self._user_ids)
+        self._user_ids, self._updated_at, self._features = [], [], []
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", required=True, help="Directorio de salida (archivos part-*.parquet y la marca de agua)")
+    parser.add_argument("--full", action="store_true", help="Exporta todos los usuarios, ignorando la marca de agua")
+    parser.add_argument("--overlap-seconds", type=float, default=300,
+                        help="Margen que se vuelve a exportar antes de la marca de agua")
+    parser.add_argument("--labels", choices=["none", "model"], default="none",
+                        help="'model' etiqueta con el modelo actual a los usuarios sin etiqueta en --labels-file")
+    parser.add_argument("--labels-file", help="CSV con columnas user_id,skill_level")
+    parser.add_argument("--batch-rows", type=int, default=50000, help="Filas por grupo de filas del Parquet")
+    parser.add_argument("--fetch-size", type=int, default=10000, help="Filas por viaje del cursor")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    estado = leer_estado(args.output)
+    since = None
+    if not args.full and estado["watermark"]:
+        since = datetime.fromisoformat(estado["watermark"]) - timedelta(seconds=args.overlap_seconds)
+
+    etiquetas = leer_etiquetas(args.labels_file) if args.labels_file else {}
+    predictor = None
+    if args.labels == "model":
+        from src.ml.skills_predictor import SkillsPredictor
+        predictor = SkillsPredictor()
+
+    parte = estado["parts"] + 1
+    path = os.path.join(args.output, f"part-{parte:06d}.parquet")
+    # Prefijo '.': los lectores de datasets de pyarrow ignoran el archivo mientras se escribe
+    temporal = os.path.join(args.output, f".part-{parte:06d}.parquet.tmp")
+    print(f"Exportando {'todos los usuarios' if since is None else f'usuarios con cambios desde {since}'}...")
+    inicio = time.perf_counter()
+
+    await database.connect()
+    try:
+        with pq.ParquetWriter(temporal, ESQUEMA) as escritor:
+            exportacion = Exportacion(escritor, args.batch_rows, etiquetas, predictor)
+            async for fila in crud.iterate_skill_features(since, fetch_size=args.fetch_size):
+                exportacion.agregar(fila)
+            exportacion.escribir()
+    finally:
+        await database.disconnect()
+
+    segundos = time.perf_counter() - inicio
+    if exportacion.filas == 0:
+        os.remove(temporal)
+        print(f"Sin cambios desde la última exportación ({segundos:.1f} s)")
+        return
+    os.replace(temporal, path)
+    # Con --full la marca de agua nunca retrocede
+    watermark = exportacion.max_updated_at
+    if estado["watermark"] and datetime.fromisoformat(estado["watermark"]) > watermark:
+        watermark = datetime.fromisoformat(estado["watermark"])
+    guardar_estado(args.output, {"watermark": watermark.isoformat(), "parts": parte})
+    print(f"{exportacion.filas} usuarios exportados a {path} en {segundos:.1f} s "
+          f"({exportacion.filas / segundos:.0f} filas/s), marca de agua {watermark.isoformat()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
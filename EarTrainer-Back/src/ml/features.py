@@ -0,0 +1,82 @@
+import numpy as np
+
+from src.config import NOTAS_DISPONIBLES
+
+# Código entero de cada nota (posición en NOTAS_DISPONIBLES)
+CODIGO_NOTA = {nota: i for i, nota in enumerate(NOTAS_DISPONIBLES)}
+N_NOTAS = len(NOTAS_DISPONIBLES)
+
+# Disposición de una fila de características (float32):
+#   [0, N_NOTAS)              one-hot de la nota correcta
+#   [N_NOTAS, 2 * N_NOTAS)    one-hot de la nota elegida
+#   [2 * N_NOTAS, 3 * N_NOTAS) multi-hot de las notas mostradas
+#   3 * N_NOTAS               tiempo de respuesta
+#   3 * N_NOTAS + 1           dificultad
+COL_CORRECTA = 0
+COL_ELEGIDA = N_NOTAS
+COL_MOSTRADAS = 2 * N_NOTAS
+COL_TIEMPO = 3 * N_NOTAS
+COL_DIFICULTAD = 3 * N_NOTAS + 1
+N_FEATURES = 3 * N_NOTAS + 2
+
+
+def codificar_notas(notas) -> np.ndarray:
+    """
+    Convierte una secuencia de notas en sus códigos enteros (-1 si la nota no
+    está en NOTAS_DISPONIBLES).
+    """
+    return np.fromiter((CODIGO_NOTA.get(nota, -1) for nota in notas), dtype=np.intp, count=len(notas))
+
+
+def _marcar(X: np.ndarray, filas: np.ndarray, codigos: np.ndarray, columna: int):
+    validos = codigos >= 0
+    X[filas[validos], columna + codigos[validos]] = 1
+
+
+def matriz_caracteristicas(notas_correctas, notas_mostradas, notas_elegidas, tiempos, dificultades,
+                           dtype=np.float32) -> np.ndarray:
+    """
+    Construye la matriz de características de un lote de intentos, una fila
+    por intento. Cada argumento es una columna del lote (notas_mostradas es
+    una lista de listas de notas); tiempos y dificultades pueden ser un
+    escalar común a todas las filas. Las notas desconocidas se ignoran.
+    """
+    n = len(notas_correctas)
+    X = np.zeros((n, N_FEATURES), dtype=dtype)
+    filas = np.arange(n)
+    _marcar(X, filas, codificar_notas(notas_correctas), COL_CORRECTA)
+    _marcar(X, filas, codificar_notas(notas_elegidas), COL_ELEGIDA)
+
+    # Las notas mostradas se aplanan y cada una se asigna a la fila de su intento
+    longitudes = np.fromiter((len(m) for m in notas_mostradas), dtype=np.intp, count=n)
+    mostradas = [nota for m in notas_mostradas for nota in m]
+    _marcar(X, np.repeat(filas, longitudes), codificar_notas(mostradas), COL_MOSTRADAS)
+
+    X[:, COL_TIEMPO] = tiempos
+    X[:, COL_DIFICULTAD] = dificultades
+    return X
+
+
+def etiquetas(notas_correctas, notas_elegidas) -> np.ndarray:
+    """
+    Etiqueta de cada intento: 1 si la nota elegida no es la correcta.
+    """
+    return np.fromiter((c != e for c, e in zip(notas_correctas, notas_elegidas)),
+                       dtype=np.int64, count=len(notas_correctas))
+
+
+def caracteristicas_intentos(attempts, dificultad: float = 1.0, dtype=np.float32) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Convierte registros de note_training_logs en la matriz X y el vector de
+    etiquetas y (1 si el usuario falló). Se recorren los registros una sola vez.
+    """
+    n = len(attempts)
+    correctas, mostradas, elegidas = [None] * n, [None] * n, [None] * n
+    tiempos = np.empty(n, dtype=dtype)
+    for i, intento in enumerate(attempts):
+        correctas[i] = intento["nota_correcta"]
+        mostradas[i] = intento["notas_mostradas"]
+        elegidas[i] = intento["nota_elegida"]
+        tiempos[i] = intento["tiempo_respuesta"]
+    X = matriz_caracteristicas(correctas, mostradas, elegidas, tiempos, dificultad, dtype=dtype)
+    return X, etiquetas(correctas, elegidas)
@@ -0,0 +1,100 @@
+from collections import OrderedDict
+from threading import RLock
+
+# Marcador para distinguir "no está en caché" de un valor None cacheado
+MISSING = object()
+
+
+class ModelCache:
+    """
+    Caché LRU acotada para los modelos por usuario.
+
+    Se limita por número de entradas y, opcionalmente, por memoria estimada
+    (tamaño en bytes del modelo serializado). Cuando se supera cualquiera de
+    los dos límites se expulsan las entradas usadas hace más tiempo, y se
+    llama a `on_evict(user_id)` si se indicó.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int | None = None, on_evict=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self._entries = OrderedDict()  # user_id -> (valor, tamaño)
+        self._total_bytes = 0
+        self._lock = RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id, default=MISSING):
+        with self._lock:
+            entry = self._entries.get(user_id, MISSING)
+            if entry is MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, user_id, value, size: int = 0):
+        with self._lock:
+            old = self._entries.pop(user_id, MISSING)
+            if old is not MISSING:
+                self._total_bytes -= old[1]
+            self._entries[user_id] = (value, size)
+            self._total_bytes += size
+            self._evict()
+
+    def pop(self, user_id, default=None):
+        with self._lock:
+            entry = self._entries.pop(user_id, MISSING)
+            if entry is MISSING:
+                return default
+            self._total_bytes -= entry[1]
+            return entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def _evict(self):
+        # Nunca se expulsa la entrada recién insertada (la última)
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self._total_bytes > self.max_bytes)
+        ):
+            user_id, (_, size) = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            if self.on_evict is not None:
+                self.on_evict(user_id)
+
+    def items(self) -> list[tuple]:
+        """
+        Copia de las entradas (clave, valor), de la usada hace más tiempo a la más reciente.
+        """
+        with self._lock:
+            return [(user_id, entry[0]) for user_id, entry in self._entries.items()]
+
+    def __contains__(self, user_id):
+        with self._lock:
+            return user_id in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
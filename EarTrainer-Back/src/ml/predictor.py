@@ -1,126 +1,386 @@
+import asyncio
+import copy
 import os
 import pickle
+import time
+import uuid
 import numpy as np
-from sklearn.linear_model import SGDClassifier
 import random
-from src.config import NOTAS_DISPONIBLES, MODELS_DIR
+from collections import deque
+from functools import lru_cache
+from itertools import combinations
+from src.config import (
+    NOTAS_DISPONIBLES, MODELS_DIR, MODEL_CACHE_MAX_ENTRIES, MODEL_CACHE_MAX_BYTES, MODEL_COMPACT_WEIGHTS,
+    SUGGESTION_QUEUE_SIZE, SUGGESTION_QUEUE_MAX_USERS, MODEL_VERSION_CHECK_INTERVAL, RECENT_ATTEMPTS_WINDOW
+)
 from src.schemas import SugerenciaResponse
 from src.db import crud
+from src.metrics import span
+from src.ml.model_cache import ModelCache, MISSING
+from src.ml import compact_weights
+from src.ml.features import matriz_caracteristicas, caracteristicas_intentos
+from src.ml.recent_attempts import RecentAttempts
+
+# Número de notas objetivo recientes que no se repiten al sugerir (siempre
+# tiene que quedar al menos una nota disponible como objetivo)
+N_RECIENTES = max(0, min(RECENT_ATTEMPTS_WINDOW, len(NOTAS_DISPONIBLES) - 1))
+
+@lru_cache(maxsize=64)
+def _candidatos(objetivo: str, num_distractores: int):
+    """
+    Precalcula, para una nota objetivo y un número de distractores, todas las
+    combinaciones posibles de distractores y su matriz de características
+    (una fila por combinación, con el mismo codificador que el entrenamiento).
+    También devuelve, por fila, los índices de las columnas que valen 1, que es
+    lo que necesita el puntuador de pesos compactos.
+    """
+    posibles_distractores = [nota for nota in NOTAS_DISPONIBLES if nota != objetivo]
+    combos = list(combinations(posibles_distractores, num_distractores))
+
+    # Se simula que el usuario elige la nota correcta (para contexto),
+    # con tiempo de respuesta y dificultad fijos
+    objetivos = [objetivo] * len(combos)
+    X = matriz_caracteristicas(objetivos, [[objetivo, *combo] for combo in combos], objetivos, 1.0, 1.0)
+    X.setflags(write=False)
+    # Todas las filas tienen el mismo número de unos: 3 + num_distractores + 2
+    indices = np.nonzero(X)[1].reshape(len(combos), -1) if combos else np.empty((0, 0), dtype=np.intp)
+    indices.setflags(write=False)
+    return combos, X, indices
+
+class ColaSugerencias:
+    """
+    Sugerencias precalculadas de un usuario para un número de distractores.
+
+    Guarda dos ventanas de no repetición (objetivos recientes y últimos
+    distractores): la que queda tras la última sugerencia generada, para que
+    cada sugerencia encolada respete las reglas frente a las anteriores, y
+    la que queda tras la última sugerencia servida, para poder descartar la
+    cola sin perder el historial reciente.
+    """
+
+    def __init__(self, last_notes: list[str], last_distractores: list[str]):
+        self.items: deque[SugerenciaResponse] = deque()
+        self.last_notes = list(last_notes)[:N_RECIENTES]
+        self.last_distractores = list(last_distractores)
+        self.served_notes = list(self.last_notes)
+        self.served_distractores = list(self.last_distractores)
+        self.rellenando = False
+
+    def registrar(self, sugerencia: SugerenciaResponse):
+        self.last_notes = ([sugerencia.objetivo] + self.last_notes)[:N_RECIENTES]
+        self.last_distractores = list(sugerencia.distractores)
+
+    def servir(self, sugerencia: SugerenciaResponse):
+        self.served_notes = ([sugerencia.objetivo] + self.served_notes)[:N_RECIENTES]
+        self.served_distractores = list(sugerencia.distractores)
+
+    def vaciar(self) -> "ColaSugerencias":
+        """
+        Devuelve una cola vacía que parte del historial servido.
+        """
+        return ColaSugerencias(self.served_notes, self.served_distractores)
+
+class CanalSugerencias:
+    """
+    Sugerencias de una partida servidas desde memoria (canal WebSocket de
+    sesión y /api/session/iniciar): el modelo del usuario y la ventana de no
+    repetición se leen una vez al empezar y se actualizan en memoria con cada
+    sugerencia servida, sin volver a consultar la base de datos. El modelo no
+    cambia durante la partida (se reentrena al terminarla).
+    """
+
+    def __init__(self, manager: "UserModelManager", user_id: int, model, historial: ColaSugerencias):
+        self.manager = manager
+        self.user_id = user_id
+        self.model = model
+        self.historial = historial
+
+    def siguiente(self, num_distractores: int) -> SugerenciaResponse:
+        sugerencia = self.manager._generar_sugerencia(self.model, self.historial.last_notes,
+                                                      self.historial.last_distractores, num_distractores)
+        self.historial.registrar(sugerencia)
+        return sugerencia
 
 class UserModelManager:
-    def __init__(self):
-        self.models = {}
+    def __init__(self, max_entries: int = MODEL_CACHE_MAX_ENTRIES, max_bytes: int | None = MODEL_CACHE_MAX_BYTES,
+                 compact: bool = MODEL_COMPACT_WEIGHTS, queue_size: int = SUGGESTION_QUEUE_SIZE,
+                 version_check_interval: float = MODEL_VERSION_CHECK_INTERVAL):
+        # Si compact es True, cada modelo se guarda y se cachea como su vector
+        # de pesos float32 (ver src/ml/compact_weights.py) en lugar de un pickle
+        self.compact = compact
+        # Caché LRU user_id -> modelo (None si el usuario aún no tiene modelo)
+        self.models = ModelCache(max_entries=max_entries, max_bytes=max_bytes, on_evict=self._olvidar_version)
+        # Versión (columna user_models.version) del modelo en caché y cuándo se
+        # comprobó por última vez. Con varios workers, cada uno revalida su
+        # copia comparando la versión como mucho cada version_check_interval
+        # segundos (un valor negativo desactiva la comprobación).
+        self.version_check_interval = version_check_interval
+        self._versiones: dict[int, tuple[int, float]] = {}
+        # Escrituras pendientes en segundo plano (write-behind) por usuario
+        self._pending_saves: dict[int, asyncio.Task] = {}
+        # Si queue_size > 0, se mantienen hasta queue_size sugerencias
+        # precalculadas por (user_id, num_distractores) para los usuarios activos
+        self.queue_size = queue_size
+        self._colas = ModelCache(max_entries=SUGGESTION_QUEUE_MAX_USERS)
+        self._rellenos: set[asyncio.Task] = set()
+        # Últimos intentos de cada usuario, para no repetir objetivos ni distractores
+        self.recientes = RecentAttempts(window=N_RECIENTES)
 
     def _get_model_path(self, user_id):
-        return os.path.join(MODELS_DIR, f"{user_id}.pkl")
+        # Cada guardado usa un archivo nuevo: los lectores de otros workers
+        # nunca ven un archivo a medio escribir ni uno que cambie bajo ellos
+        extension = "weights" if self.compact else "pkl"
+        return os.path.join(MODELS_DIR, f"{user_id}.{uuid.uuid4().hex[:12]}.{extension}")
+
+    def _deserializar(self, model_path, data: bytes):
+        """
+        Convierte el contenido de un archivo de modelo al formato del modo
+        actual. Los pickles existentes se exportan a pesos compactos si hace falta.
+        """
+        if model_path.endswith(".weights"):
+            pesos = compact_weights.pesos_desde_bytes(data)
+            return pesos if self.compact else compact_weights.modelo_desde_pesos(pesos)
+        model = pickle.loads(data)
+        return compact_weights.exportar_pesos(model) if self.compact else model
+
+    def _serializar(self, model):
+        """
+        Devuelve el valor que se guarda en caché y los bytes que se escriben en disco.
+        """
+        if self.compact:
+            pesos = compact_weights.exportar_pesos(model)
+            return pesos, pesos.tobytes()
+        return model, pickle.dumps(model)
 
-    async def _load_model(self, user_id: int):
+    async def _load_model(self, user_id: int, revalidate: bool = False, user_model_info=MISSING):
         """
-        Carga el modelo desde la base de datos (usando crud.get_user_model) si existe,
-        si no existe, deja el modelo en None.
+        Devuelve el modelo del usuario. Si está en caché no se lee el disco:
+        como mucho se comprueba su versión en la base de datos (ver
+        _version_vigente). Si no, se carga desde la base de datos (usando
+        crud.get_user_model) y se guarda en caché. Devuelve None si el
+        usuario todavía no tiene modelo.
+
+        Si el llamador ya leyó la fila de user_models (o sabe que no existe,
+        None), la pasa en user_model_info y se usa en lugar de consultarla.
         """
-        user_model_info = await crud.get_user_model(user_id)
-        if user_model_info and user_model_info["modelo_path"]:
+        model = self.models.get(user_id)
+        if model is not MISSING:
+            if user_model_info is not MISSING:
+                vigente = self._version_leida(user_id, user_model_info)
+            else:
+                vigente = await self._version_vigente(user_id, force=revalidate)
+            if vigente:
+                return model
+            self.models.pop(user_id)
+
+        model, size, version = None, 0, 0
+        # Si otro worker borra el archivo justo después de leer su ruta, se reintenta
+        for _ in range(3):
+            if user_model_info is MISSING:
+                with span("user_model", "db_fetch"):
+                    user_model_info = await crud.get_user_model(user_id)
+            if not user_model_info or not user_model_info["modelo_path"]:
+                break
             model_path = user_model_info["modelo_path"]
-            if os.path.exists(model_path):
-                with open(model_path, 'rb') as f:
-                    self.models[user_id] = pickle.load(f)
-                return
-        self.models[user_id] = None
+            with span("user_model", "model_load"):
+                data = await asyncio.to_thread(self._read_model_file, model_path)
+                if data is not None:
+                    model = self._deserializar(model_path, data)
+            if data is not None:
+                size = model.nbytes if self.compact else len(data)
+                version = user_model_info["version"]
+                break
+            user_model_info = MISSING
+        # Un entrenamiento concurrente pudo haber dejado un modelo más nuevo en caché
+        if user_id in self.models:
+            return self.models.get(user_id)
+        self.models.put(user_id, model, size=size)
+        self._versiones[user_id] = (version, time.monotonic())
+        return model
+
+    async def _version_vigente(self, user_id: int, force: bool = False) -> bool:
+        """
+        Indica si el modelo en caché sigue siendo la última versión guardada.
+        Solo consulta la base de datos (una lectura de un entero por clave
+        primaria) si la última comprobación tiene más de
+        version_check_interval segundos, o si force es True.
+        """
+        if user_id in self._pending_saves:
+            return True  # La copia en memoria es más nueva que la guardada
+        if self.version_check_interval < 0 and not force:
+            return True
+        version, checked_at = self._versiones.get(user_id, (0, 0.0))
+        if not force and time.monotonic() - checked_at < self.version_check_interval:
+            return True
+        with span("user_model", "version_check"):
+            actual = await crud.get_user_model_version(user_id) or 0
+        if user_id in self._pending_saves:
+            return True
+        self._versiones[user_id] = (version, time.monotonic())
+        return actual == version
 
-    async def _save_model(self, user_id, model):
+    def _version_leida(self, user_id: int, user_model_info) -> bool:
         """
-        Guarda el modelo en disco y actualiza la referencia en la base de datos.
+        Como _version_vigente, pero con la fila de user_models ya leída.
         """
+        if user_id in self._pending_saves:
+            return True
+        actual = user_model_info["version"] if user_model_info else 0
+        version, _ = self._versiones.get(user_id, (0, 0.0))
+        self._versiones[user_id] = (version, time.monotonic())
+        return actual == version
+
+    def _olvidar_version(self, user_id: int):
+        self._versiones.pop(user_id, None)
+
+    @staticmethod
+    def _read_model_file(model_path):
+        try:
+            with open(model_path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _write_model_file(model_path, data):
+        # Escritura atómica: archivo temporal en el mismo directorio y rename
+        tmp_path = f"{model_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, model_path)
+
+    @staticmethod
+    def _remove_model_file(model_path):
+        try:
+            os.remove(model_path)
+        except FileNotFoundError:
+            pass
+
+    async def _save_model(self, user_id, data: bytes, previous: asyncio.Task | None = None):
+        """
+        Guarda el modelo serializado en un archivo nuevo, apunta a él la fila de
+        user_models incrementando su versión y borra el archivo anterior.
+        """
+        # Respeta el orden de escritura si hay un guardado anterior en curso
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)
         model_path = self._get_model_path(user_id)
-        with open(model_path, 'wb') as f:
-            pickle.dump(model, f)
-        # Calcular accuracy si se desea, aquí se pone None por simplicidad
-        accuracy = None
-        await crud.save_user_model(user_id=user_id, modelo_path=model_path, accuracy=accuracy)
-
-    def _one_hot(self, nota):
-        # Codifica una nota musical como one-hot vector de tamaño 7
-        vec = np.zeros(len(NOTAS_DISPONIBLES))
-        if nota in NOTAS_DISPONIBLES:
-            idx = NOTAS_DISPONIBLES.index(nota)
-            vec[idx] = 1
-        return vec
-
-    def _mostradas_one_hot(self, notas_mostradas: list[str]):
-        vec = np.zeros(len(NOTAS_DISPONIBLES))
-        for n in notas_mostradas:
-            if n in NOTAS_DISPONIBLES:
-                idx = NOTAS_DISPONIBLES.index(n)
-                vec[idx] = 1
-        return vec
+        with span("user_model", "save"):
+            await asyncio.to_thread(self._write_model_file, model_path, data)
+            # Calcular accuracy si se desea, aquí se pone None por simplicidad
+            accuracy = None
+            saved = await crud.save_user_model(user_id=user_id, modelo_path=model_path, accuracy=accuracy)
+        if user_id in self.models:
+            self._versiones[user_id] = (saved["version"], time.monotonic())
+        previous_path = saved["previous_path"]
+        if previous_path and previous_path != model_path:
+            await asyncio.to_thread(self._remove_model_file, previous_path)
+
+    def _schedule_save(self, user_id, value, data: bytes):
+        """
+        Actualiza la caché con el modelo y programa su persistencia en segundo plano.
+        `value` y `data` son el resultado de _serializar, que se llama al
+        entrenar para que el archivo refleje ese estado aunque el modelo
+        vuelva a entrenarse antes de que termine la escritura.
+        """
+        self.models.put(user_id, value, size=len(data))
+        task = asyncio.create_task(self._save_model(user_id, data, self._pending_saves.get(user_id)))
+        self._pending_saves[user_id] = task
+        task.add_done_callback(lambda t: self._on_save_done(user_id, t))
+
+    def _on_save_done(self, user_id, task: asyncio.Task):
+        if self._pending_saves.get(user_id) is task:
+            del self._pending_saves[user_id]
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Error al guardar el modelo del usuario {user_id}: {task.exception()}")
+
+    async def flush(self):
+        """
+        Espera a que terminen todas las escrituras de modelos pendientes
+        y los rellenos de colas de sugerencias en curso.
+        """
+        pendientes = list(self._pending_saves.values()) + list(self._rellenos)
+        if pendientes:
+            await asyncio.gather(*pendientes, return_exceptions=True)
+
+    def cache_stats(self) -> dict:
+        stats = self.models.stats()
+        stats["pending_saves"] = len(self._pending_saves)
+        if self.queue_size > 0:
+            stats["suggestion_queues"] = self._colas.stats()
+        stats["recent_attempts"] = self.recientes.stats()
+        return stats
 
     def _features(self, nota_correcta, notas_mostradas, nota_elegida, tiempo_respuesta, dificultad):
-        # nota_correcta: str
-        # notas_mostradas: list[str]
-        # nota_elegida: str
-        # tiempo_respuesta: float
-        # dificultad: int
-
-        # One-hot de la nota correcta
-        correct_vec = self._one_hot(nota_correcta)
-        # One-hot de la nota elegida
-        elegida_vec = self._one_hot(nota_elegida)
-        # One-hot de las notas mostradas (concatenadas)
-        mostradas_vec = self._mostradas_one_hot(notas_mostradas)
-        # Normaliza tiempo y dificultad
-        tiempo = float(tiempo_respuesta)
-        dificultad = float(dificultad)
-        # Vector final: [correct_vec, elegida_vec, mostradas_vec, tiempo, dificultad]
-        return np.concatenate([correct_vec, elegida_vec, mostradas_vec, [tiempo, dificultad]]).reshape(1, -1)
+        # Vector de un solo intento: [correcta, elegida, mostradas, tiempo, dificultad]
+        # (mismo codificador que el entrenamiento por lotes, ver src/ml/features.py)
+        return matriz_caracteristicas([nota_correcta], [notas_mostradas], [nota_elegida],
+                                      float(tiempo_respuesta), float(dificultad))
 
     async def train_user(self, user_id: int, session_id: int):
         """
         Entrena el modelo del usuario de manera incremental usando solo los intentos de la sesión indicada.
         """
         # Obtener solo los intentos de la sesión recién finalizada
-        attempts = await crud.get_attempts_by_session(session_id)
+        with span("user_model", "db_fetch"):
+            attempts = await crud.get_attempts_by_session(session_id)
         if not attempts:
             return  # No hay datos para entrenar
 
-        X_list = []
-        y_list = []
-        for intento in attempts:
-            nota_correcta = intento["nota_correcta"]
-            notas_mostradas = intento["notas_mostradas"]
-            nota_elegida = intento["nota_elegida"]
-            tiempo_respuesta = intento["tiempo_respuesta"]
-            dificultad = 1.0  # Puedes ajustar si tienes este dato en la tabla
-            X = self._features(nota_correcta, notas_mostradas, nota_elegida, tiempo_respuesta, dificultad)
-            X_list.append(X.flatten())  # Asegura que sea un vector 1D
-            y_list.append(int(nota_correcta != nota_elegida))
-
-        X_new = np.stack(X_list) if X_list else np.empty((0,))  # Corrige la conversión a ndarray
-        y_new = np.array(y_list)
-
-        # Cargar modelo existente o crear uno nuevo si no existe
-        await self._load_model(user_id)
-        model = self.models[user_id]
-        if model is None:
-            model = SGDClassifier(loss="log_loss", penalty="l2", max_iter=1000, random_state=42)
-            model.partial_fit(X_new, y_new, classes=[0, 1])
-        else:
-            model.partial_fit(X_new, y_new)
+        # Cargar modelo existente (None si no existe) y ajustarlo fuera del event loop.
+        # Se revalida la versión para no entrenar sobre una copia que otro worker ya reemplazó
+        model = await self._load_model(user_id, revalidate=True)
+        value, data = await asyncio.to_thread(self._ajustar, model, attempts)
 
-        self.models[user_id] = model
-        await self._save_model(user_id, model)
+        # La caché se actualiza de inmediato; disco y base de datos en segundo plano
+        self._schedule_save(user_id, value, data)
+        # Lo calculado con el modelo anterior (p. ej. sugerencias precalculadas) ya no sirve
+        self._invalidar_colas(user_id)
 
-    async def sugerir_ejercicio(self, user_id: int, num_distractores=2):
-        await self._load_model(user_id)
-        model = self.models[user_id]
-        last_attempts = await crud.get_last_n_note_attempts(user_id=user_id, n=3)
-        last_notes = [attempt["nota_correcta"] for attempt in last_attempts] if last_attempts else []
+    def _ajustar(self, model, attempts):
+        """
+        Construye las características de los intentos y entrena con ellas una
+        copia del modelo, para no modificar el que están usando las
+        sugerencias. Se ejecuta en un hilo. Devuelve el resultado de _serializar.
+        """
+        dificultad = 1.0  # Puedes ajustar si tienes este dato en la tabla
+        # SGDClassifier entrena en float32 si recibe float32 y llega a otros
+        # coeficientes; se mantiene float64 como con los modelos ya guardados
+        with span("user_model", "feature_build"):
+            X_new, y_new = caracteristicas_intentos(attempts, dificultad, dtype=np.float64)
+
+        with span("user_model", "fit"):
+            if isinstance(model, np.ndarray):
+                model = compact_weights.modelo_desde_pesos(model)
+            elif model is not None:
+                model = copy.deepcopy(model)
+            if model is None:
+                model = compact_weights.nuevo_modelo()
+                model.partial_fit(X_new, y_new, classes=[0, 1])
+            else:
+                model.partial_fit(X_new, y_new)
+            return self._serializar(model)
+
+    async def _historial_reciente(self, user_id: int):
+        """
+        Devuelve las últimas notas objetivo del usuario (la más reciente primero)
+        y los distractores de su último intento, a partir de su ventana de
+        intentos recientes en memoria (ver src/ml/recent_attempts.py).
+        """
+        last_attempts = await self.recientes.get(user_id)
+        last_notes = [nota_correcta for _, _, nota_correcta, _ in last_attempts]
 
         # Obtener última entrada para comparar distractores
-        last_entry = last_attempts[0] if last_attempts else None
-        last_mostradas = last_entry["notas_mostradas"] if last_entry else []
-        last_distractores = [n for n in last_mostradas if n != last_entry["nota_correcta"]] if last_entry else []
+        if last_attempts:
+            _, _, nota_correcta, last_mostradas = last_attempts[0]
+            last_distractores = [n for n in last_mostradas if n != nota_correcta]
+        else:
+            last_distractores = []
+        return last_notes, last_distractores
 
+    def _generar_sugerencia(self, model, last_notes, last_distractores, num_distractores) -> SugerenciaResponse:
         objetivo = np.random.choice([n for n in NOTAS_DISPONIBLES if n not in last_notes])
 
         # Si no hay modelo, sugiere aleatorio
@@ -128,21 +388,18 @@ class UserModelManager:
             distractores = list(np.random.choice([n for n in NOTAS_DISPONIBLES if n != objetivo], num_distractores, replace=False))
             return SugerenciaResponse(objetivo=objetivo, distractores=distractores)
 
-        peor_prob = -1
-        mejor_distractores = None
-
         posibles_distractores = [n for n in NOTAS_DISPONIBLES if n != objetivo]
-        # Probar todas las combinaciones posibles de distractores
-        from itertools import combinations
-        for distractores_tuple in combinations(posibles_distractores, num_distractores):
-            distractores = list(distractores_tuple)
-            notas_mostradas = [objetivo] + distractores
-            # Simular que el usuario elige la nota correcta (para contexto)
-            X = self._features(objetivo, notas_mostradas, objetivo, 1.0, 1.0)
-            prob_error = model.predict_proba(X)[0][1]  # probabilidad de equivocarse
-            if prob_error > peor_prob:
-                peor_prob = prob_error
-                mejor_distractores = distractores
+        # Puntuar todas las combinaciones posibles de distractores en una sola llamada
+        combos, X, indices = _candidatos(str(objetivo), num_distractores)
+        mejor_distractores = None
+        if combos:
+            # probabilidad de equivocarse
+            with span("user_model", "scoring"):
+                if isinstance(model, np.ndarray):
+                    prob_error = compact_weights.puntuar(model, indices)
+                else:
+                    prob_error = model.predict_proba(X)[:, 1]
+            mejor_distractores = list(combos[int(np.argmax(prob_error))])
 
         if mejor_distractores:
             # Nueva regla: evitar repetir distractores anteriores exactamente
@@ -154,3 +411,109 @@ class UserModelManager:
             distractores = list(np.random.choice([n for n in NOTAS_DISPONIBLES if n != objetivo], num_distractores, replace=False))
             return SugerenciaResponse(objetivo=objetivo, distractores=distractores)
 
+    async def sugerir_ejercicio(self, user_id: int, num_distractores=2):
+        if self.queue_size > 0:
+            return await self._sugerir_desde_cola(user_id, num_distractores)
+        model = await self._load_model(user_id)
+        last_notes, last_distractores = await self._historial_reciente(user_id)
+        return self._generar_sugerencia(model, last_notes, last_distractores, num_distractores)
+
+    async def abrir_canal(self, user_id: int) -> CanalSugerencias:
+        """
+        Carga el modelo y el historial reciente del usuario para servir sus
+        sugerencias desde memoria (ver CanalSugerencias).
+        """
+        model = await self._load_model(user_id)
+        return CanalSugerencias(self, user_id, model, ColaSugerencias(*await self._historial_reciente(user_id)))
+
+    async def sugerencias_iniciales(self, user_id: int, num_sugerencias: int, num_distractores: int,
+                                    last_notes: list[str], last_mostradas: list[str],
+                                    user_model_info=MISSING) -> list[SugerenciaResponse]:
+        """
+        Primeras sugerencias de una partida, a partir del historial reciente y
+        de la fila de user_models ya leídos (ver crud.bootstrap_session): si el
+        modelo está en caché no se consulta la base de datos. Cada sugerencia
+        respeta las reglas de no repetición frente a las anteriores.
+        """
+        model = await self._load_model(user_id, user_model_info=user_model_info)
+        last_distractores = [n for n in last_mostradas if n != last_notes[0]] if last_notes else []
+        canal = CanalSugerencias(self, user_id, model, ColaSugerencias(last_notes, last_distractores))
+        return [canal.siguiente(num_distractores) for _ in range(num_sugerencias)]
+
+    async def _sugerir_desde_cola(self, user_id: int, num_distractores: int):
+        """
+        Sirve la siguiente sugerencia precalculada del usuario. Si la cola está
+        vacía, la genera en el momento. En ambos casos la cola se rellena en
+        segundo plano.
+        """
+        key = (user_id, num_distractores)
+        cola = self._colas.get(key, None)
+        if cola is not None and cola.items:
+            sugerencia = cola.items.popleft()
+        else:
+            model = await self._load_model(user_id)
+            cola = self._colas.get(key, None)
+            if cola is None:
+                cola = ColaSugerencias(*await self._historial_reciente(user_id))
+                self._colas.put(key, cola)
+            if cola.items:
+                sugerencia = cola.items.popleft()
+            else:
+                sugerencia = self._generar_sugerencia(model, cola.last_notes, cola.last_distractores, num_distractores)
+                cola.registrar(sugerencia)
+        cola.servir(sugerencia)
+        self._programar_relleno(user_id, num_distractores)
+        return sugerencia
+
+    def _programar_relleno(self, user_id: int, num_distractores: int):
+        cola = self._colas.get((user_id, num_distractores), None)
+        if cola is not None:
+            if cola.rellenando:
+                return
+            cola.rellenando = True
+        task = asyncio.create_task(self._rellenar_cola(user_id, num_distractores))
+        self._rellenos.add(task)
+        task.add_done_callback(self._on_relleno_done)
+
+    def _on_relleno_done(self, task: asyncio.Task):
+        self._rellenos.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Error al precalcular sugerencias: {task.exception()}")
+
+    async def _rellenar_cola(self, user_id: int, num_distractores: int):
+        """
+        Completa la cola de sugerencias del usuario hasta queue_size elementos.
+        """
+        key = (user_id, num_distractores)
+        cola = self._colas.get(key, None)
+        if cola is None:
+            cola = ColaSugerencias(*await self._historial_reciente(user_id))
+            if key in self._colas:
+                return  # Otra petición creó la cola mientras tanto
+            self._colas.put(key, cola)
+        cola.rellenando = True
+        try:
+            model = await self._load_model(user_id)
+            # La cola pudo invalidarse durante la espera (p. ej. por un reentrenamiento)
+            if self._colas.get(key, None) is not cola:
+                return
+            while len(cola.items) < self.queue_size:
+                sugerencia = self._generar_sugerencia(model, cola.last_notes, cola.last_distractores, num_distractores)
+                cola.registrar(sugerencia)
+                cola.items.append(sugerencia)
+        finally:
+            cola.rellenando = False
+
+    def _invalidar_colas(self, user_id: int):
+        """
+        Descarta las sugerencias precalculadas del usuario y las vuelve a
+        calcular en segundo plano con el modelo actual.
+        """
+        if self.queue_size <= 0:
+            return
+        for num_distractores in range(len(NOTAS_DISPONIBLES)):
+            key = (user_id, num_distractores)
+            cola = self._colas.pop(key)
+            if cola is not None:
+                self._colas.put(key, cola.vaciar())
+                self._programar_relleno(user_id, num_distractores)
@@ -0,0 +1,160 @@
+import time
+from collections import deque
+from datetime import datetime
+
+from src.config import RECENT_ATTEMPTS_MAX_USERS, RECENT_ATTEMPTS_TTL
+from src.db import crud
+from src.metrics import span
+from src.ml.model_cache import ModelCache
+
+
+class VentanaIntentos:
+    """
+    Últimos intentos de un usuario, el más reciente primero, como tuplas
+    (session_id, created_at, nota_correcta, notas_mostradas). Hasta que se
+    carga de la base de datos solo contiene los intentos registrados por este
+    proceso.
+    """
+
+    __slots__ = ("intentos", "cargada", "expira")
+
+    def __init__(self, window: int, expira: float):
+        self.intentos: deque[tuple] = deque(maxlen=window)
+        self.cargada = False
+        self.expira = expira
+
+    def fusionar(self, nuevos: list[tuple]):
+        # Un intento puede llegar dos veces (registrado en memoria y leído de
+        # la base de datos): se identifica por sesión, created_at y nota
+        por_clave = {intento[:3]: intento for intento in (*self.intentos, *nuevos)}
+        ordenados = sorted(por_clave.values(), key=lambda intento: intento[1], reverse=True)
+        self.intentos = deque(ordenados[:self.intentos.maxlen], maxlen=self.intentos.maxlen)
+
+
+class RecentAttempts:
+    """
+    Ventana deslizante en memoria con los últimos `window` intentos de cada
+    usuario, para aplicar las reglas de no repetición de las sugerencias sin
+    consultar su historial en cada petición.
+
+    La ventana de un usuario se llena con una consulta la primera vez que se
+    pide (crud.get_last_n_note_attempts) y después se actualiza con los
+    intentos que registra este proceso (`registrar`), también los que aún
+    esperan en el búfer de intentos. Los intentos solo traen su session_id: el
+    usuario de cada sesión se anota al crearla (`registrar_sesion`) o se
+    consulta una vez por sesión.
+
+    Cada ventana se vuelve a leer de la base de datos como mucho cada `ttl`
+    segundos, lo que acota cuánto tardan en verse los intentos registrados en
+    otro worker, y las que caducan sin usarse (usuarios inactivos) se
+    descartan. El número de usuarios está acotado por `max_users` (LRU).
+    """
+
+    def __init__(self, window: int, max_users: int = RECENT_ATTEMPTS_MAX_USERS, ttl: float = RECENT_ATTEMPTS_TTL):
+        self.window = window
+        self.ttl = ttl
+        self._ventanas = ModelCache(max_entries=max_users)
+        # session_id -> user_id de las sesiones que ha visto este proceso
+        self._sesiones = ModelCache(max_entries=max_users)
+        self._ultima_purga = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.purged = 0
+
+    async def get(self, user_id: int) -> list[tuple]:
+        """
+        Últimos intentos del usuario, el más reciente primero.
+        """
+        ahora = time.monotonic()
+        ventana = self._ventanas.get(user_id, None)
+        if ventana is not None and ventana.cargada and ahora < ventana.expira:
+            self.hits += 1
+            return list(ventana.intentos)
+
+        self.misses += 1
+        if ventana is not None and ventana.cargada:
+            self.expirations += 1
+        self._purgar(ahora)
+        with span("user_model", "db_fetch"):
+            filas = await crud.get_last_n_note_attempts(user_id=user_id, n=self.window)
+        # La ventana pudo crearse o recibir intentos durante la consulta
+        ventana = self._ventanas.get(user_id, None)
+        if ventana is None:
+            ventana = VentanaIntentos(self.window, 0.0)
+            self._ventanas.put(user_id, ventana)
+        ventana.fusionar([(fila["session_id"], fila["created_at"], fila["nota_correcta"], fila["notas_mostradas"])
+                          for fila in filas])
+        ventana.cargada = True
+        ventana.expira = ahora + self.ttl
+        return list(ventana.intentos)
+
+    def registrar_sesion(self, session_id: int, user_id: int):
+        self._sesiones.put(session_id, user_id)
+
+    async def registrar(self, intentos: list[dict], user_id: int | None = None):
+        """
+        Añade a las ventanas de sus usuarios los intentos recién registrados
+        (dicts como los de crud.log_note_attempts). Si no se indica user_id,
+        se obtiene de la sesión de cada intento.
+
+        Un error al buscar el usuario de una sesión no se propaga: el intento
+        ya está registrado y la ventana se corrige al volver a leerla.
+        """
+        ahora = time.monotonic()
+        nuevos: dict[int, list[tuple]] = {}
+        try:
+            for intento in intentos:
+                uid = user_id if user_id is not None else await self._usuario_de_sesion(intento["session_id"])
+                if uid is not None:
+                    nuevos.setdefault(uid, []).append((
+                        intento["session_id"], intento.get("created_at") or datetime.now(),
+                        intento["nota_correcta"], intento["notas_mostradas"],
+                    ))
+        except Exception as e:
+            print(f"Error al actualizar la ventana de intentos recientes: {e}")
+        for uid, tuplas in nuevos.items():
+            ventana = self._ventanas.get(uid, None)
+            if ventana is None:
+                ventana = VentanaIntentos(self.window, ahora + self.ttl)
+                self._ventanas.put(uid, ventana)
+            ventana.fusionar(tuplas)
+        self._purgar(ahora)
+
+    async def _usuario_de_sesion(self, session_id: int) -> int | None:
+        user_id = self._sesiones.get(session_id, None)
+        if user_id is None:
+            user_id = await crud.get_session_user(session_id)
+            if user_id is not None:
+                self._sesiones.put(session_id, user_id)
+        return user_id
+
+    def _purgar(self, ahora: float):
+        # Como mucho una pasada cada ttl segundos
+        if ahora - self._ultima_purga < self.ttl:
+            return
+        self._ultima_purga = ahora
+        for user_id, ventana in self._ventanas.items():
+            if ahora >= ventana.expira:
+                self._ventanas.pop(user_id)
+                self.purged += 1
+
+    def clear(self):
+        self._ventanas.clear()
+        self._sesiones.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "users": len(self._ventanas),
+            "sessions": len(self._sesiones),
+            "max_users": self._ventanas.max_entries,
+            "window": self.window,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expirations": self.expirations,
+            "purged": self.purged,
+            "evictions": self._ventanas.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,189 @@
+"""
+Reentrena desde cero los modelos de todos los usuarios con su historial
+completo de intentos (por ejemplo, después de cambiar las características):
+
+    python -m src.ml.retrain_all [--workers 8] [--chunk-attempts 50000]
+
+Los intentos se leen ordenados por usuario con un cursor del lado del
+servidor y se agrupan en bloques de usuarios completos, así que la memoria
+depende del tamaño de bloque y no del de la tabla. Cada bloque se ajusta en
+un proceso del pool: las sesiones de cada usuario se pasan a partial_fit en
+el orden en que se jugaron, igual que si se hubiera entrenado sesión a
+sesión desde el principio. Los modelos se guardan igual que en
+UserModelManager (archivo nuevo escrito de forma atómica e incremento de
+user_models.version).
+
+Los servidores en marcha solo ven los modelos nuevos si revalidan la versión
+de los modelos en caché (MODEL_VERSION_CHECK_INTERVAL >= 0; por defecto cada
+5 segundos). Con un valor negativo siguen sirviendo los modelos antiguos en
+caché, y las sugerencias precalculadas con ellos, hasta que se reinician o
+vuelven a entrenar a ese usuario. Por eso, si MODEL_VERSION_CHECK_INTERVAL es negativo,
+el script se niega a ejecutarse salvo con --servers-stopped (los servidores
+están parados o se reiniciarán al terminar).
+
+Aun así, un entrenamiento de sesión (TrainingJobQueue) del mismo usuario
+durante el reentrenamiento compite con él y gana el último que guarda: si
+ajustó el modelo antiguo, sobrescribe el de historial completo con uno al que
+solo se le añadió la última sesión, y si el cursor empezó antes de cerrarse
+una sesión, el modelo reentrenado no la incluye. Conviene ejecutarlo sin
+partidas en curso.
+"""
+import argparse
+import asyncio
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.config import MODEL_COMPACT_WEIGHTS, MODEL_VERSION_CHECK_INTERVAL
+from src.db import crud
+from src.db.database import database
+from src.ml import compact_weights
+from src.ml.features import matriz_caracteristicas, etiquetas
+from src.ml.predictor import UserModelManager
+
+# Igual que en UserModelManager._ajustar
+DIFICULTAD = 1.0
+
+# Guardados simultáneos (cada uno usa una conexión del pool)
+MAX_GUARDADOS = 8
+
+
+class Bloque:
+    """
+    Intentos de varios usuarios completos, por columnas. Para cada usuario
+    se guarda la posición del primer intento de cada una de sus sesiones.
+    """
+
+    def __init__(self):
+        self.usuarios: list[tuple[int, list[int]]] = []
+        self.correctas: list[str] = []
+        self.mostradas: list[list[str]] = []
+        self.elegidas: list[str] = []
+        self.tiempos: list[float] = []
+        self._sesion = None
+
+    def agregar(self, intento):
+        if not self.usuarios or self.usuarios[-1][0] != intento["user_id"]:
+            self.usuarios.append((intento["user_id"], []))
+            self._sesion = None
+        if intento["session_id"] != self._sesion:
+            self.usuarios[-1][1].append(len(self.correctas))
+            self._sesion = intento["session_id"]
+        self.correctas.append(intento["nota_correcta"])
+        self.mostradas.append(intento["notas_mostradas"])
+        self.elegidas.append(intento["nota_elegida"])
+        self.tiempos.append(intento["tiempo_respuesta"])
+
+    def __len__(self):
+        return len(self.correctas)
+
+
+def ajustar_bloque(bloque: Bloque, compact: bool) -> list[tuple[int, bytes]]:
+    """
+    Entrena un modelo nuevo por cada usuario del bloque y devuelve, por
+    usuario, los bytes que se escriben en disco. Se ejecuta en el pool de procesos.
+    """
+    X = matriz_caracteristicas(bloque.correctas, bloque.mostradas, bloque.elegidas,
+                               np.array(bloque.tiempos), DIFICULTAD, dtype=np.float64)
+    y = etiquetas(bloque.correctas, bloque.elegidas)
+
+    resultados = []
+    fines = [inicios[0] for _, inicios in bloque.usuarios[1:]] + [len(bloque)]
+    for (user_id, inicios), fin in zip(bloque.usuarios, fines):
+        model = compact_weights.nuevo_modelo()
+        cortes = inicios + [fin]
+        for i, (desde, hasta) in enumerate(zip(cortes, cortes[1:])):
+            if i == 0:
+                model.partial_fit(X[desde:hasta], y[desde:hasta], classes=[0, 1])
+            else:
+                model.partial_fit(X[desde:hasta], y[desde:hasta])
+        data = compact_weights.exportar_pesos(model).tobytes() if compact else pickle.dumps(model)
+        resultados.append((user_id, data))
+    return resultados
+
+
+class Reentrenamiento:
+    def __init__(self, workers: int, compact: bool):
+        self.workers = workers
+        self.compact = compact
+        self.manager = UserModelManager(compact=compact)
+        self.n_usuarios = 0
+        self.n_intentos = 0
+        self.inicio = time.perf_counter()
+        self._ultimo_aviso = self.inicio
+        self._guardados = asyncio.Semaphore(MAX_GUARDADOS)
+
+    async def _guardar(self, user_id: int, data: bytes):
+        async with self._guardados:
+            await self.manager._save_model(user_id, data)
+
+    async def procesar(self, pool, bloque: Bloque):
+        loop = asyncio.get_running_loop()
+        resultados = await loop.run_in_executor(pool, ajustar_bloque, bloque, self.compact)
+        # Cada guardado corre en su propia tarea (y conexión): la del cursor sigue ocupada
+        await asyncio.gather(*(self._guardar(user_id, data) for user_id, data in resultados))
+        self.n_usuarios += len(resultados)
+        self.n_intentos += len(bloque)
+        if time.perf_counter() - self._ultimo_aviso >= 10:
+            self._ultimo_aviso = time.perf_counter()
+            print(f"  {self.resumen()}")
+
+    def resumen(self) -> str:
+        segundos = time.perf_counter() - self.inicio
+        return (f"{self.n_usuarios} usuarios, {self.n_intentos} intentos en {segundos:.1f} s "
+                f"({self.n_usuarios / segundos:.1f} usuarios/s, {self.n_intentos / segundos:.0f} intentos/s)")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Procesos para ajustar modelos")
+    parser.add_argument("--chunk-attempts", type=int, default=50000,
+                        help="Intentos por bloque (los usuarios nunca se parten entre bloques)")
+    parser.add_argument("--fetch-size", type=int, default=10000, help="Filas por viaje del cursor")
+    parser.add_argument("--compact", action=argparse.BooleanOptionalAction, default=MODEL_COMPACT_WEIGHTS,
+                        help="Guardar pesos compactos en lugar de pickles (por defecto, MODEL_COMPACT_WEIGHTS)")
+    parser.add_argument("--servers-stopped", action="store_true",
+                        help="Los servidores están parados o se reiniciarán al terminar (obligatorio si "
+                             "MODEL_VERSION_CHECK_INTERVAL es negativo)")
+    args = parser.parse_args()
+    if MODEL_VERSION_CHECK_INTERVAL < 0 and not args.servers_stopped:
+        parser.error("MODEL_VERSION_CHECK_INTERVAL es negativo: los servidores en marcha no revalidan sus "
+                     "modelos en caché y seguirían sirviendo los antiguos. Configura "
+                     "MODEL_VERSION_CHECK_INTERVAL >= 0 en los servidores o páralos (o reinícialos al "
+                     "terminar) y usa --servers-stopped.")
+
+    await database.connect()
+    try:
+        reentrenamiento = Reentrenamiento(args.workers, args.compact)
+        # Bloques en vuelo acotados: el cursor se detiene mientras el pool está ocupado
+        en_vuelo: set[asyncio.Task] = set()
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            async def despachar(bloque):
+                en_vuelo.add(asyncio.create_task(reentrenamiento.procesar(pool, bloque)))
+                if len(en_vuelo) >= 2 * args.workers:
+                    terminados, _ = await asyncio.wait(en_vuelo, return_when=asyncio.FIRST_COMPLETED)
+                    en_vuelo.difference_update(terminados)
+                    for tarea in terminados:
+                        tarea.result()
+
+            bloque = Bloque()
+            async for intento in crud.iterate_attempts_by_user(fetch_size=args.fetch_size):
+                # Solo se cierra el bloque al empezar un usuario nuevo
+                if len(bloque) >= args.chunk_attempts and bloque.usuarios[-1][0] != intento["user_id"]:
+                    await despachar(bloque)
+                    bloque = Bloque()
+                bloque.agregar(intento)
+            if len(bloque):
+                await despachar(bloque)
+            if en_vuelo:
+                await asyncio.gather(*en_vuelo)
+        print(f"Modelos reentrenados: {reentrenamiento.resumen()}")
+    finally:
+        await database.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+import time
+from datetime import datetime
+
+from src.config import SKILL_CACHE_MAX_ENTRIES, SKILL_CACHE_TTL
+from src.ml.model_cache import ModelCache, MISSING
+
+
+class EntradaHabilidad:
+    """
+    Características de habilidad de un usuario (None si no tiene datos) y su
+    nivel predicho por el SVM, válidos mientras no cambie la marca de agua
+    (finished_at de la última sesión cerrada que conoce este proceso).
+    """
+
+    __slots__ = ("watermark", "expira", "features", "nivel")
+
+    def __init__(self, watermark: datetime | None, expira: float, features=MISSING, nivel: str | None = None):
+        self.watermark = watermark
+        self.expira = expira
+        self.features = features
+        self.nivel = nivel
+
+
+class SkillLevelCache:
+    """
+    Caché LRU con TTL de las características y el nivel de habilidad por usuario.
+
+    Las características solo cambian cuando se cierra una sesión del usuario,
+    así que `invalidate` (registrado como listener de
+    crud.update_training_session) deja una entrada vacía con la nueva marca
+    de agua. Una lectura que empezó antes del cierre no puede guardar datos
+    antiguos: `put` solo acepta la marca de agua vigente. El TTL acota cuánto
+    tarda en verse un cierre de sesión hecho en otro worker.
+    """
+
+    def __init__(self, max_entries: int = SKILL_CACHE_MAX_ENTRIES, ttl: float = SKILL_CACHE_TTL):
+        self.ttl = ttl
+        self._entries = ModelCache(max_entries=max_entries)
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, user_id: int) -> EntradaHabilidad | None:
+        """
+        Devuelve la entrada válida del usuario, o None si hay que leer de la base de datos.
+        """
+        entrada = self._entries.get(user_id, None)
+        if entrada is None or entrada.features is MISSING:
+            self.misses += 1
+            return None
+        if time.monotonic() >= entrada.expira:
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entrada
+
+    def watermark(self, user_id: int) -> datetime | None:
+        """
+        Marca de agua conocida del usuario; se pasa a `put` tras leer de la base de datos.
+        """
+        entrada = self._entries.get(user_id, None)
+        return entrada.watermark if entrada is not None else None
+
+    def put(self, user_id: int, watermark: datetime | None, features, nivel: str | None = None):
+        actual = self._entries.get(user_id, None)
+        if actual is not None and actual.watermark != watermark:
+            return  # Se cerró una sesión mientras se leían las características
+        if actual is None and watermark is not None:
+            return  # La entrada con esa marca de agua se expulsó entretanto
+        self._entries.put(user_id, EntradaHabilidad(watermark, time.monotonic() + self.ttl, features, nivel))
+
+    def invalidate(self, user_id: int, finished_at: datetime):
+        self.invalidations += 1
+        self._entries.put(user_id, EntradaHabilidad(finished_at, 0.0))
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self._entries.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "evictions": self._entries.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -1,22 +1,92 @@
 import os
 import pickle
-import pandas as pd
+import numpy as np
 import json
 
 from src.db import crud
-from src.config import SKILL_LEVEL_MODEL_PATH, SKILL_LEVEL_PARAMS_PATH
+from src.metrics import span
+from src.config import SKILL_LEVEL_MODEL_PATH, SKILL_LEVEL_PARAMS_PATH, SKILL_LEVEL_NPZ_PATH
+from src.ml.model_cache import MISSING
+from src.ml.skill_cache import SkillLevelCache
+from src.ml.svm_numpy import KernelSVM
+
+def nivel_por_precision(features: dict | None) -> str:
+    """
+    Nivel que muestra el cliente ('beginner', 'intermediate' o 'expert') a
+    partir de la precisión del jugador en cada dificultad: la media de las
+    precisiones mayores que 0 (o la única que haya), con umbrales 0.5 y 0.8.
+    Sin características, o sin aciertos en ninguna dificultad, es 'beginner'.
+    """
+    if not features:
+        return "beginner"  # Por defecto
+
+    # Lista de accuracies válidas (mayores a 0)
+    accuracies = [features[clave] for clave in ("accuracy_easy", "accuracy_medium", "accuracy_hard")
+                  if features[clave] > 0]
+    if not accuracies:
+        return "beginner"
+
+    # Con una sola dificultad, la media es esa misma precisión
+    avg_acc = sum(accuracies) / len(accuracies)
+    if avg_acc >= 0.8:
+        return "expert"
+    if avg_acc >= 0.5:
+        return "intermediate"
+    return "beginner"
 
 class SkillsPredictor:
-    def __init__(self):
+    def __init__(self, npz_path: str | None = SKILL_LEVEL_NPZ_PATH):
         """
         Initializes the SkillsPredictor by loading the pre-trained SVM model.
+
+        If the exported .npz model exists it is evaluated with NumPy
+        (src/ml/svm_numpy.py); otherwise the pickled SVC and its JSON
+        normalization parameters are used. Pass npz_path=None to force the pickle.
         """
         self.model = None
         self.normalization_params = None
+        # Características y niveles por usuario; se invalida al cerrar una sesión
+        self.cache = SkillLevelCache()
+
+        # Define the numerical features the model expects based on your notebook
+        self.numerical_features = [
+            'accuracy_easy',
+            'accuracy_medium',
+            'accuracy_hard',
+            'avg_response_time',
+            'games_played',
+            'avg_session_duration'
+        ]
+
+        if npz_path is not None and os.path.exists(npz_path):
+            self._load_npz(npz_path)
+        else:
+            self._load_pickle()
+
+        # Las características de desviación 0 se normalizan a 0
+        self._std_cero = self.feature_std == 0
+        self.feature_std[self._std_cero] = 1.0
+
+    def _load_npz(self, npz_path: str):
+        try:
+            self.model = KernelSVM(npz_path)
+            print(f"Model loaded successfully from {npz_path}")
+        except Exception as e:
+            raise IOError(f"Error loading model from {npz_path}: {e}")
+        if self.model.feature_names != self.numerical_features:
+            raise ValueError(f"Model features {self.model.feature_names} do not match {self.numerical_features}")
+        self.feature_mean = self.model.feature_mean.copy()
+        self.feature_std = self.model.feature_std.copy()
+        self.normalization_params = {
+            feature: {"mean": float(mean), "std": float(std)}
+            for feature, mean, std in zip(self.numerical_features, self.feature_mean, self.feature_std)
+        }
 
+    def _load_pickle(self):
         if not os.path.exists(SKILL_LEVEL_MODEL_PATH):
             raise FileNotFoundError(f"Model file not found at: {SKILL_LEVEL_MODEL_PATH}")
         try:
+            # Unpickling the SVC is what imports sklearn; nothing else here needs it
             with open(SKILL_LEVEL_MODEL_PATH, 'rb') as f:
                 self.model = pickle.load(f)
             print(f"Model loaded successfully from {SKILL_LEVEL_MODEL_PATH}")
@@ -36,15 +106,90 @@ class SkillsPredictor:
         except Exception as e:
             raise IOError(f"Error loading normalization parameters from {SKILL_LEVEL_PARAMS_PATH}: {e}")
 
-        # Define the numerical features the model expects based on your notebook
-        self.numerical_features = [
-            'accuracy_easy',
-            'accuracy_medium',
-            'accuracy_hard',
-            'avg_response_time',
-            'games_played',
-            'avg_session_duration'
-        ]
+        # Normalización Z-score como vectores en el orden de numerical_features.
+        # Las características sin parámetros quedan igual (media 0, desviación 1).
+        self.feature_mean = np.zeros(len(self.numerical_features))
+        self.feature_std = np.ones(len(self.numerical_features))
+        for i, feature in enumerate(self.numerical_features):
+            params = self.normalization_params.get(feature)
+            if params is not None:
+                self.feature_mean[i] = params["mean"]
+                self.feature_std[i] = params["std"]
+
+        # El modelo se entrenó con un DataFrame y guarda los nombres de las columnas.
+        # Las filas se construyen siempre en el orden de numerical_features, así que
+        # se comprueba una vez y se le pasan ndarrays (sin pandas ni avisos de sklearn).
+        feature_names = getattr(self.model, "feature_names_in_", None)
+        if feature_names is not None:
+            if list(feature_names) != self.numerical_features:
+                raise ValueError(f"Model features {list(feature_names)} do not match {self.numerical_features}")
+            del self.model.feature_names_in_
+
+    def _matriz(self, players_data) -> np.ndarray:
+        """
+        Construye la matriz de características (una fila por jugador, columnas
+        en el orden de numerical_features) como ndarray contiguo.
+        """
+        try:
+            return np.array([[data[feature] for feature in self.numerical_features] for data in players_data],
+                            dtype=np.float64)
+        except KeyError as e:
+            raise ValueError(f"Missing required feature in player_data fetched from DB: {e}. "
+                             f"Expected features: {self.numerical_features}")
+
+    def _normalizar(self, X: np.ndarray) -> np.ndarray:
+        """
+        Aplica la normalización Z-score a una matriz de características (una fila por usuario).
+        """
+        X = (X - self.feature_mean) / self.feature_std
+        X[:, self._std_cero] = 0.0
+        return X
+
+    def predict_matrix(self, X: np.ndarray) -> np.ndarray:
+        """
+        Predicts the skill level of each row of X (raw features, columns in
+        the order of numerical_features), without touching the database or
+        the cache. Used by the offline feature export.
+
+        Raises:
+            RuntimeError: If the model is not loaded.
+        """
+        if self.model is None:
+            raise RuntimeError("Model is not loaded. Cannot make predictions.")
+        return self._predecir(np.asarray(X, dtype=np.float64))
+
+    def _predecir(self, X: np.ndarray) -> np.ndarray:
+        """
+        Normaliza la matriz de características y la pasa al modelo, midiendo cada paso.
+        """
+        with span("skills", "normalize"):
+            X = self._normalizar(X)
+        with span("skills", "predict"):
+            return self.model.predict(X)
+
+    async def get_skill_features(self, user_id: int, features_leidas=MISSING, invalidaciones: int = 0) -> dict | None:
+        """
+        Devuelve las características de habilidad del usuario (como
+        crud.get_user_skill_features), leyéndolas de la caché si es posible.
+
+        Si el llamador ya las leyó de la base de datos (p. ej. con
+        crud.bootstrap_session), las pasa en features_leidas junto con el
+        valor de cache.invalidations de antes de leerlas, y se guardan en la
+        caché en lugar de consultarlas. Si entretanto se cerró alguna sesión
+        en este proceso no se guardan, por si son anteriores al cierre.
+        """
+        entrada = self.cache.get(user_id)
+        if entrada is not None:
+            return entrada.features
+        watermark = self.cache.watermark(user_id)
+        if features_leidas is not MISSING:
+            if self.cache.invalidations == invalidaciones:
+                self.cache.put(user_id, watermark, features_leidas)
+            return features_leidas
+        with span("skills", "feature_query"):
+            features = await crud.get_user_skill_features(user_id)
+        self.cache.put(user_id, watermark, features)
+        return features
 
     async def predict_skill_level(self, user_id: int) -> str:
         """
@@ -64,36 +209,75 @@ class SkillsPredictor:
         if self.model is None:
             raise RuntimeError("Model is not loaded. Cannot make predictions.")
 
-        # Obtener los datos del jugador desde la base de datos usando la funcion CRUD
-        player_data = await crud.get_user_skill_features(user_id)
+        # Nivel ya calculado para la marca de agua actual del usuario
+        entrada = self.cache.get(user_id)
+        if entrada is not None and entrada.nivel is not None:
+            return entrada.nivel
+
+        # Obtener los datos del jugador (de la caché o de la base de datos usando la funcion CRUD)
+        watermark = self.cache.watermark(user_id)
+        if entrada is not None:
+            player_data = entrada.features
+        else:
+            with span("skills", "feature_query"):
+                player_data = await crud.get_user_skill_features(user_id)
 
         if not player_data:
+            self.cache.put(user_id, watermark, player_data)
             raise ValueError(f"No skill features found for user ID: {user_id}. "
                              "Ensure the user has completed enough sessions according to the view criteria.")
 
+        # Aplicar normalización Z-score y predecir sobre un ndarray de una fila
+        prediction = self._predecir(self._matriz([player_data]))
+        nivel = str(prediction[0])
+        self.cache.put(user_id, watermark, player_data, nivel)
+        return nivel
 
-        # Aplicar normalización Z-score a las características especificadas en el JSON
-        normalized_player_data = player_data.copy()
-        for feature, params in self.normalization_params.items():
-            if feature in normalized_player_data:
-                mean = params["mean"]
-                std = params["std"]
-                if std == 0: # Evitar división por cero
-                    normalized_player_data[feature] = 0.0
-                else:
-                    normalized_player_data[feature] = (normalized_player_data[feature] - mean) / std
-            else:
-                print(f"Advertencia: La característica '{feature}' para normalización no se encontró en los datos del jugador.")
+    async def predict_skill_levels(self, user_ids: list[int]) -> dict[int, str | None]:
+        """
+        Predicts the skill level of several players at once. Levels in the
+        cache are reused; the rest are served with one database query and a
+        single call to the model.
 
-        # Create a DataFrame from the input data, ensuring correct column order
-        try:
-            input_df = pd.DataFrame([normalized_player_data], columns=self.numerical_features)
-        except KeyError as e:
-            # se mantiene por robustez.
-            raise ValueError(f"Missing required feature in player_data fetched from DB: {e}. "
-                             f"Expected features: {self.numerical_features}")
+        Args:
+            user_ids (list[int]): The IDs of the users.
+
+        Returns:
+            dict[int, str | None]: The predicted skill level of each user, or
+            None for users without skill features.
 
-        # Make the prediction
-        prediction = self.model.predict(input_df)
+        Raises:
+            RuntimeError: If the model is not loaded.
+        """
+        if self.model is None:
+            raise RuntimeError("Model is not loaded. Cannot make predictions.")
+
+        niveles: dict[int, str | None] = {}
+        players_data = {}  # Usuarios con características pero sin nivel calculado
+        pendientes = []  # Usuarios que hay que leer de la base de datos
+        for user_id in dict.fromkeys(user_ids):
+            entrada = self.cache.get(user_id)
+            if entrada is None:
+                pendientes.append(user_id)
+            elif entrada.nivel is not None or not entrada.features:
+                niveles[user_id] = entrada.nivel
+            else:
+                players_data[user_id] = entrada.features
+
+        watermarks = {user_id: self.cache.watermark(user_id) for user_id in [*players_data, *pendientes]}
+        if pendientes:
+            with span("skills", "feature_query"):
+                leidos = await crud.get_users_skill_features(pendientes)
+            for user_id in pendientes:
+                if user_id in leidos:
+                    players_data[user_id] = leidos[user_id]
+                else:
+                    niveles[user_id] = None
+                    self.cache.put(user_id, watermarks[user_id], None)
 
-        return prediction[0]
\ No newline at end of file
+        if players_data:
+            predictions = self._predecir(self._matriz(players_data.values()))
+            for (user_id, player_data), level in zip(players_data.items(), predictions):
+                niveles[user_id] = str(level)
+                self.cache.put(user_id, watermarks[user_id], player_data, niveles[user_id])
+        return {user_id: niveles[user_id] for user_id in user_ids}
@@ -0,0 +1,111 @@
+import zipfile
+
+import numpy as np
+
+# Versión del formato que genera MLTraining/svm_export.py
+FORMAT_VERSION = 1
+
+
+def cargar_npz_mmap(path: str) -> dict[str, np.ndarray]:
+    """
+    Abre un .npz sin comprimir mapeando en memoria cada array (np.load no
+    admite mmap_mode con .npz). Varios workers que abren el mismo archivo
+    comparten sus páginas a través de la caché del sistema operativo.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as zf, open(path, 'rb') as f:
+        for info in zf.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path}: {info.filename} está comprimido y no se puede mapear en memoria")
+            # Cabecera local del zip: 30 bytes fijos + nombre + campo extra
+            f.seek(info.header_offset + 26)
+            longitudes = np.frombuffer(f.read(4), dtype='<u2')
+            f.seek(info.header_offset + 30 + int(longitudes[0]) + int(longitudes[1]))
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject:
+                raise ValueError(f"{path}: {info.filename} contiene objetos de Python")
+            nombre = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if int(np.prod(shape)) == 0:
+                arrays[nombre] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[nombre] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                                           order='F' if fortran_order else 'C')
+    return arrays
+
+
+class KernelSVM:
+    """
+    Evaluador en NumPy de un SVC de sklearn exportado con
+    MLTraining/svm_export.py. Reproduce SVC.predict (votación uno contra uno
+    de libsvm) sin importar sklearn.
+    """
+
+    def __init__(self, path: str):
+        datos = cargar_npz_mmap(path)
+        version = int(datos["format_version"])
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Formato de modelo no soportado: versión {version} (se esperaba {FORMAT_VERSION})")
+
+        self.feature_names = [str(nombre) for nombre in datos["feature_names"]]
+        self.feature_mean = np.array(datos["feature_mean"])
+        self.feature_std = np.array(datos["feature_std"])
+        self.classes_ = np.array(datos["classes"])
+        self.kernel = str(datos["kernel"])
+        self.gamma = float(datos["gamma"])
+        self.coef0 = float(datos["coef0"])
+        self.degree = int(datos["degree"])
+        self.support_vectors = datos["support_vectors"]
+        self.dual_coef = datos["dual_coef"]
+        self.intercept = datos["intercept"]
+        n_support = np.asarray(datos["n_support"])
+        if self.kernel not in ("linear", "poly", "rbf", "sigmoid"):
+            raise ValueError(f"Kernel no soportado: {self.kernel}")
+
+        # Rango de vectores de soporte de cada clase (están agrupados por clase)
+        self._inicio = np.concatenate([[0], np.cumsum(n_support)])
+        self._sv_norma2 = np.einsum('ij,ij->i', self.support_vectors, self.support_vectors)
+        # Pares (i, j) en el orden de intercept (el de libsvm)
+        n_clases = len(self.classes_)
+        self._pares = [(i, j) for i in range(n_clases) for j in range(i + 1, n_clases)]
+
+    def _kernel(self, X: np.ndarray) -> np.ndarray:
+        producto = X @ self.support_vectors.T
+        if self.kernel == "linear":
+            return producto
+        if self.kernel == "poly":
+            return (self.gamma * producto + self.coef0) ** self.degree
+        if self.kernel == "sigmoid":
+            return np.tanh(self.gamma * producto + self.coef0)
+        distancia2 = np.einsum('ij,ij->i', X, X)[:, None] + self._sv_norma2 - 2 * producto
+        return np.exp(-self.gamma * np.maximum(distancia2, 0.0))
+
+    def decision_pares(self, X: np.ndarray) -> np.ndarray:
+        """
+        Valor de decisión de libsvm para cada par de clases (i, j), una
+        columna por par: positivo si gana la clase i.
+        """
+        K = self._kernel(np.asarray(X, dtype=np.float64))
+        decision = np.empty((K.shape[0], len(self._pares)))
+        for p, (i, j) in enumerate(self._pares):
+            si = slice(self._inicio[i], self._inicio[i + 1])
+            sj = slice(self._inicio[j], self._inicio[j + 1])
+            decision[:, p] = (K[:, si] @ self.dual_coef[j - 1, si] + K[:, sj] @ self.dual_coef[i, sj]
+                              + self.intercept[p])
+        if len(self.classes_) == 2:
+            # sklearn guarda dual_coef_ e intercept_ con el signo cambiado en el caso binario
+            decision = -decision
+        return decision
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        decision = self.decision_pares(X)
+        votos = np.zeros((decision.shape[0], len(self.classes_)), dtype=np.int64)
+        for p, (i, j) in enumerate(self._pares):
+            gana_i = decision[:, p] > 0
+            votos[gana_i, i] += 1
+            votos[~gana_i, j] += 1
+        # En caso de empate gana la primera clase, como en libsvm
+        return self.classes_[np.argmax(votos, axis=1)]
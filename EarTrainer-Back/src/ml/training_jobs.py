@@ -0,0 +1,142 @@
+import asyncio
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from src.config import TRAINING_WORKERS, TRAINING_JOBS_RETAINED
+
+# Estados de un trabajo de entrenamiento
+PENDIENTE = "pendiente"
+EN_CURSO = "en_curso"
+COMPLETADO = "completado"
+ERROR = "error"
+
+
+class TrainingJob:
+    """
+    Trabajo de entrenamiento de un usuario. Puede agrupar varias sesiones si
+    se encolan mientras el trabajo todavía está pendiente.
+    """
+
+    def __init__(self, user_id: int, session_id: int):
+        self.job_id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.session_ids = [session_id]
+        self.estado = PENDIENTE
+        self.error: str | None = None
+        self.created_at = datetime.now()
+        self.finished_at: datetime | None = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "user_id": self.user_id,
+            "session_ids": list(self.session_ids),
+            "estado": self.estado,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class TrainingJobQueue:
+    """
+    Cola de trabajos de entrenamiento para UserModelManager.train_user.
+
+    Cada usuario tiene como máximo un trabajo en curso y uno pendiente: las
+    peticiones que llegan mientras hay uno pendiente se agrupan en él, y el
+    pendiente no empieza hasta que termina el que está en curso. Los
+    trabajos se ejecutan con `workers` tareas concurrentes; el ajuste del
+    modelo corre en un hilo (ver UserModelManager._ajustar).
+    """
+
+    def __init__(self, model_manager, workers: int = TRAINING_WORKERS, retained: int = TRAINING_JOBS_RETAINED):
+        self.model_manager = model_manager
+        self.workers = workers
+        self.retained = retained
+        self._jobs: OrderedDict[str, TrainingJob] = OrderedDict()
+        self._pendientes: dict[int, TrainingJob] = {}  # user_id -> trabajo pendiente
+        self._en_curso: set[int] = set()  # user_id con un trabajo en curso
+        self._queue: asyncio.Queue[TrainingJob] = asyncio.Queue()
+        self._tasks: list[asyncio.Task] = []
+
+    def enqueue(self, user_id: int, session_id: int) -> TrainingJob:
+        """
+        Encola el entrenamiento de una sesión y devuelve el trabajo que la incluye.
+        """
+        job = self._pendientes.get(user_id)
+        if job is not None:
+            if session_id not in job.session_ids:
+                job.session_ids.append(session_id)
+            return job
+
+        job = TrainingJob(user_id, session_id)
+        self._jobs[job.job_id] = job
+        self._pendientes[user_id] = job
+        if user_id not in self._en_curso:
+            self._queue.put_nowait(job)
+        self._purgar()
+        return job
+
+    def get(self, job_id: str) -> TrainingJob | None:
+        return self._jobs.get(job_id)
+
+    def _purgar(self):
+        # Olvidar los trabajos terminados más antiguos
+        while len(self._jobs) > self.retained:
+            job_id, job = next(iter(self._jobs.items()))
+            if job.estado not in (COMPLETADO, ERROR):
+                break
+            del self._jobs[job_id]
+
+    async def _run(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._ejecutar(job)
+            finally:
+                self._queue.task_done()
+
+    async def _ejecutar(self, job: TrainingJob):
+        # A partir de aquí las nuevas peticiones del usuario crean otro trabajo
+        if self._pendientes.get(job.user_id) is job:
+            del self._pendientes[job.user_id]
+        self._en_curso.add(job.user_id)
+        job.estado = EN_CURSO
+        try:
+            for session_id in job.session_ids:
+                await self.model_manager.train_user(user_id=job.user_id, session_id=session_id)
+            job.estado = COMPLETADO
+        except Exception as e:
+            job.estado = ERROR
+            job.error = str(e)
+            print(f"Error en el entrenamiento {job.job_id} del usuario {job.user_id}: {e}")
+        finally:
+            job.finished_at = datetime.now()
+            self._en_curso.discard(job.user_id)
+            siguiente = self._pendientes.get(job.user_id)
+            if siguiente is not None:
+                self._queue.put_nowait(siguiente)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize(),
+            "running": len(self._en_curso),
+            "pending_users": len(self._pendientes),
+        }
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """
+        Termina los trabajos encolados y detiene las tareas de la cola.
+        """
+        if self._tasks:
+            await self._queue.join()
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks = []
@@ -0,0 +1,94 @@
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from src.config import PROFILER_ENABLED, PROFILER_INTERVAL, PROFILER_MAX_PROFILES
+
+# Últimos perfiles (id -> collapsed stacks), servidos en GET /debug/profile/{id}
+perfiles: OrderedDict[str, str] = OrderedDict()
+
+
+class PerfilMuestreo:
+    """
+    Profiler de muestreo: un hilo lee cada `intervalo` segundos la pila del
+    hilo que lo creó (el del event loop) y cuenta cuántas veces aparece cada
+    pila. El resultado está en formato "collapsed stacks"
+    (funcion;funcion;funcion N), el que leen flamegraph.pl y speedscope.
+
+    Como el event loop atiende varias peticiones a la vez, las muestras
+    incluyen también el trabajo de las peticiones concurrentes.
+    """
+
+    def __init__(self, intervalo: float = PROFILER_INTERVAL):
+        self.intervalo = intervalo
+        self.muestras: Counter = Counter()
+        self._objetivo = threading.get_ident()
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, name="profiler", daemon=True)
+
+    def _muestrear(self):
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self._objetivo)
+            pila = []
+            while frame is not None:
+                codigo = frame.f_code
+                pila.append(f"{codigo.co_qualname} ({codigo.co_filename.rsplit('/', 1)[-1]}:{codigo.co_firstlineno})")
+                frame = frame.f_back
+            if pila:
+                self.muestras[";".join(reversed(pila))] += 1
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._hilo.join()
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{pila} {n}" for pila, n in self.muestras.most_common()) + "\n"
+
+
+class ProfilerMiddleware:
+    """
+    Con PROFILER_ENABLED, perfila las peticiones que lo piden con la cabecera
+    `X-Profile: 1` o el parámetro `?profile=1`. La respuesta lleva la cabecera
+    `X-Profile-Id` y el perfil se consulta en GET /debug/profile/{id}. Solo se
+    perfila una petición a la vez; las que lo piden mientras tanto se
+    atienden sin perfilar.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._activo = False
+
+    def _pedido(self, scope) -> bool:
+        if b"profile=1" in scope.get("query_string", b"").split(b"&"):
+            return True
+        return any(nombre == b"x-profile" and valor == b"1" for nombre, valor in scope.get("headers", ()))
+
+    async def __call__(self, scope, receive, send):
+        if not PROFILER_ENABLED or scope["type"] != "http" or self._activo or not self._pedido(scope):
+            await self.app(scope, receive, send)
+            return
+
+        perfil_id = uuid.uuid4().hex[:12]
+
+        async def send_con_id(mensaje):
+            if mensaje["type"] == "http.response.start":
+                mensaje["headers"] = [*mensaje.get("headers", []), (b"x-profile-id", perfil_id.encode())]
+            await send(mensaje)
+
+        self._activo = True
+        inicio = time.perf_counter()
+        try:
+            with PerfilMuestreo() as perfil:
+                await self.app(scope, receive, send_con_id)
+        finally:
+            self._activo = False
+            perfiles[perfil_id] = (f"# {scope['method']} {scope['path']} "
+                                   f"{(time.perf_counter() - inicio) * 1000:.1f} ms\n" + perfil.collapsed())
+            while len(perfiles) > PROFILER_MAX_PROFILES:
+                perfiles.popitem(last=False)
@@ -1,23 +1,69 @@
-from fastapi import APIRouter, HTTPException
-from src.ml.predictor import UserModelManager
-from src.schemas import IntentoInput, CrearSesionInput, CrearSesionResponse, CerrarSesionInput, CerrarSesionResponse
+import json
+import time
+
+from fastapi import APIRouter, HTTPException, Depends, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from src.schemas import (IntentoInput, IntentosLoteInput, CrearSesionInput, CrearSesionResponse, CerrarSesionInput,
+                         CerrarSesionResponse, IniciarSesionInput, IniciarSesionResponse, MensajeCanalSesion)
 from src.db import crud
+from src.db.attempt_buffer import attempt_buffer, SesionTerminadaError
+from src.dependencies import get_model_manager, get_training_jobs
+from src.metrics import WS_LATENCIA
+from src.ml.predictor import UserModelManager, N_RECIENTES
+from src.ml.training_jobs import TrainingJobQueue
+from src.ml.skills_predictor import nivel_por_precision
+from src.routers import skill
 from datetime import datetime
 
 router = APIRouter()
-model_manager = UserModelManager()
 
 @router.post("/crear", response_model=CrearSesionResponse)
-async def crear_sesion(data: CrearSesionInput):
+async def crear_sesion(data: CrearSesionInput, model_manager: UserModelManager = Depends(get_model_manager)):
     """
     Crea una nueva sesión de entrenamiento para el usuario.
     """
     try:
         session_id = await crud.create_training_session(user_id=data.user_id, dificultad=data.dificultad)
+        model_manager.recientes.registrar_sesion(session_id, data.user_id)
+        attempt_buffer.sesion_abierta(session_id)
         return CrearSesionResponse(session_id=session_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
+@router.post("/iniciar", response_model=IniciarSesionResponse)
+async def iniciar_sesion(data: IniciarSesionInput, model_manager: UserModelManager = Depends(get_model_manager)):
+    """
+    Empieza una partida en una sola petición: crea el usuario si no existe y
+    la sesión, y devuelve el nivel de habilidad (como /api/skill/get-skill-level)
+    y las primeras `num_sugerencias` sugerencias (como /api/trainer/sugerir_ejercicio).
+    Todo lo que se lee de la base de datos sale de una sola sentencia
+    (crud.bootstrap_session); las características de habilidad leídas se
+    guardan en la caché de habilidad, que comparte con /api/skill/get-skill-level.
+    """
+    try:
+        skills = skill.skills_predictor_instance
+        invalidaciones = skills.cache.invalidations if skills is not None else 0
+        inicio = await crud.bootstrap_session(data.username, data.dificultad, N_RECIENTES)
+        features = inicio["features"]
+        if skills is not None:
+            features = await skills.get_skill_features(inicio["user_id"], features_leidas=features,
+                                                       invalidaciones=invalidaciones)
+        model_manager.recientes.registrar_sesion(inicio["session_id"], inicio["user_id"])
+        attempt_buffer.sesion_abierta(inicio["session_id"])
+        sugerencias = await model_manager.sugerencias_iniciales(
+            inicio["user_id"], data.num_sugerencias, data.num_distractores,
+            inicio["last_notes"], inicio["last_mostradas"], user_model_info=inicio["user_model"],
+        )
+        return IniciarSesionResponse(
+            user_id=inicio["user_id"],
+            username=inicio["username"],
+            session_id=inicio["session_id"],
+            level=nivel_por_precision(features),
+            sugerencias=sugerencias,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/terminar", response_model=CerrarSesionResponse)
 async def cerrar_sesion(data: CerrarSesionInput):
     """
@@ -26,25 +72,137 @@ async def cerrar_sesion(data: CerrarSesionInput):
     try:
         # Asegura que finished_at sea un datetime sin zona horaria (naive)
         finished_at = datetime.now().replace(tzinfo=None)
+        # Escribir los intentos que sigan en el búfer antes de cerrar la sesión
+        await attempt_buffer.flush_session(data.session_id)
         await crud.update_training_session(session_id=data.session_id, finished_at=finished_at)
+        attempt_buffer.sesion_terminada(data.session_id)
         return {"success": True, "message": "Sesión cerrada correctamente"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _intento_a_dict(intento: IntentoInput) -> dict:
+    # created_at se fija al recibir el intento, aunque se escriba más tarde desde el búfer
+    return {**intento.model_dump(), "created_at": datetime.now().replace(tzinfo=None)}
+
 @router.post("/registrar_intento")
-async def registrar_intento(intento: IntentoInput):
+async def registrar_intento(intento: IntentoInput, model_manager: UserModelManager = Depends(get_model_manager)):
     """
-    Registra un intento del usuario en la base de datos.
+    Registra un intento del usuario en la base de datos y en su ventana de
+    intentos recientes. Responde 409 si la sesión no existe o ya terminó.
     """
     try:
-        await crud.log_note_attempt(
-            session_id=intento.session_id,
-            nota_correcta=intento.nota_correcta,
-            notas_mostradas=intento.notas_mostradas,
-            nota_elegida=intento.nota_elegida,
-            tiempo_respuesta=intento.tiempo_respuesta,
-            es_correcto=intento.es_correcto
-        )
+        intentos = [_intento_a_dict(intento)]
+        await attempt_buffer.add(intentos)
+        await model_manager.recientes.registrar(intentos)
         return {"success": True, "message": "Intento registrado en la base de datos"}
+    except SesionTerminadaError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/registrar_intentos")
+async def registrar_intentos(data: IntentosLoteInput, model_manager: UserModelManager = Depends(get_model_manager)):
+    """
+    Registra varios intentos de una vez, en un solo viaje a la base de datos.
+    Si alguno es de una sesión que no existe o ya terminó, no se registra
+    ninguno y se responde 409.
+    """
+    try:
+        intentos = [_intento_a_dict(intento) for intento in data.intentos]
+        await attempt_buffer.add(intentos)
+        await model_manager.recientes.registrar(intentos)
+        return {"success": True, "message": f"{len(data.intentos)} intentos registrados en la base de datos"}
+    except SesionTerminadaError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.websocket("/ws")
+async def canal_sesion(websocket: WebSocket, user_id: int, session_id: int, num_distractores: int = 2,
+                       model_manager: UserModelManager = Depends(get_model_manager),
+                       training_jobs: TrainingJobQueue = Depends(get_training_jobs)):
+    """
+    Canal en tiempo real de una partida ya creada (/crear o /iniciar). El
+    modelo del usuario y su historial reciente se cargan una vez al conectar;
+    después cada nota cuesta un solo mensaje en cada sentido, sin cabeceras
+    HTTP ni consultas para sugerir. Protocolo (JSON):
+
+      servidor -> {"tipo": "sugerencia", "objetivo": "C", "distractores": [...]}  (al conectar)
+      cliente  -> {"tipo": "intento", "nota_elegida": "C", "tiempo_respuesta": 1.2}
+      servidor -> {"tipo": "sugerencia", "es_correcto": true, "objetivo": ..., "distractores": [...]}
+                  (o {"tipo": "registrado", "es_correcto": ...} si el intento trae "siguiente": false)
+      cliente  -> {"tipo": "terminar"}
+      servidor -> {"tipo": "terminada", "job_id": "..."} y cierra el canal
+
+    El intento se registra contra la última sugerencia enviada (es_correcto se
+    calcula aquí). Los mensajes no válidos se responden con
+    {"tipo": "error", "detalle": ...} sin cerrar el canal. Si la sesión no
+    existe, es de otro usuario o ya está terminada, el canal se cierra con el
+    código 1008.
+    """
+    await websocket.accept()
+    try:
+        sesion = await crud.get_training_session(session_id)
+        if sesion is None or sesion["user_id"] != user_id or sesion["finished_at"] is not None:
+            await websocket.close(code=1008, reason="La sesión no existe, no es de este usuario o ya terminó")
+            return
+        model_manager.recientes.registrar_sesion(session_id, user_id)
+        attempt_buffer.sesion_abierta(session_id)
+        canal = await model_manager.abrir_canal(user_id)
+        pendiente = canal.siguiente(num_distractores)
+    except Exception as e:
+        await websocket.send_text(json.dumps({"tipo": "error", "detalle": str(e)}))
+        await websocket.close(code=1011)
+        return
+    await websocket.send_text(json.dumps({"tipo": "sugerencia", **pendiente.model_dump()}))
+
+    try:
+        while True:
+            texto = await websocket.receive_text()
+            inicio = time.perf_counter()
+            try:
+                mensaje = MensajeCanalSesion.model_validate_json(texto)
+            except ValidationError as e:
+                detalle = e.errors(include_url=False, include_context=False)
+                await websocket.send_text(json.dumps({"tipo": "error", "detalle": detalle}))
+                continue
+
+            try:
+                if mensaje.tipo == "terminar":
+                    await attempt_buffer.flush_session(session_id)
+                    await crud.update_training_session(session_id=session_id, finished_at=datetime.now().replace(tzinfo=None))
+                    attempt_buffer.sesion_terminada(session_id)
+                    job = training_jobs.enqueue(user_id=user_id, session_id=session_id)
+                    await websocket.send_text(json.dumps({"tipo": "terminada", "job_id": job.job_id}))
+                    WS_LATENCIA.observar((mensaje.tipo,), time.perf_counter() - inicio)
+                    await websocket.close()
+                    return
+
+                if mensaje.nota_elegida is None or mensaje.tiempo_respuesta is None:
+                    await websocket.send_text(json.dumps(
+                        {"tipo": "error", "detalle": "El intento necesita nota_elegida y tiempo_respuesta"}))
+                    continue
+                es_correcto = mensaje.nota_elegida == pendiente.objetivo
+                intentos = [{
+                    "session_id": session_id,
+                    "nota_correcta": pendiente.objetivo,
+                    "notas_mostradas": [pendiente.objetivo, *pendiente.distractores],
+                    "nota_elegida": mensaje.nota_elegida,
+                    "tiempo_respuesta": mensaje.tiempo_respuesta,
+                    "es_correcto": es_correcto,
+                    "created_at": datetime.now().replace(tzinfo=None),
+                }]
+                await attempt_buffer.add(intentos)
+                await model_manager.recientes.registrar(intentos, user_id=user_id)
+                if mensaje.siguiente:
+                    pendiente = canal.siguiente(num_distractores)
+                    respuesta = {"tipo": "sugerencia", "es_correcto": es_correcto, **pendiente.model_dump()}
+                else:
+                    respuesta = {"tipo": "registrado", "es_correcto": es_correcto}
+            except Exception as e:
+                respuesta = {"tipo": "error", "detalle": str(e)}
+            await websocket.send_text(json.dumps(respuesta))
+            WS_LATENCIA.observar((mensaje.tipo,), time.perf_counter() - inicio)
+    except WebSocketDisconnect:
+        # Los intentos que queden en el búfer se escriben en su siguiente vaciado periódico
+        pass
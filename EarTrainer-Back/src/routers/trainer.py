@@ -1,12 +1,14 @@
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Depends
+from src.dependencies import get_model_manager, get_training_jobs
 from src.ml.predictor import UserModelManager
-from src.schemas import SugerenciaResponse, SugerenciaRequest
+from src.ml.training_jobs import TrainingJobQueue
+from src.schemas import SugerenciaResponse, SugerenciaRequest, EntrenamientoResponse, TrabajoEntrenamientoResponse
+from src.db.attempt_buffer import attempt_buffer
 
 router = APIRouter()
-model_manager = UserModelManager()
 
 @router.post("/sugerir_ejercicio", response_model=SugerenciaResponse)
-async def sugerir_ejercicio(req: SugerenciaRequest):
+async def sugerir_ejercicio(req: SugerenciaRequest, model_manager: UserModelManager = Depends(get_model_manager)):
     """
     Sugiere una nota objetivo y los distractores para el usuario.
     """
@@ -16,13 +18,35 @@ async def sugerir_ejercicio(req: SugerenciaRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/entrenar_modelo")
-async def entrenar_modelo(user_id: int = Body(...), session_id: int = Body(...)):
+@router.post("/entrenar_modelo", response_model=EntrenamientoResponse)
+async def entrenar_modelo(user_id: int = Body(...), session_id: int = Body(...),
+                          training_jobs: TrainingJobQueue = Depends(get_training_jobs)):
     """
-    Entrena el modelo del usuario de manera incremental usando los intentos de la sesión indicada.
+    Encola el entrenamiento incremental del modelo del usuario con los intentos de la sesión indicada.
+    El estado del trabajo se consulta en /entrenamientos/{job_id}.
     """
     try:
-        await model_manager.train_user(user_id=user_id, session_id=session_id)
-        return {"success": True, "message": "Modelo entrenado correctamente"}
+        # El entrenamiento lee los intentos de la sesión desde la base de datos
+        await attempt_buffer.flush_session(session_id)
+        job = training_jobs.enqueue(user_id=user_id, session_id=session_id)
+        return EntrenamientoResponse(success=True, message="Entrenamiento del modelo encolado", job_id=job.job_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/entrenamientos/{job_id}", response_model=TrabajoEntrenamientoResponse)
+async def estado_entrenamiento(job_id: str, training_jobs: TrainingJobQueue = Depends(get_training_jobs)):
+    """
+    Devuelve el estado de un trabajo de entrenamiento (pendiente, en_curso, completado o error).
+    """
+    job = training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No existe el trabajo de entrenamiento {job_id}")
+    return TrabajoEntrenamientoResponse(**job.to_dict())
+
+@router.get("/cache_stats")
+async def cache_stats(model_manager: UserModelManager = Depends(get_model_manager),
+                      training_jobs: TrainingJobQueue = Depends(get_training_jobs)):
+    """
+    Devuelve las estadísticas de la caché de modelos de usuario (aciertos, fallos, tamaño).
+    """
+    return {**model_manager.cache_stats(), "training_jobs": training_jobs.stats()}
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Literal, Optional
 
 class SugerenciaRequest(BaseModel):
     user_id: int
@@ -9,6 +10,20 @@ class SugerenciaResponse(BaseModel):
     objetivo: str
     distractores: List[str]
 
+class EntrenamientoResponse(BaseModel):
+    success: bool
+    message: str
+    job_id: str
+
+class TrabajoEntrenamientoResponse(BaseModel):
+    job_id: str
+    user_id: int
+    session_ids: List[int]
+    estado: str
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
 class IntentoInput(BaseModel):
     session_id: int
     nota_correcta: str
@@ -17,6 +32,9 @@ class IntentoInput(BaseModel):
     tiempo_respuesta: float
     es_correcto: bool
 
+class IntentosLoteInput(BaseModel):
+    intentos: List[IntentoInput]
+
 class CrearSesionInput(BaseModel):
     user_id: int
     dificultad: str
@@ -24,6 +42,26 @@ class CrearSesionInput(BaseModel):
 class CrearSesionResponse(BaseModel):
     session_id: int
 
+class IniciarSesionInput(BaseModel):
+    username: str
+    dificultad: str
+    num_distractores: int = 2
+    num_sugerencias: int = Field(1, ge=1, le=10)
+
+class IniciarSesionResponse(BaseModel):
+    user_id: int
+    username: str
+    session_id: int
+    level: str
+    sugerencias: List[SugerenciaResponse]
+
+class MensajeCanalSesion(BaseModel):
+    # Mensajes del cliente en el canal WebSocket de sesión (/api/session/ws)
+    tipo: Literal["intento", "terminar"]
+    nota_elegida: Optional[str] = None
+    tiempo_respuesta: Optional[float] = None
+    siguiente: bool = True
+
 class CerrarSesionInput(BaseModel):
     session_id: int
     
@@ -37,3 +75,6 @@ class CrearUsuarioInput(BaseModel):
 class CrearUsuarioResponse(BaseModel):
     user_id: int
     username: str
+
+class NivelesHabilidadInput(BaseModel):
+    user_ids: List[int] = Field(..., min_length=1, max_length=1000)
@@ -1,88 +1,169 @@
+"""
+Búsqueda de hiperparámetros del SVM de habilidad musical con validación cruzada.
+
+Cada configuración (kernel, C, gamma) se evalúa con StratifiedKFold. Todos los
+pares (configuración, fold) se reparten entre los núcleos con joblib, y cada
+configuración se registra en MLflow como run hijo del run de la búsqueda, con
+sus métricas y tiempos. Las particiones y los escaladores ajustados en cada
+fold se calculan una sola vez y se comparten entre configuraciones
+(--no-cache-folds lo desactiva); con --cache-dir además se guardan en disco
+para reutilizarlos entre ejecuciones.
+
+Uso:
+    python music_skills.py                              # grid por defecto
+    python music_skills.py --full-grid                  # grid completo (lento)
+    python music_skills.py --search random --n-iter 300
+    python music_skills.py --kernel poly --C 1 --gamma scale   # una configuración
+"""
+import argparse
+import time
+
 import pandas as pd
-from sklearn.model_selection import StratifiedKFold
+from joblib import Memory, Parallel, delayed
+from scipy.stats import loguniform
+from sklearn.model_selection import ParameterGrid, ParameterSampler, StratifiedKFold
+from sklearn.preprocessing import StandardScaler
 from sklearn.svm import SVC
 from sklearn.metrics import accuracy_score, precision_score, recall_score, confusion_matrix
 import numpy as np
 import mlflow
-import mlflow.sklearn
-
-
-print("\n\nLoading dataset\n--------------------------\n")
-# Cargar los datos
-# ----------------
-df = pd.read_csv('musical_skills_smote_final.csv')
 
 numerical_features = ['accuracy_easy', 'accuracy_medium', 'accuracy_hard', 'avg_response_time', 'games_played', 'avg_session_duration']
-X = df[numerical_features]
-y = df['skill_level']
 
+# Espacio de búsqueda. El kernel lineal no usa gamma.
+VALORES_C = [0.01, 0.1, 1, 10, 100, 1000]
+VALORES_GAMMA = ['scale', 'auto', 0.001, 0.01, 0.1, 1]
+# Con C y gamma grandes el kernel polinómico (grado 3) puede tardar millones
+# de iteraciones en converger, así que el grid por defecto lo limita a valores
+# moderados. GRID_COMPLETO (--full-grid) prueba todas las combinaciones.
+GRID = [
+    {'kernel': ['linear'], 'C': VALORES_C},
+    {'kernel': ['rbf', 'sigmoid'], 'C': VALORES_C, 'gamma': VALORES_GAMMA},
+    {'kernel': ['poly'], 'C': [0.01, 0.1, 1, 10], 'gamma': ['scale', 'auto', 0.001, 0.01, 0.1]},
+]
+GRID_COMPLETO = [
+    {'kernel': ['linear'], 'C': VALORES_C},
+    {'kernel': ['poly', 'rbf', 'sigmoid'], 'C': VALORES_C, 'gamma': VALORES_GAMMA},
+]
+DISTRIBUCIONES = {
+    'kernel': ['linear', 'poly', 'rbf', 'sigmoid'],
+    'C': loguniform(1e-2, 1e3),
+    'gamma': loguniform(1e-4, 1e1),
+}
 
-# Configuraciones de MLFlow
-# -------------------------
-mlflow.set_experiment("Clasificación Nivel Habilidad Musical SVM")
-mlflow.sklearn.autolog()
 
-# Entrenamiento del modelo SVM
-# ----------------------------
-n_splits = 5
-skf = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=42)
+def configuraciones(args):
+    if args.kernel:
+        config = {'kernel': args.kernel, 'C': args.C}
+        if args.kernel != 'linear':
+            config['gamma'] = args.gamma if args.gamma in ('scale', 'auto') else float(args.gamma)
+        configs = [config]
+    elif args.search == 'random':
+        configs = list(ParameterSampler(DISTRIBUCIONES, n_iter=args.n_iter, random_state=args.random_state))
+        for config in configs:
+            if config['kernel'] == 'linear':
+                del config['gamma']
+    else:
+        configs = list(ParameterGrid(GRID_COMPLETO if args.full_grid else GRID))
+    # Una configuración polinómica que no converge no debe bloquear la búsqueda:
+    # se corta en poly_max_iter iteraciones (sklearn avisa con ConvergenceWarning)
+    if args.poly_max_iter > 0:
+        for config in configs:
+            if config['kernel'] == 'poly':
+                config['max_iter'] = args.poly_max_iter
+    return configs
 
-conf_matrices = []
-fold_accuracy = []
-fold_precision = []
-fold_recall = []
 
-class_labels = sorted(y.unique(), reverse=True)
+def nombre_config(config):
+    return "-".join(f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}" for k, v in sorted(config.items()))
 
 
-print("\n\nTraining SVM model\n--------------------------\n")
-# Start execution of the MLflow run
-# ---------------------------------
-with mlflow.start_run(run_name="SVM_CrossValidation_Experiment - poly kernel"):
-    mlflow.log_param("n_splits_cv", n_splits)
-    mlflow.log_param("stratified_kfold_random_state", 42)
+def preparar_fold(X, y, train_index, val_index, escalar):
+    """
+    Separa un fold y, si escalar es True, ajusta un StandardScaler solo con
+    los datos de entrenamiento del fold y lo aplica a ambas partes.
+    """
+    X_train, X_val = X[train_index], X[val_index]
+    if escalar:
+        scaler = StandardScaler().fit(X_train)
+        X_train, X_val = scaler.transform(X_train), scaler.transform(X_val)
+    return X_train, X_val, y[train_index], y[val_index]
 
-    for fold, (train_index, val_index) in enumerate(skf.split(X, y)):
-        print(f"Processing Fold {fold + 1}/{n_splits}")
 
-        X_train_fold, X_val_fold = X.iloc[train_index], X.iloc[val_index]
-        y_train_fold, y_val_fold = y.iloc[train_index], y.iloc[val_index]
+def evaluar_fold(config, fold, class_labels, random_state, datos=None, X=None, y=None, indices=None, escalar=False):
+    """
+    Entrena y evalúa una configuración en un fold. Recibe el fold ya preparado
+    (datos) o sus índices para prepararlo en el propio worker.
+    """
+    inicio = time.perf_counter()
+    if datos is None:
+        datos = preparar_fold(X, y, indices[0], indices[1], escalar)
+    X_train_fold, X_val_fold, y_train_fold, y_val_fold = datos
+    tiempo_preparacion = time.perf_counter() - inicio
 
-        svm_model_fold = SVC(kernel='poly', random_state=42)
-        svm_model_fold.fit(X_train_fold, y_train_fold)
+    svm_model_fold = SVC(random_state=random_state, **config)
+    inicio = time.perf_counter()
+    svm_model_fold.fit(X_train_fold, y_train_fold)
+    tiempo_fit = time.perf_counter() - inicio
 
-        y_val_pred = svm_model_fold.predict(X_val_fold)
+    inicio = time.perf_counter()
+    y_val_pred = svm_model_fold.predict(X_val_fold)
+    tiempo_predict = time.perf_counter() - inicio
 
-        cm = confusion_matrix(y_val_fold, y_val_pred, labels=class_labels)
-        conf_matrices.append(cm)
+    return {
+        "fold": fold,
+        "cm": confusion_matrix(y_val_fold, y_val_pred, labels=class_labels),
+        "accuracy": accuracy_score(y_val_fold, y_val_pred),
+        "precision": precision_score(y_val_fold, y_val_pred, average=None, labels=class_labels, zero_division=0),
+        "recall": recall_score(y_val_fold, y_val_pred, average=None, labels=class_labels, zero_division=0),
+        "n_support": int(svm_model_fold.n_support_.sum()),
+        "tiempo_preparacion": tiempo_preparacion,
+        "tiempo_fit": tiempo_fit,
+        "tiempo_predict": tiempo_predict,
+    }
 
-        accuracy = accuracy_score(y_val_fold, y_val_pred)
-        precision = precision_score(y_val_fold, y_val_pred, average=None, labels=class_labels, zero_division=0)
-        recall = recall_score(y_val_fold, y_val_pred, average=None, labels=class_labels, zero_division=0)
 
-        fold_accuracy.append(accuracy)
-        fold_precision.append(precision)
-        fold_recall.append(recall)
-    
-    # Calculate metrics
+def resumir(config, folds):
+    fold_accuracy = [f["accuracy"] for f in folds]
     mean_accuracy = np.mean(fold_accuracy)
-    std_accuracy = np.std(fold_accuracy)
-    mean_error = 1 - mean_accuracy
-    std_error = std_accuracy 
-    mean_cm = np.mean(conf_matrices, axis=0).astype(int)
-    mean_precision = np.mean(fold_precision, axis=0)
-    mean_recall = np.mean(fold_recall, axis=0)
+    return {
+        "config": config,
+        "mean_accuracy": mean_accuracy,
+        "std_accuracy": np.std(fold_accuracy),
+        "mean_classification_error": 1 - mean_accuracy,
+        "std_classification_error": np.std(fold_accuracy),
+        "mean_cm": np.mean([f["cm"] for f in folds], axis=0).astype(int),
+        "mean_precision": np.mean([f["precision"] for f in folds], axis=0),
+        "mean_recall": np.mean([f["recall"] for f in folds], axis=0),
+        "mean_support_vectors": np.mean([f["n_support"] for f in folds]),
+        "fit_time": sum(f["tiempo_fit"] for f in folds),
+        "predict_time": sum(f["tiempo_predict"] for f in folds),
+        "prepare_time": sum(f["tiempo_preparacion"] for f in folds),
+    }
 
 
-    # Register metrics in MLflow
-    # --------------------------------------------------------------
-    mlflow.log_metric("mean_accuracy", mean_accuracy)
-    mlflow.log_metric("std_accuracy", std_accuracy)
-    mlflow.log_metric("mean_classification_error", mean_error)
-    mlflow.log_metric("std_classification_error", std_error)
+def registrar_config(resumen, n_splits):
+    with mlflow.start_run(run_name=nombre_config(resumen["config"]), nested=True):
+        mlflow.log_params(resumen["config"])
+        mlflow.log_param("n_splits_cv", n_splits)
+        mlflow.log_metrics({
+            "mean_accuracy": resumen["mean_accuracy"],
+            "std_accuracy": resumen["std_accuracy"],
+            "mean_classification_error": resumen["mean_classification_error"],
+            "std_classification_error": resumen["std_classification_error"],
+            "mean_support_vectors": resumen["mean_support_vectors"],
+            # Tiempos sumados sobre los folds (CPU de los workers, no tiempo de pared)
+            "fit_time_s": resumen["fit_time"],
+            "predict_time_s": resumen["predict_time"],
+            "prepare_time_s": resumen["prepare_time"],
+        })
 
+
+def guardar_resultados(mejor, class_labels, resumenes):
     # Create DataFrames for performance metrics and confusion matrix
     # --------------------------------------------------------------
+    mean_accuracy, std_accuracy = mejor["mean_accuracy"], mejor["std_accuracy"]
+    mean_error, std_error = mejor["mean_classification_error"], mejor["std_classification_error"]
     df_performance = pd.DataFrame({
         "Criterion": ["Accuracy", "Classification Error"],
         "Value": [f"{mean_accuracy * 100:.1f}%", f"{mean_error * 100:.1f}%"],
@@ -91,12 +172,119 @@ with mlflow.start_run(run_name="SVM_CrossValidation_Experiment - poly kernel"):
     df_performance.to_csv("results/performance_metrics.csv")
     mlflow.log_artifact("results/performance_metrics.csv")
 
-    df_conf = pd.DataFrame(mean_cm,
+    df_conf = pd.DataFrame(mejor["mean_cm"],
                            index=[f"true {label}" for label in class_labels],
                            columns=[f"pred {label}" for label in class_labels])
-    df_conf["class recall"] = [f"{r*100:.2f}%" for r in mean_recall]
-    df_conf.loc["class precision"] = [f"{p*100:.2f}%" for p in mean_precision] + [""]
+    df_conf["class recall"] = [f"{r*100:.2f}%" for r in mejor["mean_recall"]]
+    df_conf.loc["class precision"] = [f"{p*100:.2f}%" for p in mejor["mean_precision"]] + [""]
     df_conf.to_csv("results/confusion_matrix_summary.csv")
     mlflow.log_artifact("results/confusion_matrix_summary.csv")
 
-    print("\nEjecución de MLflow completada.")
\ No newline at end of file
+    df_busqueda = pd.DataFrame([
+        {**r["config"], "mean_accuracy": r["mean_accuracy"], "std_accuracy": r["std_accuracy"],
+         "fit_time_s": r["fit_time"], "predict_time_s": r["predict_time"]}
+        for r in resumenes
+    ]).sort_values("mean_accuracy", ascending=False)
+    df_busqueda.to_csv("results/search_results.csv", index=False)
+    mlflow.log_artifact("results/search_results.csv")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--search", choices=["grid", "random"], default="grid")
+    parser.add_argument("--n-iter", type=int, default=200, help="Configuraciones de la búsqueda aleatoria")
+    parser.add_argument("--full-grid", action="store_true",
+                        help="Grid completo, con el kernel polinómico en todos los valores de C y gamma")
+    parser.add_argument("--poly-max-iter", type=int, default=100000,
+                        help="Máximo de iteraciones del kernel polinómico (-1: sin límite)")
+    parser.add_argument("--kernel", choices=["linear", "poly", "rbf", "sigmoid"],
+                        help="Evalúa solo esta configuración en lugar de una búsqueda")
+    parser.add_argument("--C", type=float, default=1.0)
+    parser.add_argument("--gamma", default="scale")
+    parser.add_argument("--n-splits", type=int, default=5)
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Procesos de joblib (-1: todos los núcleos)")
+    parser.add_argument("--scale", action="store_true", help="Ajusta un StandardScaler en cada fold")
+    parser.add_argument("--no-cache-folds", action="store_true",
+                        help="Prepara cada fold dentro de cada tarea en lugar de compartirlo entre configuraciones")
+    parser.add_argument("--cache-dir", help="Directorio de joblib.Memory para reutilizar los folds entre ejecuciones")
+    parser.add_argument("--random-state", type=int, default=42)
+    parser.add_argument("--tracking-uri", default="file:./mlruns", help="Almacén de MLflow (por defecto, archivos locales)")
+    parser.add_argument("--experiment", default="Clasificación Nivel Habilidad Musical SVM")
+    args = parser.parse_args()
+
+    print("\n\nLoading dataset\n--------------------------\n")
+    # Cargar los datos
+    # ----------------
+    df = pd.read_csv('musical_skills_smote_final.csv')
+    X = df[numerical_features].to_numpy(dtype=np.float64)
+    y = df['skill_level'].to_numpy()
+    class_labels = sorted(np.unique(y), reverse=True)
+
+    # Configuraciones de MLFlow
+    # -------------------------
+    mlflow.set_tracking_uri(args.tracking_uri)
+    mlflow.set_experiment(args.experiment)
+
+    configs = configuraciones(args)
+    skf = StratifiedKFold(n_splits=args.n_splits, shuffle=True, random_state=args.random_state)
+    particiones = list(skf.split(X, y))
+
+    if args.no_cache_folds:
+        tareas = [delayed(evaluar_fold)(config, fold, class_labels, args.random_state,
+                                        X=X, y=y, indices=indices, escalar=args.scale)
+                  for config in configs for fold, indices in enumerate(particiones)]
+    else:
+        preparar = Memory(args.cache_dir, verbose=0).cache(preparar_fold) if args.cache_dir else preparar_fold
+        folds = [preparar(X, y, train_index, val_index, args.scale) for train_index, val_index in particiones]
+        tareas = [delayed(evaluar_fold)(config, fold, class_labels, args.random_state, datos=datos)
+                  for config in configs for fold, datos in enumerate(folds)]
+
+    print(f"\n\nTraining SVM models: {len(configs)} configuraciones x {args.n_splits} folds\n--------------------------\n")
+    resumenes = []
+    inicio = time.perf_counter()
+    with mlflow.start_run(run_name=f"SVM_CrossValidation_Search - {args.search if not args.kernel else nombre_config(configs[0])}"):
+        mlflow.log_param("n_splits_cv", args.n_splits)
+        mlflow.log_param("stratified_kfold_random_state", args.random_state)
+        mlflow.log_param("search", "single" if args.kernel else args.search)
+        mlflow.log_param("n_configs", len(configs))
+        mlflow.log_param("scale", args.scale)
+
+        # Los resultados llegan en orden: cada configuración se registra en cuanto
+        # terminan sus folds, mientras los workers siguen con las siguientes
+        resultados = Parallel(n_jobs=args.n_jobs, return_as="generator")(tareas)
+        folds_config = []
+        for resultado in resultados:
+            folds_config.append(resultado)
+            if len(folds_config) < args.n_splits:
+                continue
+            config = configs[len(resumenes)]
+            resumen = resumir(config, folds_config)
+            resumenes.append(resumen)
+            registrar_config(resumen, args.n_splits)
+            print(f"[{len(resumenes)}/{len(configs)}] {nombre_config(config)}: "
+                  f"accuracy {resumen['mean_accuracy'] * 100:.1f}% ± {resumen['std_accuracy'] * 100:.1f}%")
+            folds_config = []
+
+        tiempo_total = time.perf_counter() - inicio
+        mejor = max(resumenes, key=lambda r: r["mean_accuracy"])
+
+        # Register metrics in MLflow
+        # --------------------------------------------------------------
+        mlflow.log_params({f"best_{k}": v for k, v in mejor["config"].items()})
+        mlflow.log_metric("mean_accuracy", mejor["mean_accuracy"])
+        mlflow.log_metric("std_accuracy", mejor["std_accuracy"])
+        mlflow.log_metric("mean_classification_error", mejor["mean_classification_error"])
+        mlflow.log_metric("std_classification_error", mejor["std_classification_error"])
+        mlflow.log_metric("wall_time_s", tiempo_total)
+        mlflow.log_metric("sequential_time_s", sum(r["fit_time"] + r["predict_time"] + r["prepare_time"] for r in resumenes))
+
+        guardar_resultados(mejor, class_labels, resumenes)
+
+    print(f"\nMejor configuración: {nombre_config(mejor['config'])} "
+          f"(accuracy {mejor['mean_accuracy'] * 100:.1f}% ± {mejor['std_accuracy'] * 100:.1f}%)")
+    print(f"{len(configs)} configuraciones en {tiempo_total:.1f} s")
+    print("\nEjecución de MLflow completada.")
+
+
+if __name__ == "__main__":
+    main()
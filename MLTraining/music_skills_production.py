@@ -6,10 +6,16 @@ import numpy as np
 import mlflow
 import mlflow.sklearn
 
+from svm_export import cargar_normalizacion, exportar_svm_npz
+
 # Códigos ANSI para colores de texto
 COLOR_VERDE = "\033[92m"
 COLOR_FIN = "\033[0m"
 
+# Parámetros de normalización que usa el backend y ruta del modelo exportado
+NORMALIZATION_PARAMS_PATH = '../EarTrainer-Back/general_models/skill_level_model.json'
+NPZ_OUTPUT_PATH = '../EarTrainer-Back/general_models/skill_level_model.npz'
+
 print("\n\nCarga de datos...")
 # Cargar los datos
 # ----------------
@@ -48,6 +54,11 @@ with mlflow.start_run(run_name="Final_SVM_Model_Training"):
     )
 
     print(f"Modelo registrado en: {mlflow.active_run().info.artifact_uri}/svm_musical_skills_model")
+
+    # Exportar el modelo a .npz para el backend (evaluación con NumPy, sin pickle ni sklearn)
+    feature_mean, feature_std = cargar_normalizacion(NORMALIZATION_PARAMS_PATH, numerical_features)
+    exportar_svm_npz(svm, numerical_features, feature_mean, feature_std, NPZ_OUTPUT_PATH)
+    mlflow.log_artifact(NPZ_OUTPUT_PATH)
     print(f"\n{COLOR_VERDE}Para ver el modelo en el Model Registry, ejecuta 'mlflow ui' y navega a la pestaña 'Models'.{COLOR_FIN}")
 
 
@@ -0,0 +1,87 @@
+"""
+Exportación del SVM de habilidad musical a un archivo .npz versionado.
+
+El archivo contiene todo lo necesario para evaluar el modelo sin sklearn ni
+pickle: vectores de soporte, coeficientes duales, interceptos, parámetros
+del kernel, clases, nombres de las características y los parámetros de
+normalización z-score. Se guarda sin comprimir para que el backend pueda
+mapear sus arrays en memoria (ver EarTrainer-Back/src/ml/svm_numpy.py).
+
+Se usa desde music_skills_production.py y también como script para
+convertir un modelo ya entrenado:
+
+    python svm_export.py --model ../EarTrainer-Back/general_models/skill_level_model.pkl \\
+        --params ../EarTrainer-Back/general_models/skill_level_model.json \\
+        --output ../EarTrainer-Back/general_models/skill_level_model.npz
+"""
+import argparse
+import json
+import pickle
+
+import numpy as np
+import sklearn
+
+# Versión del formato del .npz; el backend rechaza versiones que no conoce
+FORMAT_VERSION = 1
+
+
+def cargar_normalizacion(params_path, numerical_features):
+    """
+    Lee el JSON de normalización y devuelve los vectores mean/std en el orden
+    de numerical_features (media 0 y desviación 1 para las características
+    sin parámetros).
+    """
+    with open(params_path, 'r') as f:
+        params = json.load(f)
+    params.pop("__metadata__", None)
+    mean = np.zeros(len(numerical_features))
+    std = np.ones(len(numerical_features))
+    for i, feature in enumerate(numerical_features):
+        if feature in params:
+            mean[i] = params[feature]["mean"]
+            std[i] = params[feature]["std"]
+    return mean, std
+
+
+def exportar_svm_npz(svm, numerical_features, feature_mean, feature_std, output_path):
+    """
+    Guarda un SVC entrenado (denso, multiclase o binario) en output_path.
+    """
+    if svm.kernel not in ("linear", "poly", "rbf", "sigmoid"):
+        raise ValueError(f"Kernel no soportado para exportar: {svm.kernel}")
+    classes = np.asarray(svm.classes_)
+    if classes.dtype == object:
+        classes = classes.astype(str)  # Las etiquetas de texto se guardan sin pickle
+    np.savez(
+        output_path,
+        format_version=np.array(FORMAT_VERSION),
+        sklearn_version=np.array(sklearn.__version__),
+        feature_names=np.array(numerical_features),
+        feature_mean=np.asarray(feature_mean, dtype=np.float64),
+        feature_std=np.asarray(feature_std, dtype=np.float64),
+        classes=classes,
+        support_vectors=np.ascontiguousarray(svm.support_vectors_, dtype=np.float64),
+        n_support=np.asarray(svm.n_support_, dtype=np.int64),
+        dual_coef=np.ascontiguousarray(svm.dual_coef_, dtype=np.float64),
+        intercept=np.asarray(svm.intercept_, dtype=np.float64),
+        kernel=np.array(svm.kernel),
+        # _gamma es el valor numérico usado en el ajuste (resuelve gamma='scale'/'auto')
+        gamma=np.array(float(svm._gamma)),
+        coef0=np.array(float(svm.coef0)),
+        degree=np.array(int(svm.degree)),
+    )
+    print(f"Modelo exportado a {output_path} ({len(svm.support_vectors_)} vectores de soporte)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", required=True, help="Pickle del SVC entrenado")
+    parser.add_argument("--params", required=True, help="JSON con los parámetros de normalización")
+    parser.add_argument("--output", required=True, help="Ruta del .npz de salida")
+    args = parser.parse_args()
+
+    with open(args.model, 'rb') as f:
+        modelo = pickle.load(f)
+    features = list(modelo.feature_names_in_)
+    mean, std = cargar_normalizacion(args.params, features)
+    exportar_svm_npz(modelo, features, mean, std, args.output)